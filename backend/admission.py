@@ -0,0 +1,236 @@
+"""
+Admission control and load shedding for the API endpoints
+Each gate caps how many requests of one kind run at once, queues a bounded
+number of extra requests (fairly, round-robin across clients) and rejects
+the rest immediately with 503 + Retry-After. Heavy and cheap endpoints use
+separate gates, so a pile-up of OCR jobs never blocks translation or health checks.
+
+Active and queued requests both hold a server thread, so each gate's slots
+(concurrent + queue) are a fixed share of WORKER_THREADS, and RESERVED_THREADS
+always stay free for ungated endpoints such as /health. A request that would
+take more than its share is rejected instead of waiting for a thread.
+"""
+
+import functools
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+from flask import jsonify, request
+
+# Must match the server's thread count (gunicorn --threads)
+WORKER_THREADS = int(os.getenv('WORKER_THREADS', 12))
+RESERVED_THREADS = int(os.getenv('RESERVED_THREADS', 2))
+
+
+class ThreadBudget:
+    """Server threads that gated requests (active or queued) may hold at once"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.held = 0
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            if self.held >= self.limit:
+                return False
+            self.held += 1
+            return True
+
+    def give_back(self) -> None:
+        with self.lock:
+            self.held -= 1
+
+
+thread_budget = ThreadBudget(max(1, WORKER_THREADS - RESERVED_THREADS))
+
+
+class _Waiter:
+    """A queued request waiting for a slot"""
+
+    def __init__(self, client):
+        self.client = client
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded, per-client fair wait queue"""
+
+    def __init__(self, name, max_concurrent, max_queue, max_wait_seconds, max_per_client):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.max_per_client = max_per_client
+
+        self.lock = threading.Lock()
+        self.active = 0
+        self.active_by_client = Counter()
+        self.queues = OrderedDict()  # client -> deque of waiters, in round-robin order
+        self.queued = 0
+        self.avg_service_seconds = 1.0
+        self.stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0, 'max_queue_depth': 0}
+
+    def _client_load(self, client) -> int:
+        return self.active_by_client[client] + len(self.queues.get(client, ()))
+
+    def _grant(self, client) -> None:
+        self.active += 1
+        self.active_by_client[client] += 1
+        self.stats['admitted'] += 1
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait, from queue depth and service time"""
+        return max(1, math.ceil(self.avg_service_seconds * (self.queued + 1) / self.max_concurrent))
+
+    def acquire(self, client) -> bool:
+        """
+        Take a slot for client, waiting in the queue if needed
+
+        Returns:
+            bool: True if admitted (call release() afterwards), False if rejected
+        """
+        with self.lock:
+            # Queued waiters are dispatched on release, so a free slot means none can use it
+            if self.active < self.max_concurrent and client not in self.queues \
+                    and self.active_by_client[client] < self.max_per_client:
+                if not thread_budget.take():
+                    self.stats['rejected'] += 1
+                    return False
+                self._grant(client)
+                return True
+
+            if self.queued >= self.max_queue or self._client_load(client) >= self.max_per_client \
+                    or not thread_budget.take():
+                self.stats['rejected'] += 1
+                return False
+
+            waiter = _Waiter(client)
+            self.queues.setdefault(client, deque()).append(waiter)
+            self.queued += 1
+            self.stats['queued'] += 1
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self.queued)
+
+        waiter.event.wait(self.max_wait_seconds)
+
+        with self.lock:
+            if waiter.granted:
+                return True
+
+            # Timed out while still queued
+            self.queues[client].remove(waiter)
+            if not self.queues[client]:
+                del self.queues[client]
+            self.queued -= 1
+            self.stats['timed_out'] += 1
+            thread_budget.give_back()
+            return False
+
+    def release(self, client, service_seconds: float) -> None:
+        """Free client's slot and hand it to the next client in round-robin order"""
+        thread_budget.give_back()
+        with self.lock:
+            self.active -= 1
+            self.active_by_client[client] -= 1
+            if self.active_by_client[client] <= 0:
+                del self.active_by_client[client]
+            self.avg_service_seconds = 0.8 * self.avg_service_seconds + 0.2 * service_seconds
+
+            for next_client in list(self.queues):
+                if self.active >= self.max_concurrent:
+                    break
+                if self.active_by_client[next_client] >= self.max_per_client:
+                    continue
+
+                waiters = self.queues.pop(next_client)
+                waiter = waiters.popleft()
+                if waiters:
+                    self.queues[next_client] = waiters  # Back of the rotation
+
+                self.queued -= 1
+                self._grant(next_client)
+                waiter.granted = True
+                waiter.event.set()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                **self.stats,
+                'active': self.active,
+                'queue_depth': self.queued,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue
+            }
+
+
+def _gate_from_env(name, max_concurrent, max_queue, max_wait_seconds, max_per_client):
+    """Build a gate whose limits can be overridden with <NAME>_MAX_CONCURRENT etc."""
+    prefix = name.upper()
+    return AdmissionGate(
+        name,
+        int(os.getenv(f'{prefix}_MAX_CONCURRENT', max_concurrent)),
+        int(os.getenv(f'{prefix}_MAX_QUEUE', max_queue)),
+        float(os.getenv(f'{prefix}_MAX_WAIT_SECONDS', max_wait_seconds)),
+        int(os.getenv(f'{prefix}_MAX_PER_CLIENT', max_per_client))
+    )
+
+
+# Slots (concurrent + queue) per gate add up to WORKER_THREADS - RESERVED_THREADS
+# with the defaults (10 of 12); cheap endpoints get their own slots so heavy
+# ones can't take them. A client may run two analyses at once, so a repeated
+# submission (double-click, or several users behind one NAT address) reaches
+# /api/analyze and joins the identical request's single flight instead of
+# being rejected.
+GATES = {
+    'analyze': _gate_from_env('analyze', 2, 2, 30, 2),
+    'audio': _gate_from_env('audio', 1, 1, 20, 1),
+    'question': _gate_from_env('question', 1, 0, 20, 1),
+    'translate': _gate_from_env('translate', 2, 1, 20, 2),
+}
+
+_gate_slots = sum(gate.max_concurrent + gate.max_queue for gate in GATES.values())
+if _gate_slots > thread_budget.limit:
+    print(f'⚠️  Admission gates allow {_gate_slots} requests but only {thread_budget.limit} threads are available '
+          f'(WORKER_THREADS={WORKER_THREADS}, RESERVED_THREADS={RESERVED_THREADS}); extra requests will be rejected')
+
+
+def client_id() -> str:
+    """Identify the caller (remote_addr, which ProxyFix sets from trusted proxy hops)"""
+    return request.remote_addr or 'unknown'
+
+
+def admission_controlled(gate_name):
+    """Decorator that runs a Flask view under the named admission gate"""
+    gate = GATES[gate_name]
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            client = client_id()
+            if not gate.acquire(client):
+                print(f'🚦 {gate_name}: rejected request from {client} (queue {gate.queued}/{gate.max_queue})')
+                response = jsonify({
+                    'success': False,
+                    'error': 'Server is busy, please try again shortly'
+                })
+                response.headers['Retry-After'] = str(gate.retry_after())
+                return response, 503
+
+            start = time.perf_counter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                gate.release(client, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def get_admission_stats() -> dict:
+    """Per-gate queue depth, active requests and admit/reject counts"""
+    return {name: gate.get_stats() for name, gate in GATES.items()}
@@ -5,13 +5,301 @@ Generates plain-language explanations and risk assessments
 
 import os
 import json
-from groq import Groq
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import httpx
+from groq import Groq, RateLimitError, APIConnectionError, APIStatusError, InternalServerError
 from dotenv import load_dotenv
+from prompt_budget import prepare_contract_text, count_tokens
 
 load_dotenv()
 
-# Initialize Groq client
-client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+# LLM gateway settings
+GROQ_BASE_URL = os.getenv('GROQ_BASE_URL') or None  # Point at a fake server for testing
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 20))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv('LLM_REQUESTS_PER_MINUTE', 30))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 4))
+LLM_RETRY_BASE_SECONDS = float(os.getenv('LLM_RETRY_BASE_SECONDS', 0.5))
+LLM_RETRY_MAX_SECONDS = float(os.getenv('LLM_RETRY_MAX_SECONDS', 20))
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', 60))
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv('LLM_HEDGE_AFTER_SECONDS', 0))  # 0 disables hedging
+LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', 5))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv('LLM_BREAKER_COOLDOWN_SECONDS', 30))
+LLM_MAX_WAIT_SECONDS = float(os.getenv('LLM_MAX_WAIT_SECONDS', 30))  # Longest a request waits on rate limits
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the circuit breaker is open or retries are exhausted"""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMRateLimitedError(LLMUnavailableError):
+    """Raised when the rate limit would make a request wait longer than LLM_MAX_WAIT_SECONDS"""
+
+
+def parse_reset_seconds(value) -> float:
+    """Parse rate-limit reset values like '2m59.56s', '7.66s', '120ms' or '3' into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    parts = re.findall(r'([\d.]+)(ms|h|m|s)', value)
+    return sum(float(amount) * units[unit] for amount, unit in parts) if parts else None
+
+
+class TokenBucket:
+    """
+    Request scheduler shared by all workers in the process
+    Refills at the configured rate and pauses completely when the provider
+    reports the rate limit is exhausted
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int = None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or max(1, int(requests_per_minute / 10))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait: float = None) -> float:
+        """
+        Block until a request may be sent; returns seconds waited
+
+        Raises:
+            LLMRateLimitedError: If that would take longer than max_wait seconds
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self.tokens) / self.rate
+
+            if max_wait is not None and waited + delay > max_wait:
+                raise LLMRateLimitedError(f'AI service rate limit reached, retry in {delay:.0f}s', retry_after=delay)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out requests for the given number of seconds"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers) -> None:
+        """Apply the provider's x-ratelimit-* response headers"""
+        for kind in ('requests', 'tokens'):
+            remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+            reset = parse_reset_seconds(headers.get(f'x-ratelimit-reset-{kind}'))
+            if remaining is not None and reset and remaining.strip() == '0':
+                self.pause(reset)
+
+
+class CircuitBreaker:
+    """Stops calling the provider after repeated failures, then lets one probe through"""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.probe_thread = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now"""
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.probing:
+                self.probing = True
+                self.probe_thread = threading.get_ident()
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def end_probe(self) -> None:
+        """Let another probe through if this thread's probe ended without a verdict"""
+        with self.lock:
+            if self.probe_thread == threading.get_ident():
+                self.probing = False
+                self.probe_thread = None
+
+
+class LLMGateway:
+    """
+    Shared Groq client: pooled HTTP connections, rate-limit aware scheduling,
+    jittered retries, optional hedged requests and a circuit breaker
+    """
+
+    def __init__(self):
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS
+            ),
+            timeout=LLM_TIMEOUT_SECONDS
+        )
+        # Retries are handled here so they can follow the rate-limit headers
+        self.client = Groq(
+            api_key=os.getenv('GROQ_API_KEY'),
+            base_url=GROQ_BASE_URL,
+            max_retries=0,
+            http_client=self.http_client
+        )
+        self.bucket = TokenBucket(LLM_REQUESTS_PER_MINUTE)
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN_SECONDS)
+        self.hedge_pool = ThreadPoolExecutor(max_workers=LLM_MAX_CONNECTIONS, thread_name_prefix='llm-hedge')
+        self.stats = {'requests': 0, 'rate_limited': 0, 'retries': 0, 'hedges': 0,
+                      'hedge_wins': 0, 'failures': 0, 'breaker_rejections': 0}
+        self.stats_lock = threading.Lock()
+
+    def _count(self, stat: str) -> None:
+        with self.stats_lock:
+            self.stats[stat] += 1
+
+    def get_stats(self) -> dict:
+        with self.stats_lock:
+            return {**self.stats, 'breaker_state': self.breaker.state}
+
+    def _send(self, kwargs: dict):
+        """Send one request once the scheduler allows it"""
+        self.bucket.acquire(LLM_MAX_WAIT_SECONDS)
+        self._count('requests')
+        raw = self.client.chat.completions.with_raw_response.create(**kwargs)
+        self.bucket.update_from_headers(raw.headers)
+        return raw.parse()
+
+    def _send_hedged(self, kwargs: dict):
+        """Send a request, and a duplicate if the first is slower than LLM_HEDGE_AFTER_SECONDS"""
+        primary = self.hedge_pool.submit(self._send, kwargs)
+        done, _ = wait([primary], timeout=LLM_HEDGE_AFTER_SECONDS)
+        if done:
+            return primary.result()
+
+        self._count('hedges')
+        hedge = self.hedge_pool.submit(self._send, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def chat_completion(self, **kwargs):
+        """
+        Create a chat completion with retries and rate-limit handling
+        Takes the same arguments as client.chat.completions.create()
+        """
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            if not self.breaker.allow():
+                self._count('breaker_rejections')
+                raise LLMUnavailableError(
+                    f'AI service temporarily unavailable, retry in {self.breaker.retry_in():.0f}s',
+                    retry_after=self.breaker.retry_in()
+                )
+
+            try:
+                if LLM_HEDGE_AFTER_SECONDS > 0:
+                    response = self._send_hedged(kwargs)
+                else:
+                    response = self._send(kwargs)
+                self.breaker.record_success()
+                return response
+
+            except RateLimitError as e:
+                # The provider is up, just busy - slow the whole process down instead
+                self.breaker.record_success()
+                self._count('rate_limited')
+                retry_after = parse_reset_seconds(e.response.headers.get('retry-after'))
+                delay = retry_after or self._backoff(attempt)
+                self.bucket.pause(delay)
+                if delay > LLM_MAX_WAIT_SECONDS:
+                    self._count('failures')
+                    raise LLMRateLimitedError(f'AI service rate limit reached, retry in {delay:.0f}s',
+                                              retry_after=delay) from e
+                error = e
+
+            except (APIConnectionError, InternalServerError) as e:
+                # APITimeoutError is a subclass of APIConnectionError
+                self.breaker.record_failure()
+                delay = self._backoff(attempt)
+                error = e
+
+            except APIStatusError:
+                # Other 4xx errors mean the provider is up, and retrying won't help
+                self.breaker.record_success()
+                raise
+
+            finally:
+                # Rate-limit waits and unexpected errors end a probe without a verdict
+                self.breaker.end_probe()
+
+            if attempt < LLM_MAX_RETRIES:
+                self._count('retries')
+                print(f'⚠️  LLM request failed ({type(error).__name__}), retrying in {delay:.1f}s...')
+                time.sleep(delay)
+
+        self._count('failures')
+        raise LLMUnavailableError(f'AI service unavailable after {LLM_MAX_RETRIES + 1} attempts: {error}')
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+# Shared gateway used by every LLM call in the process
+llm_gateway = LLMGateway()
 
 # Universal system prompt for all agreement types
 UNIVERSAL_SYSTEM_PROMPT = """You are a helpful legal assistant who explains contracts in the simplest possible language for everyday people who are being asked to sign agreements.
@@ -138,28 +426,130 @@ Remember: Your goal is to help someone who has never read a legal contract befor
 """
 
 
-def analyze_contract(extracted_text: str, model: str = "llama-3.3-70b-versatile") -> dict:
+# Model routing: a small fast model for short tasks, the large model for long
+# or high-risk documents and as the escalation target when validation fails
+SMALL_MODEL = os.getenv('GROQ_SMALL_MODEL', 'llama-3.1-8b-instant')
+LARGE_MODEL = os.getenv('GROQ_LARGE_MODEL', 'llama-3.3-70b-versatile')
+SMALL_MODEL_MAX_DOCUMENT_TOKENS = int(os.getenv('SMALL_MODEL_MAX_DOCUMENT_TOKENS', 1500))
+
+# Clauses that deserve the large model even in a short document
+HIGH_RISK_TERMS = (
+    'non-compete', 'noncompete', 'indemnif', 'arbitration', 'liquidated damages',
+    'waive', 'waiver', 'penalty', 'forfeit', 'garnish', 'bond', 'guarantor'
+)
+
+# Top-level analysis fields and the type each must have
+ANALYSIS_SCHEMA = {
+    'document_summary': dict,
+    'key_clauses': list,
+    'risk_analysis': dict,
+    'your_obligations': list,
+    'your_rights': list,
+    'questions_to_ask': list,
+}
+RISK_ANALYSIS_SCHEMA = ('red_flags', 'yellow_flags', 'positive_terms')
+
+# Per-route counters: route name -> calls, escalations, failures, latency, tokens
+_route_metrics = {}
+_route_metrics_lock = threading.Lock()
+
+
+def record_route_metrics(route: str, latency: float, tokens: int = None,
+                         escalated: bool = False, failed: bool = False) -> None:
+    """Record one LLM call for a route"""
+    with _route_metrics_lock:
+        metrics = _route_metrics.setdefault(route, {
+            'calls': 0, 'escalations': 0, 'failures': 0,
+            'total_latency_seconds': 0.0, 'total_tokens': 0
+        })
+        metrics['calls'] += 1
+        metrics['escalations'] += int(escalated)
+        metrics['failures'] += int(failed)
+        metrics['total_latency_seconds'] += latency
+        metrics['total_tokens'] += tokens or 0
+
+
+def get_route_metrics() -> dict:
+    """Per-route LLM call counts, average latency and tokens"""
+    with _route_metrics_lock:
+        return {
+            route: {
+                **metrics,
+                'avg_latency_seconds': round(metrics['total_latency_seconds'] / metrics['calls'], 3),
+                'avg_tokens': round(metrics['total_tokens'] / metrics['calls'])
+            }
+            for route, metrics in _route_metrics.items()
+        }
+
+
+def route_analysis_model(document_text: str) -> tuple:
     """
-    Analyze contract text using Groq AI
+    Pick a model for contract analysis by document size and risk
+
+    Returns:
+        tuple: (route name, model)
+    """
+    if count_tokens(document_text) > SMALL_MODEL_MAX_DOCUMENT_TOKENS:
+        return 'analysis_large', LARGE_MODEL
+
+    lowered = document_text.lower()
+    if any(term in lowered for term in HIGH_RISK_TERMS):
+        return 'analysis_large', LARGE_MODEL
+
+    return 'analysis_small', SMALL_MODEL
 
-    Args:
-        extracted_text: The OCR-extracted contract text
-        model: Groq model to use (default: llama-3.3-70b-versatile)
+
+def validate_analysis(analysis) -> list:
+    """
+    Check an analysis against the expected JSON structure
 
     Returns:
-        dict: Structured analysis with summary, clauses, risks, obligations, rights, questions
+        list: Validation problems (empty if valid)
     """
-    try:
-        print(f'🤖 Starting AI analysis with {model}...')
+    if not isinstance(analysis, dict):
+        return ['analysis is not a JSON object']
 
-        # Truncate text if too long (Groq has context limits)
-        max_chars = 30000  # Conservative limit
-        if len(extracted_text) > max_chars:
-            print(f'⚠️  Text truncated from {len(extracted_text)} to {max_chars} characters')
-            extracted_text = extracted_text[:max_chars] + "\n\n[... document continues ...]"
+    problems = []
+    for field, field_type in ANALYSIS_SCHEMA.items():
+        if not isinstance(analysis.get(field), field_type):
+            problems.append(f'{field} missing or not a {field_type.__name__}')
 
-        # Call Groq API
-        response = client.chat.completions.create(
+    risks = analysis.get('risk_analysis')
+    if isinstance(risks, dict):
+        for field in RISK_ANALYSIS_SCHEMA:
+            if not isinstance(risks.get(field), list):
+                problems.append(f'risk_analysis.{field} missing or not a list')
+
+    summary = analysis.get('document_summary')
+    if isinstance(summary, dict) and not summary.get('purpose'):
+        problems.append('document_summary.purpose is empty')
+
+    return problems
+
+
+def json_generation_failure(error: APIStatusError):
+    """
+    The model's output if the provider rejected it as invalid JSON, else None
+
+    In json_object mode Groq answers malformed output with a 400
+    'json_validate_failed' instead of returning it.
+    """
+    body = error.body if isinstance(error.body, dict) else {}
+    body = body.get('error', body) if isinstance(body.get('error'), dict) else body
+    if error.status_code == 400 and body.get('code') == 'json_validate_failed':
+        return body.get('failed_generation') or ''
+    return None
+
+
+def _request_analysis(document_text: str, model: str) -> tuple:
+    """
+    Ask one model for an analysis
+
+    Returns:
+        tuple: (analysis or None, total tokens, raw response text, error message)
+    """
+    try:
+        response = llm_gateway.chat_completion(
             model=model,
             messages=[
                 {
@@ -168,17 +558,88 @@ def analyze_contract(extracted_text: str, model: str = "llama-3.3-70b-versatile"
                 },
                 {
                     "role": "user",
-                    "content": f"Analyze this contract:\n\n{extracted_text}"
+                    "content": f"Analyze this contract:\n\n{document_text}"
                 }
             ],
             temperature=0.3,  # Lower temperature for more consistent legal analysis
             max_tokens=4096,
             response_format={"type": "json_object"}  # Request JSON output
         )
+    except APIStatusError as e:
+        failed_generation = json_generation_failure(e)
+        if failed_generation is None:
+            raise
+        print(f'❌ {model} produced invalid JSON (rejected by the provider)')
+        return None, None, failed_generation, 'AI returned invalid JSON format'
+
+    raw = response.choices[0].message.content
+    tokens = response.usage.total_tokens if hasattr(response, 'usage') else None
+
+    try:
+        analysis = json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f'❌ Failed to parse AI response as JSON: {str(e)}')
+        return None, tokens, raw, 'AI returned invalid JSON format'
+
+    problems = validate_analysis(analysis)
+    if problems:
+        print(f'⚠️  AI response failed validation: {"; ".join(problems)}')
+        return None, tokens, raw, f'AI response failed validation: {problems[0]}'
 
-        # Parse JSON response
-        analysis_json = response.choices[0].message.content
-        analysis = json.loads(analysis_json)
+    return analysis, tokens, raw, None
+
+
+def analyze_contract(extracted_text: str, model: str = None) -> dict:
+    """
+    Analyze contract text using Groq AI
+
+    Args:
+        extracted_text: The OCR-extracted contract text
+        model: Groq model to use (default: routed by document size and risk,
+               escalating to LARGE_MODEL if the output fails validation)
+
+    Returns:
+        dict: Structured analysis with summary, clauses, risks, obligations, rights, questions
+
+    Raises:
+        LLMUnavailableError: The LLM is rate limited or unavailable
+    """
+    try:
+        # Strip boilerplate and fit the request into the input token budget
+        extracted_text, token_stats = prepare_contract_text(extracted_text, UNIVERSAL_SYSTEM_PROMPT)
+        print(f'✂️  Prompt compacted: {token_stats["input_tokens"]} input tokens '
+              f'({token_stats["input_tokens_saved"]} saved)')
+        if token_stats['truncated']:
+            print(f'⚠️  Text truncated to fit the input token budget '
+                  f'({token_stats["input_tokens_truncated"]} tokens cut)')
+
+        if model:
+            route = 'analysis_fixed'
+        else:
+            route, model = route_analysis_model(extracted_text)
+
+        print(f'🤖 Starting AI analysis with {model} (route: {route})...')
+        start = time.perf_counter()
+        analysis, tokens_used, raw_response, error = _request_analysis(extracted_text, model)
+        record_route_metrics(route, time.perf_counter() - start, tokens_used, failed=error is not None)
+
+        escalated = False
+        if error and model != LARGE_MODEL and route != 'analysis_fixed':
+            print(f'⬆️  Escalating to {LARGE_MODEL}...')
+            escalated = True
+            model = LARGE_MODEL
+            start = time.perf_counter()
+            analysis, escalation_tokens, raw_response, error = _request_analysis(extracted_text, model)
+            record_route_metrics('analysis_escalated', time.perf_counter() - start, escalation_tokens,
+                                 escalated=True, failed=error is not None)
+            tokens_used = (tokens_used or 0) + (escalation_tokens or 0)
+
+        if error:
+            return {
+                'success': False,
+                'error': error,
+                'raw_response': raw_response
+            }
 
         print(f'✓ AI analysis complete')
 
@@ -186,17 +647,16 @@ def analyze_contract(extracted_text: str, model: str = "llama-3.3-70b-versatile"
             'success': True,
             'analysis': analysis,
             'model_used': model,
-            'tokens_used': response.usage.total_tokens if hasattr(response, 'usage') else None
-        }
-
-    except json.JSONDecodeError as e:
-        print(f'❌ Failed to parse AI response as JSON: {str(e)}')
-        return {
-            'success': False,
-            'error': 'AI returned invalid JSON format',
-            'raw_response': response.choices[0].message.content if 'response' in locals() else None
+            'route': route,
+            'escalated': escalated,
+            'tokens_used': tokens_used,
+            'input_tokens': token_stats['input_tokens'],
+            'input_tokens_saved': token_stats['input_tokens_saved'],
+            'input_tokens_truncated': token_stats['input_tokens_truncated']
         }
 
+    except LLMUnavailableError:
+        raise  # Surfaced as 429/503 with Retry-After
     except Exception as e:
         print(f'❌ AI analysis error: {str(e)}')
         return {
@@ -205,6 +665,241 @@ def analyze_contract(extracted_text: str, model: str = "llama-3.3-70b-versatile"
         }
 
 
+TEMPLATE_UPDATE_PROMPT = """You update an existing plain-language contract analysis for a new copy of the same contract template.
+
+You receive:
+1. The analysis JSON written for an earlier copy of the template
+2. The only text changes between that copy and the new contract (names, dates, amounts, short clauses)
+
+Return the complete analysis JSON with the same structure, changed ONLY where the text changes affect it:
+- Replace old names, dates, amounts and places with the new ones everywhere they appear
+- Add, remove or rewrite clauses, risks, obligations, rights or questions only if a change alters their meaning
+- Keep every other field exactly as it is
+- Follow the same writing rules: simple words, short sentences, "you" and "your"
+"""
+
+
+def update_analysis(previous_analysis: dict, changes: list) -> dict:
+    """
+    Update an analysis of a contract template for a near-identical contract
+
+    Args:
+        previous_analysis: Analysis of the matched template document
+        changes: Text changes from the template to the new contract,
+                 as dicts with 'before' and 'after'
+
+    Returns:
+        dict: Same shape as analyze_contract()
+    """
+    change_lines = '\n'.join(
+        f'- "{change["before"]}" -> "{change["after"]}"' for change in changes
+    )
+    user_message = (
+        f"Existing analysis:\n{json.dumps(previous_analysis, ensure_ascii=False)}\n\n"
+        f"Text changes in the new contract:\n{change_lines}"
+    )
+
+    try:
+        for route, model in (('template_update', SMALL_MODEL), ('template_update_escalated', LARGE_MODEL)):
+            print(f'🧩 Updating template analysis with {model} ({len(changes)} change(s))...')
+            start = time.perf_counter()
+            try:
+                response = llm_gateway.chat_completion(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": TEMPLATE_UPDATE_PROMPT},
+                        {"role": "user", "content": user_message}
+                    ],
+                    temperature=0.2,
+                    max_tokens=4096,
+                    response_format={"type": "json_object"}
+                )
+            except APIStatusError as e:
+                if json_generation_failure(e) is None:
+                    raise
+                response = None
+            tokens = response.usage.total_tokens if getattr(response, 'usage', None) else None
+
+            try:
+                if response is None:
+                    raise json.JSONDecodeError('Rejected by the provider', '', 0)
+                analysis = json.loads(response.choices[0].message.content)
+                problems = validate_analysis(analysis)
+            except json.JSONDecodeError:
+                problems = ['invalid JSON']
+
+            record_route_metrics(route, time.perf_counter() - start, tokens,
+                                 escalated=route.endswith('escalated'), failed=bool(problems))
+            if not problems:
+                return {
+                    'success': True,
+                    'analysis': analysis,
+                    'model_used': model,
+                    'route': route,
+                    'tokens_used': tokens
+                }
+            print(f'⚠️  Template update failed validation: {"; ".join(problems)}')
+
+        return {'success': False, 'error': 'Template update failed validation'}
+
+    except LLMUnavailableError:
+        raise  # Surfaced as 429/503 with Retry-After
+    except Exception as e:
+        print(f'❌ Template update error: {str(e)}')
+        return {'success': False, 'error': str(e)}
+
+
+def write_question_message(question: str, document_type: str = 'Agreement', language: str = 'en') -> dict:
+    """
+    Write a formal WhatsApp/Email message asking a question about an agreement
+    Short rewrite task, so it always goes to the small model
+
+    Args:
+        question: The question to ask
+        document_type: Type of agreement
+        language: Language code for the message
+
+    Returns:
+        dict: {'success': True, 'message': str, 'model_used': str}
+    """
+    prompt = f"""You are helping someone write a professional, polite message to ask a question about a {document_type} they're about to sign.
+
+Generate a complete, ready-to-send message (WhatsApp/Email format) that:
+1. Has a professional greeting
+2. Briefly mentions the context (reviewing the {document_type})
+3. Asks the specific question politely
+4. Requests clarification
+5. Ends with a professional closing
+
+The question to ask: "{question}"
+
+Language: {"English" if language == "en" else language}
+
+Make it formal but friendly, concise (3-4 sentences max), and ready to copy-paste.
+DO NOT include subject line or email headers - just the message body.
+"""
+
+    start = time.perf_counter()
+    try:
+        response = llm_gateway.chat_completion(
+            model=SMALL_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+            max_tokens=300
+        )
+    except Exception:
+        record_route_metrics('question_message', time.perf_counter() - start, failed=True)
+        raise
+
+    tokens = response.usage.total_tokens if hasattr(response, 'usage') else None
+    record_route_metrics('question_message', time.perf_counter() - start, tokens)
+
+    return {
+        'success': True,
+        'message': response.choices[0].message.content.strip(),
+        'model_used': SMALL_MODEL
+    }
+
+
+# Fields that identify a list item when merging chunk analyses, and how many
+# items each merged list keeps (roughly what the prompt asks for)
+MERGE_KEYS = {
+    'key_clauses': ('title', 8),
+    'your_obligations': ('obligation', 7),
+    'your_rights': ('right', 7),
+    'questions_to_ask': (None, 5),
+}
+MERGED_PURPOSE_SENTENCES = 4  # The prompt asks for 2-4 sentences
+RISK_MERGE_KEYS = {
+    'red_flags': ('issue', 10),
+    'yellow_flags': ('issue', 10),
+    'positive_terms': ('benefit', 10),
+}
+
+
+def _merge_items(lists: list, key_field: str, limit: int) -> list:
+    """Concatenate lists of analysis items, dropping duplicates by key_field"""
+    merged = []
+    seen = set()
+    for items in lists:
+        for item in items or []:
+            key = item.get(key_field) if key_field and isinstance(item, dict) else item
+            key = str(key).strip().lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+    return merged[:limit]
+
+
+def _merge_purposes(purposes: list, limit: int = MERGED_PURPOSE_SENTENCES) -> str:
+    """
+    Combine the chunks' purpose statements into one
+
+    Takes sentences round-robin (each chunk's first sentence, then each
+    chunk's second, ...) so every part of the document is represented,
+    skipping sentences already used.
+    """
+    sentences = [re.split(r'(?<=[.!?])\s+', p.strip()) if isinstance(p, str) and p.strip() else []
+                 for p in purposes]
+    merged = []
+    seen = set()
+    for position in range(max((len(s) for s in sentences), default=0)):
+        for chunk_sentences in sentences:
+            if position >= len(chunk_sentences) or len(merged) >= limit:
+                continue
+            sentence = chunk_sentences[position]
+            key = sentence.strip().lower()
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(sentence)
+    return ' '.join(merged)
+
+
+def merge_analyses(analyses: list) -> dict:
+    """
+    Merge analyses of consecutive chunks of one document into a single analysis
+
+    Args:
+        analyses: Chunk analyses in document order
+
+    Returns:
+        dict: Analysis with the same structure as analyze_contract() output
+    """
+    analyses = [a for a in analyses if a]
+    if not analyses:
+        return {}
+
+    summaries = [a.get('document_summary') or {} for a in analyses]
+    summary = dict(summaries[0])
+
+    # The type most chunks agree on; the first chunk (title page, recitals) breaks ties
+    types = [s.get('document_type') for s in summaries if s.get('document_type')]
+    if types:
+        summary['document_type'] = max(types, key=lambda t: (types.count(t), -types.index(t)))
+
+    summary['purpose'] = _merge_purposes([s.get('purpose') for s in summaries])
+
+    parties = []
+    for chunk_summary in summaries:
+        for party in chunk_summary.get('parties', []):
+            if party not in parties:
+                parties.append(party)
+    summary['parties'] = parties
+
+    merged = {'document_summary': summary}
+
+    for field, (key_field, limit) in MERGE_KEYS.items():
+        merged[field] = _merge_items([a.get(field) for a in analyses], key_field, limit)
+
+    merged['risk_analysis'] = {
+        field: _merge_items([a.get('risk_analysis', {}).get(field) for a in analyses], key_field, limit)
+        for field, (key_field, limit) in RISK_MERGE_KEYS.items()
+    }
+
+    return merged
+
+
 def get_analysis_summary(analysis: dict) -> str:
     """
     Generate a brief text summary of the analysis for TTS
@@ -1,19 +1,47 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
 import requests
+import copy
+import io
 import os
+import shutil
 import tempfile
 from dotenv import load_dotenv
 from document_processor import process_document
-from ai_analyzer import analyze_contract, get_analysis_summary
+from ai_analyzer import (write_question_message, get_route_metrics, llm_gateway, LLMUnavailableError,
+                         LLMRateLimitedError)
 from tts_generator import generate_audio, cleanup_audio_file
+from audio_encoding import choose_profile, encode_audio, get_audio_stats
+from document_session import (get_session, find_session, file_hash, page_key, analyze_session_pages,
+                              ChunkPipeline, ANALYSIS_PIPELINE)
+from single_flight import SingleFlight
+from admission import admission_controlled, client_id, get_admission_stats
+import bulk_analysis
+import resumable_uploads
+from upload_guard import GuardedRequest, check_upload_request
+from response_shaping import project_fields, compress_response
+from template_index import get_template_stats
+from heading_bundles import BUNDLE_VERSION, get_bundle
+import profiling
+from resource_governor import TEMP_PREFIX, get_governor_stats, start_governor
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 
+# Take the client address from X-Forwarded-For entries appended by our own proxies only;
+# anything before them is client-supplied
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+# Enforce upload limits and sniff file types while the body streams in
+app.request_class = GuardedRequest
+
 # Configure CORS - allow frontend from environment variable or defaults
 FRONTEND_URL = os.getenv('FRONTEND_URL', '')
 allowed_origins = [
@@ -31,6 +59,8 @@ CORS(app,
      origins=allowed_origins,
      supports_credentials=True,
      allow_headers=["Content-Type", "Authorization"],
+     # Non-safelisted response headers the frontend may read cross-origin
+     expose_headers=["X-Audio-Profile", "X-Audio-Source-Bytes", "X-Audio-Encode-Ms", "Retry-After"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
 LINGO_DEV_API_KEY = os.getenv('LINGO_DEV_API_KEY')
@@ -38,7 +68,12 @@ GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
 # File upload configuration
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'doc', 'png', 'jpg', 'jpeg', 'heic'}
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Coalesces identical concurrent /api/analyze requests
+analysis_flights = SingleFlight()
+
+# Evict idle caches, sweep orphaned temp files and watch memory in the background
+start_governor()
 
 
 def allowed_file(filename):
@@ -46,13 +81,340 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+@app.before_request
+def guard_uploads():
+    """Reject oversized or mistyped uploads before any view runs"""
+    check_upload_request(request)
+
+
+@app.after_request
+def compress_json(response):
+    """Compress JSON responses with brotli or gzip when the client accepts it"""
+    return compress_response(response, request.headers.get('Accept-Encoding'))
+
+
+@app.before_request
+def start_profile():
+    """Profile this request if it asks with X-Profile and the profiling token"""
+    profiling.begin_request_profile()
+
+
+@app.after_request
+def finish_profile(response):
+    """Write the request's profile (runs before compression)"""
+    return profiling.end_request_profile(response)
+
+
+@app.teardown_request
+def abandon_profile(error=None):
+    """Stop a profile left running by a request that failed before after_request"""
+    profiling.abandon_request_profile(error)
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({'success': False, 'error': e.description}), 413
+
+
+@app.errorhandler(UnsupportedMediaType)
+def upload_wrong_type(e):
+    return jsonify({'success': False, 'error': e.description}), 415
+
+
+@app.errorhandler(LLMUnavailableError)
+def llm_unavailable(e):
+    """Rate limit or circuit breaker: fail fast and tell the client when to come back"""
+    response = jsonify({'success': False, 'error': str(e)})
+    if e.retry_after:
+        response.headers['Retry-After'] = str(max(1, int(e.retry_after + 0.5)))
+    return response, 429 if isinstance(e, LLMRateLimitedError) else 503
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
     return jsonify({'status': 'ok', 'message': 'Backend is running'}), 200
 
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Runtime metrics: per-route LLM calls, latency and tokens, and LLM gateway counters"""
+    return jsonify({
+        'llm_routes': get_route_metrics(),
+        'llm_gateway': llm_gateway.get_stats(),
+        'analysis_dedup': analysis_flights.get_stats(),
+        'admission': get_admission_stats(),
+        'templates': get_template_stats(),
+        'resources': get_governor_stats(),
+        'audio': get_audio_stats(),
+        'resumable_uploads': resumable_uploads.get_upload_stats()
+    }), 200
+
+
+@app.route('/api/debug/profile/window', methods=['POST'])
+@profiling.profiling_required
+def profile_window():
+    """
+    Sample every thread of this worker for a time window (requires X-Profile-Token)
+
+    Expected request body (optional):
+    {
+        "seconds": 30,       // Window length, 1-300 (default: 30)
+        "interval": 0.005    // Seconds between samples
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get('seconds', 30))
+        interval = float(data.get('interval', profiling.PROFILE_SAMPLE_INTERVAL))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'seconds and interval must be numbers'}), 400
+
+    try:
+        path = profiling.profile_window(seconds, max(0.001, interval))
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+
+    return jsonify({'success': True, 'file': path, 'pid': os.getpid()}), 202
+
+
+@app.route('/api/debug/tracemalloc', methods=['POST', 'DELETE'])
+@profiling.profiling_required
+def tracemalloc_snapshot():
+    """
+    POST: start tracing if needed and write a snapshot plus an extraction-path report
+    DELETE: stop tracing (it slows allocations while on)
+    """
+    if request.method == 'DELETE':
+        profiling.stop_tracemalloc()
+        return jsonify({'success': True, 'tracing': False}), 200
+
+    result = profiling.take_snapshot(request.args.get('label', 'snapshot'))
+    return jsonify({'success': True, 'pid': os.getpid(), **result}), 200
+
+
+def run_analysis(uploads, document_language, explanation_language, extract_only, session_id, pipeline=False):
+    """
+    Extract and analyze saved uploads
+
+    Args:
+        uploads: List of (temp_path, filename, content_hash) in page order
+        document_language: Language code for OCR
+        explanation_language: Language for AI analysis output
+        extract_only: If true, skip AI analysis
+        session_id: Session from a previous response (None starts a new one)
+        pipeline: Analyze leading chunks while later pages are still extracting
+
+    Returns:
+        tuple: (response dict, HTTP status)
+    """
+    session = get_session(session_id)
+
+    # Requests on the same session take turns, so their page and chunk caches don't interleave
+    with session['lock']:
+        return _analyze_in_session(session, uploads, document_language, explanation_language, extract_only,
+                                   pipeline)
+
+
+def _analyze_in_session(session, uploads, document_language, explanation_language, extract_only, pipeline):
+    """run_analysis() with the session lock held"""
+    # Chunks are analyzed as pages complete instead of after the last one
+    chunk_pipeline = ChunkPipeline(session) if pipeline and not extract_only and GROQ_API_KEY else None
+
+    # Process each file
+    all_pages = []
+    page_keys = []
+    pages_reused = 0
+
+    for idx, (temp_path, filename, content_hash) in enumerate(uploads, 1):
+        print(f'💾 Page {idx}/{len(uploads)}: {filename}')
+
+        # Reuse the extraction if this exact page was processed in the session
+        key = page_key(content_hash, document_language, None)
+        page_keys.append(key)
+        result = session['pages'].get(key)
+
+        if result:
+            pages_reused += 1
+            print(f'♻️  Page {idx} unchanged, reusing extraction')
+        else:
+            # Process document
+            result = process_document(temp_path, document_language)
+
+            if not result['success']:
+                if chunk_pipeline:
+                    chunk_pipeline.cancel()
+                return {
+                    'success': False,
+                    'error': f'Failed to process page {idx} ({filename}): {result["error"]}'
+                }, 500
+
+            session['pages'][key] = result
+
+        if chunk_pipeline:
+            chunk_pipeline.add_page(result['text'])
+
+        # Store page result
+        all_pages.append({
+            'page_number': idx,
+            'filename': filename,
+            'text': result['text'],
+            'file_type': result['file_type'],
+            'extraction_method': result['method'],
+            'char_count': result['char_count'],
+            'detected_language': result['detected_language']
+        })
+
+        print(f'✓ Page {idx} complete: {result["char_count"]} characters')
+
+    # Forget extractions of pages that were removed or replaced
+    for key in [k for k in session['pages'] if k not in page_keys]:
+        del session['pages'][key]
+
+    # Combine all text with page breaks
+    combined_text = '\n\n--- PAGE BREAK ---\n\n'.join(
+        page['text'] for page in all_pages
+    )
+
+    # Calculate total characters
+    total_chars = sum(page['char_count'] for page in all_pages)
+
+    # Most common detected language across pages (None if undecided)
+    detected_languages = [page['detected_language'] for page in all_pages if page['detected_language']]
+    detected_language = max(set(detected_languages), key=detected_languages.count) if detected_languages else None
+
+    # Keep the text so it can be fetched by reference (text_mode=reference)
+    session['document'] = {
+        'extracted_text': combined_text,
+        'pages': [
+            {'page_number': page['page_number'], 'filename': page['filename'], 'text': page['text']}
+            for page in all_pages
+        ]
+    }
+
+    # Build response
+    response_data = {
+        'success': True,
+        'extracted_text': combined_text,
+        'total_pages': len(all_pages),
+        'pages': all_pages,
+        'metadata': {
+            'total_files': len(uploads),
+            'session_id': session['id'],
+            'pages_reused': pages_reused,
+            'total_char_count': total_chars,
+            'document_language': document_language,
+            'detected_language': detected_language,
+            'explanation_language': explanation_language,
+            'headings_version': BUNDLE_VERSION  # Fetch /api/headings with ?v= to cache bundles for good
+        }
+    }
+
+    # Phase 3: AI Analysis + Translation
+    if not extract_only and GROQ_API_KEY:
+        print('🤖 Starting AI analysis...')
+
+        # Step 1: Analyze with Groq (in English), reusing unchanged chunks
+        if chunk_pipeline:
+            ai_result = chunk_pipeline.finish()
+        else:
+            ai_result = analyze_session_pages(session, [page['text'] for page in all_pages])
+
+        if ai_result['success']:
+            analysis_english = ai_result['analysis']
+            print(f'✓ AI analysis complete (tokens: {ai_result.get("tokens_used", "N/A")})')
+
+            # Step 2: Translate analysis to explanation_language (if not English)
+            if explanation_language != 'en' and LINGO_DEV_API_KEY:
+                print(f'🔄 Translating analysis to {explanation_language}...')
+
+                try:
+                    # Prepare analysis for translation
+                    import uuid
+                    workflow_id = str(uuid.uuid4())
+
+                    translation_payload = {
+                        'params': {
+                            'workflowId': workflow_id,
+                            'fast': False  # Use quality mode for legal content
+                        },
+                        'locale': {
+                            'source': 'en',
+                            'target': explanation_language
+                        },
+                        'data': analysis_english
+                    }
+
+                    # Call Lingo.dev API
+                    translation_response = requests.post(
+                        LINGO_DEV_API_URL,
+                        json=translation_payload,
+                        headers={
+                            'Content-Type': 'application/json; charset=utf-8',
+                            'Authorization': f'Bearer {LINGO_DEV_API_KEY}'
+                        },
+                        timeout=60  # Longer timeout for translation
+                    )
+
+                    if translation_response.status_code == 200:
+                        analysis_translated = translation_response.json()
+                        print(f'✓ Translation to {explanation_language} complete')
+
+                        response_data['analysis'] = {
+                            'english': analysis_english,
+                            'translated': analysis_translated,
+                            'language': explanation_language
+                        }
+                    else:
+                        print(f'⚠️  Translation failed: {translation_response.status_code}')
+                        # Fallback to English only
+                        response_data['analysis'] = {
+                            'english': analysis_english,
+                            'translated': None,
+                            'language': 'en',
+                            'translation_error': f'Translation failed: {translation_response.status_code}'
+                        }
+
+                except Exception as e:
+                    print(f'⚠️  Translation error: {str(e)}')
+                    # Fallback to English only
+                    response_data['analysis'] = {
+                        'english': analysis_english,
+                        'translated': None,
+                        'language': 'en',
+                        'translation_error': str(e)
+                    }
+            else:
+                # No translation needed (English) or no Lingo.dev key
+                response_data['analysis'] = {
+                    'english': analysis_english,
+                    'translated': None,
+                    'language': 'en'
+                }
+
+            # Add metadata
+            response_data['analysis']['model_used'] = ai_result.get('model_used')
+            response_data['analysis']['escalated'] = ai_result.get('escalated')
+            response_data['analysis']['tokens_used'] = ai_result.get('tokens_used')
+            response_data['analysis']['input_tokens_saved'] = ai_result.get('input_tokens_saved')
+            response_data['analysis']['input_tokens_truncated'] = ai_result.get('input_tokens_truncated')
+            response_data['analysis']['chunks_total'] = ai_result.get('chunks_total')
+            response_data['analysis']['chunks_reused'] = ai_result.get('chunks_reused')
+            response_data['analysis']['pipelined'] = chunk_pipeline is not None
+
+        else:
+            print(f'❌ AI analysis failed: {ai_result.get("error")}')
+            response_data['analysis'] = {
+                'success': False,
+                'error': ai_result.get('error')
+            }
+
+    print(f'✓ Analysis complete: {len(uploads)} page(s), {total_chars} total characters')
+    return response_data, 200
+
+
 @app.route('/api/analyze', methods=['POST'])
+@admission_controlled('analyze')
 def analyze():
     """
     Analyze uploaded document(s) - supports single or multiple files
@@ -63,15 +425,27 @@ def analyze():
     - document_language: Language code for OCR (default: 'en')
     - explanation_language: Language for AI analysis output (default: 'en')
     - extract_only: If true, only extract text without AI analysis (default: true for now)
+    - session_id: Session from a previous response; unchanged pages and chunks are reused
+    - pipeline: If true, analyze leading pages while later pages are still being
+      extracted, in smaller chunks (PIPELINE_CHUNK_CHARS, so more LLM calls)
+      (default: ANALYSIS_PIPELINE env var)
+    - upload_ids[]: Completed resumable uploads (see /api/uploads), added after files[]
+    - fields: Comma-separated top-level response keys to return (default: all)
+    - omit: Comma-separated dotted paths to drop, e.g. 'pages.text,analysis.english'
+    - text_mode: 'inline' (default) or 'reference' - return a text_url instead of
+      extracted_text and page texts; fetch it from /api/sessions/<id>/text
     """
     try:
         # Get language parameters
         document_language = request.form.get('document_language', request.form.get('language', 'en'))  # Fallback to 'language' for backward compatibility
         explanation_language = request.form.get('explanation_language', 'en')
         extract_only = request.form.get('extract_only', 'true').lower() == 'true'
+        session_id = request.form.get('session_id')
+        pipeline = request.form.get('pipeline', str(ANALYSIS_PIPELINE)).lower() == 'true'
 
         # Check for multiple files (new format)
         files = request.files.getlist('files[]')
+        upload_ids = request.form.getlist('upload_ids[]')
 
         # Fallback to single file (backwards compatibility)
         if not files:
@@ -79,7 +453,7 @@ def analyze():
             if single_file:
                 files = [single_file]
 
-        if not files or len(files) == 0:
+        if not files and not upload_ids:
             return jsonify({'error': 'No files provided'}), 400
 
         # Validate all files
@@ -91,161 +465,63 @@ def analyze():
                     'error': f'File type not allowed: {file.filename}. Supported: {", ".join(ALLOWED_EXTENSIONS)}'
                 }), 400
 
-        print(f'📄 Analyzing {len(files)} file(s)')
+        print(f'📄 Analyzing {len(files) + len(upload_ids)} file(s)')
         print(f'📄 Document Language: {document_language}')
         print(f'💬 Explanation Language: {explanation_language}')
 
-        # Process each file
-        all_pages = []
+        uploads = []
         temp_paths = []
 
         try:
-            for idx, file in enumerate(files, 1):
+            # Save all files first so identical submissions can be recognized
+            for file in files:
                 filename = secure_filename(file.filename)
 
                 # Save file temporarily
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1])
+                temp_file = tempfile.NamedTemporaryFile(prefix=TEMP_PREFIX, delete=False, suffix=os.path.splitext(filename)[1])
                 temp_path = temp_file.name
                 temp_paths.append(temp_path)
 
                 file.save(temp_path)
-                print(f'💾 Page {idx}/{len(files)}: {filename}')
-
-                # Process document
-                result = process_document(temp_path, document_language)
-
-                if not result['success']:
-                    return jsonify({
-                        'success': False,
-                        'error': f'Failed to process page {idx} ({filename}): {result["error"]}'
-                    }), 500
-
-                # Store page result
-                all_pages.append({
-                    'page_number': idx,
-                    'filename': filename,
-                    'text': result['text'],
-                    'file_type': result['file_type'],
-                    'extraction_method': result['method'],
-                    'char_count': result['char_count']
-                })
-
-                print(f'✓ Page {idx} complete: {result["char_count"]} characters')
-
-            # Combine all text with page breaks
-            combined_text = '\n\n--- PAGE BREAK ---\n\n'.join(
-                page['text'] for page in all_pages
+                uploads.append((temp_path, filename, file_hash(temp_path)))
+
+            # Then pages that arrived through resumable uploads
+            for upload_id in upload_ids:
+                try:
+                    temp_path, filename = resumable_uploads.completed_upload_path(upload_id)
+                except resumable_uploads.UploadError as e:
+                    return jsonify({'error': str(e)}), e.status
+                temp_paths.append(temp_path)
+                uploads.append((temp_path, filename, file_hash(temp_path)))
+
+            # Identical concurrent submissions (double clicks, shared links) share one run
+            flight_key = '|'.join([
+                *(content_hash for _, _, content_hash in uploads),
+                document_language, explanation_language, str(extract_only), session_id or '', str(pipeline)
+            ])
+            (response_data, status), shared = analysis_flights.do(
+                flight_key,
+                lambda: run_analysis(uploads, document_language, explanation_language, extract_only, session_id,
+                                     pipeline)
             )
 
-            # Calculate total characters
-            total_chars = sum(page['char_count'] for page in all_pages)
-
-            # Build response
-            response_data = {
-                'success': True,
-                'extracted_text': combined_text,
-                'total_pages': len(all_pages),
-                'pages': all_pages,
-                'metadata': {
-                    'total_files': len(files),
-                    'total_char_count': total_chars,
-                    'document_language': document_language,
-                    'explanation_language': explanation_language
-                }
-            }
-
-            # Phase 3: AI Analysis + Translation
-            if not extract_only and GROQ_API_KEY:
-                print('🤖 Starting AI analysis...')
-
-                # Step 1: Analyze with Groq (in English)
-                ai_result = analyze_contract(combined_text)
-
-                if ai_result['success']:
-                    analysis_english = ai_result['analysis']
-                    print(f'✓ AI analysis complete (tokens: {ai_result.get("tokens_used", "N/A")})')
-
-                    # Step 2: Translate analysis to explanation_language (if not English)
-                    if explanation_language != 'en' and LINGO_DEV_API_KEY:
-                        print(f'🔄 Translating analysis to {explanation_language}...')
-
-                        try:
-                            # Prepare analysis for translation
-                            import uuid
-                            workflow_id = str(uuid.uuid4())
-
-                            translation_payload = {
-                                'params': {
-                                    'workflowId': workflow_id,
-                                    'fast': False  # Use quality mode for legal content
-                                },
-                                'locale': {
-                                    'source': 'en',
-                                    'target': explanation_language
-                                },
-                                'data': analysis_english
-                            }
-
-                            # Call Lingo.dev API
-                            translation_response = requests.post(
-                                LINGO_DEV_API_URL,
-                                json=translation_payload,
-                                headers={
-                                    'Content-Type': 'application/json; charset=utf-8',
-                                    'Authorization': f'Bearer {LINGO_DEV_API_KEY}'
-                                },
-                                timeout=60  # Longer timeout for translation
-                            )
-
-                            if translation_response.status_code == 200:
-                                analysis_translated = translation_response.json()
-                                print(f'✓ Translation to {explanation_language} complete')
-
-                                response_data['analysis'] = {
-                                    'english': analysis_english,
-                                    'translated': analysis_translated,
-                                    'language': explanation_language
-                                }
-                            else:
-                                print(f'⚠️  Translation failed: {translation_response.status_code}')
-                                # Fallback to English only
-                                response_data['analysis'] = {
-                                    'english': analysis_english,
-                                    'translated': None,
-                                    'language': 'en',
-                                    'translation_error': f'Translation failed: {translation_response.status_code}'
-                                }
-
-                        except Exception as e:
-                            print(f'⚠️  Translation error: {str(e)}')
-                            # Fallback to English only
-                            response_data['analysis'] = {
-                                'english': analysis_english,
-                                'translated': None,
-                                'language': 'en',
-                                'translation_error': str(e)
-                            }
-                    else:
-                        # No translation needed (English) or no Lingo.dev key
-                        response_data['analysis'] = {
-                            'english': analysis_english,
-                            'translated': None,
-                            'language': 'en'
-                        }
+            if shared:
+                print('♻️  Identical analysis already in progress, shared its result')
 
-                    # Add metadata
-                    response_data['analysis']['model_used'] = ai_result.get('model_used')
-                    response_data['analysis']['tokens_used'] = ai_result.get('tokens_used')
+            fields = request.form.get('fields', request.args.get('fields'))
+            omit = request.form.get('omit', request.args.get('omit'))
+            text_mode = request.form.get('text_mode', request.args.get('text_mode', 'inline'))
 
-                else:
-                    print(f'❌ AI analysis failed: {ai_result.get("error")}')
-                    response_data['analysis'] = {
-                        'success': False,
-                        'error': ai_result.get('error')
-                    }
+            if response_data.get('success') and (fields or omit or text_mode == 'reference'):
+                # The result may be shared with other requests - shape a copy
+                response_data = copy.deepcopy(response_data)
+                if text_mode == 'reference':
+                    text_session_id = response_data['metadata']['session_id']
+                    response_data['text_url'] = f'/api/sessions/{text_session_id}/text'
+                    omit = ','.join(filter(None, [omit, 'extracted_text', 'pages.text']))
+                project_fields(response_data, fields, omit)
 
-            print(f'✓ Analysis complete: {len(files)} page(s), {total_chars} total characters')
-            return jsonify(response_data), 200
+            return jsonify(response_data), status
 
         finally:
             # Clean up all temp files
@@ -254,12 +530,187 @@ def analyze():
                     os.remove(temp_path)
             print(f'🗑️  Cleaned up {len(temp_paths)} temp file(s)')
 
+    except LLMUnavailableError:
+        raise  # 429/503 with Retry-After (see llm_unavailable)
     except Exception as e:
         print(f'❌ Analysis error: {str(e)}')
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/sessions/<session_id>/text', methods=['GET'])
+def session_text(session_id):
+    """
+    Extracted text of a session's latest analysis (for text_mode=reference)
+
+    Query parameters:
+    - page: Page number to return alone (default: all pages)
+    """
+    session = find_session(session_id)
+    if not session or 'document' not in session:
+        return jsonify({'error': 'Session not found or expired'}), 404
+
+    # Replaced whole by each analysis, so it can be read without waiting for the session lock
+    document = session['document']
+    page_number = request.args.get('page', type=int)
+    if page_number is not None:
+        pages = [p for p in document['pages'] if p['page_number'] == page_number]
+        if not pages:
+            return jsonify({'error': f'Page {page_number} not found'}), 404
+        return jsonify({'success': True, 'page': pages[0]}), 200
+
+    return jsonify({'success': True, **document}), 200
+
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """
+    Start a chunked, resumable upload (for large scans on flaky connections)
+
+    Expected request body:
+    {
+        "filename": "scan.pdf",
+        "size": 31457280  // Total bytes
+    }
+
+    Returns: upload_id, received offset and suggested chunk_size
+    """
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': f'File type not allowed. Supported: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
+    if not isinstance(size, int):
+        return jsonify({'error': 'Missing required field: size'}), 400
+
+    try:
+        return jsonify(resumable_uploads.create_upload(filename, size, client_id())), 201
+    except resumable_uploads.UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET', 'PUT'])
+def upload_chunk(upload_id):
+    """
+    GET: current upload status (resume from 'received')
+    PUT ?offset=<bytes received>: append the raw request body as the next chunk
+    """
+    try:
+        if request.method == 'GET':
+            return jsonify(resumable_uploads.upload_status(resumable_uploads.get_upload(upload_id))), 200
+
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': 'Missing required query parameter: offset'}), 400
+
+        status = resumable_uploads.append_chunk(upload_id, offset, request.stream, request.content_length)
+        return jsonify(status), 200
+
+    except resumable_uploads.UploadError as e:
+        body = {'error': str(e)}
+        if e.received is not None:
+            body['received'] = e.received
+        return jsonify(body), e.status
+
+
+def bulk_busy_response(message):
+    """503 with Retry-After for a bulk job over BULK_MAX_ACTIVE_JOBS"""
+    response = jsonify({'success': False, 'error': message})
+    response.headers['Retry-After'] = '60'
+    return response, 503
+
+
+@app.route('/api/bulk/analyze', methods=['POST'])
+def bulk_analyze():
+    """
+    Analyze many separate contracts in one request, streaming results as NDJSON
+
+    Expected multipart/form-data:
+    - archive: ZIP file of documents (optional)
+    - files[]: Document files (optional, combined with the archive)
+    - document_language: Language code for OCR (default: 'en')
+    - extract_only: If true, only extract text (default: false)
+
+    Returns: application/x-ndjson stream - a 'job' line with the job_id, one
+    'result' line per document as it finishes (with a 'seq' number), then a
+    'done' line. If the connection drops, the job keeps running; resume with
+    GET /api/bulk/<job_id>/results?after=<last seq>.
+
+    Not admission-gated: documents run on the bulk module's own fixed worker
+    pools (see bulk_analysis), and at most BULK_MAX_ACTIVE_JOBS jobs at once.
+    """
+    try:
+        document_language = request.form.get('document_language', 'en')
+        extract_only = request.form.get('extract_only', 'false').lower() == 'true'
+        archive = request.files.get('archive')
+        files = request.files.getlist('files[]')
+
+        if not archive and not files:
+            return jsonify({'error': 'No archive or files provided'}), 400
+
+        # Cheap early rejection before saving the upload; start_job enforces the limit
+        if bulk_analysis.active_job_count() >= bulk_analysis.BULK_MAX_ACTIVE_JOBS:
+            return bulk_busy_response('Too many bulk jobs running, please try again later')
+
+        work_dir = bulk_analysis.new_work_dir()
+        documents = []
+
+        try:
+            if archive:
+                archive_path = os.path.join(work_dir, 'upload.zip')
+                archive.save(archive_path)
+                documents.extend(bulk_analysis.unpack_archive(archive_path, work_dir, ALLOWED_EXTENSIONS))
+                os.remove(archive_path)
+
+            for idx, file in enumerate(files, 1):
+                if not file.filename or not allowed_file(file.filename):
+                    continue
+                filename = secure_filename(file.filename) or f'document_{idx}'
+                path = os.path.join(work_dir, f'f{idx:05d}_{filename}')
+                file.save(path)
+                documents.append((filename, path))
+
+            if not documents:
+                raise ValueError(f'No supported documents found. Supported: {", ".join(ALLOWED_EXTENSIONS)}')
+            if len(documents) > bulk_analysis.BULK_MAX_DOCUMENTS:
+                raise ValueError(f'Too many documents (max {bulk_analysis.BULK_MAX_DOCUMENTS})')
+
+        except Exception as e:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if isinstance(e, ValueError):
+                return jsonify({'error': str(e)}), 400
+            raise
+
+        try:
+            job = bulk_analysis.start_job(work_dir, documents, document_language, extract_only)
+        except bulk_analysis.TooManyJobsError as e:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return bulk_busy_response(str(e))
+        return Response(job.stream(), mimetype='application/x-ndjson', headers={'X-Job-Id': job.id})
+
+    except Exception as e:
+        print(f'❌ Bulk analysis error: {str(e)}')
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/bulk/<job_id>/results', methods=['GET'])
+def bulk_results(job_id):
+    """
+    Resume a bulk job's NDJSON result stream
+
+    Query parameters:
+    - after: Last 'seq' the client received (default: 0, replays everything)
+    """
+    job = bulk_analysis.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Bulk job not found or expired'}), 404
+
+    after = request.args.get('after', 0, type=int)
+    return Response(job.stream(after=max(0, after)), mimetype='application/x-ndjson')
+
+
 @app.route('/api/translate', methods=['POST'])
+@admission_controlled('translate')
 def translate():
     """
     Translate content using Lingo.dev API
@@ -354,7 +805,39 @@ def translate():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/headings/<locale>', methods=['GET'])
+def headings(locale):
+    """
+    Translated UI headings for the analysis page
+
+    Bundles are built once per language and served from memory. Clients
+    revalidate with the ETag; requests carrying the current version as
+    ?v=<version> may be cached forever.
+    """
+    try:
+        bundle = get_bundle(locale)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        print(f'❌ Heading bundle error for {locale}: {str(e)}')
+        return jsonify({'success': False, 'error': 'Headings are not available for this language yet'}), 503
+
+    response = jsonify({
+        'success': True,
+        'locale': locale,
+        'version': BUNDLE_VERSION,
+        'headings': bundle
+    })
+    response.set_etag(f'{BUNDLE_VERSION}-{locale}', weak=True)
+    if request.args.get('v') == BUNDLE_VERSION:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response.make_conditional(request)
+
+
 @app.route('/api/generate-audio', methods=['POST'])
+@admission_controlled('audio')
 def generate_audio_endpoint():
     """
     Generate TTS audio from text using Edge TTS
@@ -363,10 +846,16 @@ def generate_audio_endpoint():
     {
         "text": "string",  // Text to convert to speech
         "language": "en",  // Language code (default: 'en')
-        "rate": "+0%"      // Speech rate (optional, default: '+0%')
+        "rate": "+0%",     // Speech rate (optional, default: '+0%')
+        "profile": "opus-low"  // Output profile (optional): opus-low, opus, mp3-low, original
     }
 
-    Returns: Audio file (MP3)
+    Without a profile, the Accept header picks one (audio/ogg -> opus-low,
+    audio/mpeg -> mp3-low), else AUDIO_DEFAULT_PROFILE.
+
+    Returns: Audio file (Ogg Opus or MP3). X-Audio-Profile names the profile
+    served, X-Audio-Source-Bytes the size before encoding, X-Audio-Encode-Ms
+    the encode time.
     """
     try:
         data = request.get_json()
@@ -381,26 +870,40 @@ def generate_audio_endpoint():
         if not text:
             return jsonify({'error': 'Missing required field: text'}), 400
 
+        try:
+            profile = choose_profile(data.get('profile'), request.headers.get('Accept'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         print(f'🔊 Generating audio in {language}...')
 
         # Generate audio
         audio_path = generate_audio(text, language, rate)
 
         if audio_path and os.path.exists(audio_path):
-            print(f'✓ Sending audio file: {os.path.getsize(audio_path)} bytes')
+            encoded = encode_audio(audio_path, profile)
+            print(f'✓ Sending audio file: {encoded["bytes"]} bytes ({encoded["profile"]})')
+
+            # Speech audio is small: read it and delete the temp files now. (call_on_close
+            # never fires for send_file's direct-passthrough responses.)
+            try:
+                with open(encoded['path'], 'rb') as f:
+                    audio = io.BytesIO(f.read())
+            finally:
+                cleanup_audio_file(audio_path)
+                if encoded['path'] != audio_path:
+                    cleanup_audio_file(encoded['path'])
 
-            # Send file and clean up after
             response = send_file(
-                audio_path,
-                mimetype='audio/mpeg',
+                audio,
+                mimetype=encoded['mimetype'],
                 as_attachment=True,
-                download_name=f'analysis_audio_{language}.mp3'
+                download_name=f'analysis_audio_{language}.{encoded["extension"]}'
             )
-
-            # Schedule cleanup after sending
-            @response.call_on_close
-            def cleanup():
-                cleanup_audio_file(audio_path)
+            response.headers['X-Audio-Profile'] = encoded['profile']
+            response.headers['X-Audio-Source-Bytes'] = str(encoded['source_bytes'])
+            response.headers['X-Audio-Encode-Ms'] = str(encoded['encode_ms'])
+            response.vary.add('Accept')
 
             return response
         else:
@@ -412,6 +915,7 @@ def generate_audio_endpoint():
 
 
 @app.route('/api/generate-question-message', methods=['POST'])
+@admission_controlled('question')
 def generate_question_message():
     """
     Generate a formal WhatsApp/Email message for a question using Groq AI
@@ -426,8 +930,6 @@ def generate_question_message():
     Returns: Formatted message ready to send
     """
     try:
-        from groq import Groq
-
         data = request.get_json()
         if not data:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
@@ -441,43 +943,17 @@ def generate_question_message():
 
         print(f'📧 Generating formal message for question in {language}...')
 
-        # Create Groq client
-        groq_client = Groq(api_key=GROQ_API_KEY)
-
-        # System prompt for formal message generation
-        prompt = f"""You are helping someone write a professional, polite message to ask a question about a {document_type} they're about to sign.
-
-Generate a complete, ready-to-send message (WhatsApp/Email format) that:
-1. Has a professional greeting
-2. Briefly mentions the context (reviewing the {document_type})
-3. Asks the specific question politely
-4. Requests clarification
-5. Ends with a professional closing
-
-The question to ask: "{question}"
-
-Language: {"English" if language == "en" else language}
-
-Make it formal but friendly, concise (3-4 sentences max), and ready to copy-paste.
-DO NOT include subject line or email headers - just the message body.
-"""
-
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=300
-        )
-
-        formatted_message = response.choices[0].message.content.strip()
+        result = write_question_message(question, document_type, language)
 
         print(f'✓ Formal message generated')
 
         return jsonify({
             'success': True,
-            'message': formatted_message
+            'message': result['message']
         }), 200
 
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
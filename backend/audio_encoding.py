@@ -0,0 +1,200 @@
+"""
+Speech-tuned audio output profiles for AgreeWise
+gTTS always returns 32 kbps MP3. Speech stays intelligible at much lower
+bitrates, especially with Opus, so /api/generate-audio re-encodes the
+narration to a mono profile the client can play, using PyAV (FFmpeg's
+codecs, bundled in the wheel). Encoding runs in a small worker pool; the
+request thread only waits for the result. Without PyAV, or if an encode
+fails, the original MP3 is sent.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+try:
+    import av
+except ImportError:  # Optional - the gTTS MP3 is sent as-is without it
+    av = None
+
+from resource_governor import TEMP_PREFIX
+
+AUDIO_ENCODE_WORKERS = int(os.getenv('AUDIO_ENCODE_WORKERS', 2))
+AUDIO_ENCODE_TIMEOUT_SECONDS = float(os.getenv('AUDIO_ENCODE_TIMEOUT_SECONDS', 30))
+AUDIO_DEFAULT_PROFILE = os.getenv('AUDIO_DEFAULT_PROFILE', 'mp3-low')
+
+ORIGINAL_PROFILE = 'original'
+
+# Mono speech profiles; bitrate in bits per second ('original' is the gTTS MP3,
+# 32 kbps at 24 kHz)
+AUDIO_PROFILES = {
+    'opus-low': {'codec': 'libopus', 'container': 'ogg', 'mimetype': 'audio/ogg', 'extension': 'ogg',
+                 'bitrate': 12000, 'sample_rate': 16000},
+    'opus': {'codec': 'libopus', 'container': 'ogg', 'mimetype': 'audio/ogg', 'extension': 'ogg',
+             'bitrate': 20000, 'sample_rate': 24000},
+    'mp3-low': {'codec': 'libmp3lame', 'container': 'mp3', 'mimetype': 'audio/mpeg', 'extension': 'mp3',
+                'bitrate': 24000, 'sample_rate': 16000},
+    ORIGINAL_PROFILE: {'codec': None, 'container': 'mp3', 'mimetype': 'audio/mpeg', 'extension': 'mp3'},
+}
+
+# Profile used for each media type in an Accept header
+ACCEPT_PROFILES = {
+    'audio/ogg': 'opus-low',
+    'audio/opus': 'opus-low',
+    'audio/mpeg': 'mp3-low',
+    'audio/mp3': 'mp3-low',
+}
+
+if AUDIO_DEFAULT_PROFILE not in AUDIO_PROFILES:
+    print(f'⚠️  Unknown AUDIO_DEFAULT_PROFILE {AUDIO_DEFAULT_PROFILE}, using {ORIGINAL_PROFILE}')
+    AUDIO_DEFAULT_PROFILE = ORIGINAL_PROFILE
+
+_encode_pool = ThreadPoolExecutor(max_workers=AUDIO_ENCODE_WORKERS, thread_name_prefix='audio-encode')
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def encoding_available() -> bool:
+    return av is not None
+
+
+def choose_profile(requested: str = None, accept: str = None) -> str:
+    """
+    Pick an output profile: an explicit profile name wins, then the Accept header
+
+    Args:
+        requested: Profile name from the request body, if any
+        accept: Accept header value
+
+    Returns:
+        str: A key of AUDIO_PROFILES
+
+    Raises:
+        ValueError: If an explicit profile name is unknown
+    """
+    if requested:
+        if requested not in AUDIO_PROFILES:
+            raise ValueError(f'Unknown audio profile: {requested} (use one of {", ".join(AUDIO_PROFILES)})')
+        return requested
+
+    best, best_quality = None, 0.0
+    for part in (accept or '').split(','):
+        media_type, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            if param.strip().startswith('q='):
+                try:
+                    quality = float(param.strip()[2:])
+                except ValueError:
+                    quality = 0.0
+        profile = ACCEPT_PROFILES.get(media_type.strip().lower())
+        if profile and quality > best_quality:
+            best, best_quality = profile, quality
+
+    return best or AUDIO_DEFAULT_PROFILE
+
+
+def _transcode(source_path: str, profile: dict) -> str:
+    """Re-encode an audio file to a mono profile; returns the new file's path"""
+    temp_file = tempfile.NamedTemporaryFile(prefix=TEMP_PREFIX, delete=False, suffix=f'.{profile["extension"]}')
+    output_path = temp_file.name
+    temp_file.close()
+
+    try:
+        with av.open(source_path) as source, av.open(output_path, 'w', format=profile['container']) as output:
+            out_stream = output.add_stream(profile['codec'], rate=profile['sample_rate'], layout='mono')
+            out_stream.bit_rate = profile['bitrate']
+            # The encoder resamples and reframes (Opus needs 20 ms frames) on its own
+            for frame in source.decode(audio=0):
+                frame.pts = None
+                for packet in out_stream.encode(frame):
+                    output.mux(packet)
+            for packet in out_stream.encode(None):
+                output.mux(packet)
+    except Exception:
+        os.remove(output_path)
+        raise
+
+    return output_path
+
+
+def _remove_late_output(future) -> None:
+    """Delete the file of an encode that finished after its request gave up on it"""
+    if not future.cancelled() and future.exception() is None:
+        os.remove(future.result())
+
+
+def _record(profile_name: str, source_bytes: int, output_bytes: int, encode_ms: float, failed: bool) -> None:
+    with _stats_lock:
+        entry = _stats.setdefault(profile_name, {
+            'responses': 0, 'failures': 0, 'source_bytes': 0, 'output_bytes': 0, 'encode_ms': 0.0
+        })
+        entry['responses'] += 1
+        entry['failures'] += int(failed)
+        entry['source_bytes'] += source_bytes
+        entry['output_bytes'] += output_bytes
+        entry['encode_ms'] += encode_ms
+
+
+def encode_audio(source_path: str, profile_name: str) -> dict:
+    """
+    Encode a generated MP3 to an output profile in the encode pool
+
+    Falls back to the source file if PyAV is missing, the encode fails or
+    times out, or the result isn't smaller than the source.
+
+    Returns:
+        dict: path, profile (actually served), mimetype, extension,
+              source_bytes, bytes, encode_ms
+    """
+    source_bytes = os.path.getsize(source_path)
+    result = {'path': source_path, 'profile': ORIGINAL_PROFILE, 'source_bytes': source_bytes,
+              'bytes': source_bytes, 'encode_ms': 0.0}
+    profile = AUDIO_PROFILES[profile_name]
+
+    failed = False
+    if profile['codec'] and encoding_available():
+        start = time.perf_counter()
+        future = _encode_pool.submit(_transcode, source_path, profile)
+        try:
+            output_path = future.result(timeout=AUDIO_ENCODE_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            failed = True
+            print(f'⚠️  Audio encode to {profile_name} timed out, sending the original MP3')
+            future.add_done_callback(_remove_late_output)
+        except Exception as e:
+            failed = True
+            print(f'⚠️  Audio encode to {profile_name} failed, sending the original MP3: {str(e)}')
+        else:
+            output_bytes = os.path.getsize(output_path)
+            result['encode_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            if output_bytes < source_bytes:
+                result.update(path=output_path, profile=profile_name, bytes=output_bytes)
+            else:
+                os.remove(output_path)
+
+    served = AUDIO_PROFILES[result['profile']]
+    result.update(mimetype=served['mimetype'], extension=served['extension'])
+    _record(profile_name, source_bytes, result['bytes'], result['encode_ms'], failed)
+    print(f'🎚️  Audio {result["profile"]}: {source_bytes} -> {result["bytes"]} bytes in {result["encode_ms"]} ms')
+    return result
+
+
+def get_audio_stats() -> dict:
+    """Per requested profile: responses, bytes before/after and encode time, for /api/metrics"""
+    with _stats_lock:
+        profiles = {}
+        for name, entry in _stats.items():
+            profiles[name] = {
+                **entry,
+                'encode_ms': round(entry['encode_ms'], 1),
+                'avg_encode_ms': round(entry['encode_ms'] / entry['responses'], 1) if entry['responses'] else 0.0,
+                'size_ratio': round(entry['output_bytes'] / entry['source_bytes'], 3) if entry['source_bytes'] else None,
+            }
+    return {
+        'encoder_available': encoding_available(),
+        'default_profile': AUDIO_DEFAULT_PROFILE,
+        'profiles': profiles
+    }
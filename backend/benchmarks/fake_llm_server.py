@@ -0,0 +1,175 @@
+"""
+Fake Groq-compatible server for exercising the LLM gateway
+Injects 429 rate-limit responses, 5xx errors and slow responses on demand
+
+Usage (from backend/):
+    # Serve only, then point the backend at it with GROQ_BASE_URL=http://127.0.0.1:8765
+    python benchmarks/fake_llm_server.py --port 8765 --rate-429 0.2 --slow-rate 0.1
+
+    # Start the server and drive the gateway with concurrent requests
+    python benchmarks/fake_llm_server.py --self-test --requests 40 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FAKE_ANALYSIS = {
+    'document_summary': {
+        'document_type': 'Rental Lease',
+        'parties': ['You (Tenant)', 'Landlord'],
+        'purpose': 'This agreement lets you rent the apartment for $1000 per month.'
+    },
+    'key_clauses': [],
+    'risk_analysis': {'red_flags': [], 'yellow_flags': [], 'positive_terms': []},
+    'your_obligations': [],
+    'your_rights': [],
+    'questions_to_ask': []
+}
+
+
+def make_handler(options):
+    """Build a request handler class bound to the fault-injection options"""
+
+    class FakeGroqHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+            if not self.path.endswith('/chat/completions'):
+                self._send_json(404, {'error': {'message': 'Not found'}})
+                return
+
+            roll = random.random()
+            if roll < options.rate_429:
+                self._send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'rate_limit'}},
+                                {'retry-after': str(options.retry_after)})
+                return
+            if roll < options.rate_429 + options.rate_500:
+                self._send_json(500, {'error': {'message': 'Internal error'}})
+                return
+            if random.random() < options.slow_rate:
+                time.sleep(options.slow_seconds)
+            else:
+                time.sleep(options.latency)
+
+            if request.get('response_format', {}).get('type') == 'json_object':
+                if request.get('model') in getattr(options, 'invalid_json_models', ()):
+                    self._send_json(400, {'error': {
+                        'message': 'Failed to generate JSON. Please adjust your prompt.',
+                        'type': 'invalid_request_error', 'code': 'json_validate_failed',
+                        'failed_generation': '{"summary": "Truncated'
+                    }})
+                    return
+                content = json.dumps(FAKE_ANALYSIS)
+            else:
+                content = 'Hello, could you please clarify this clause? Thank you.'
+
+            self._send_json(200, {
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'fake'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': 100, 'completion_tokens': 50, 'total_tokens': 150}
+            }, {
+                'x-ratelimit-remaining-requests': '100',
+                'x-ratelimit-reset-requests': '1s',
+                'x-ratelimit-remaining-tokens': '10000',
+                'x-ratelimit-reset-tokens': '1s'
+            })
+
+    return FakeGroqHandler
+
+
+def self_test(options, server_url):
+    """Drive the gateway against the fake server and print its counters"""
+    os.environ['GROQ_BASE_URL'] = server_url
+    os.environ.setdefault('GROQ_API_KEY', 'fake-key')
+    os.environ.setdefault('LLM_RETRY_BASE_SECONDS', '0.05')
+    os.environ.setdefault('LLM_REQUESTS_PER_MINUTE', '6000')
+
+    from ai_analyzer import llm_gateway  # Reads GROQ_BASE_URL at import
+
+    def one_request(_):
+        start = time.perf_counter()
+        try:
+            llm_gateway.chat_completion(
+                model='fake-model',
+                messages=[{'role': 'user', 'content': 'ping'}],
+                max_tokens=10
+            )
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+        results = list(pool.map(one_request, range(options.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = [error for _, error in results if error]
+    print(f'{options.requests} requests in {elapsed:.2f}s, {len(errors)} failed')
+    print(f'p50 {latencies[len(latencies) // 2]:.3f}s  p95 {latencies[int(len(latencies) * 0.95) - 1]:.3f}s  '
+          f'max {latencies[-1]:.3f}s')
+    print(f'gateway: {llm_gateway.get_stats()}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Groq server with fault injection')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate-429', type=float, default=0.2, help='Fraction of requests answered with 429')
+    parser.add_argument('--rate-500', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--retry-after', type=float, default=0.2, help='retry-after seconds on 429')
+    parser.add_argument('--latency', type=float, default=0.05, help='Normal response time in seconds')
+    parser.add_argument('--slow-rate', type=float, default=0.1, help='Fraction of slow responses')
+    parser.add_argument('--slow-seconds', type=float, default=2.0, help='Slow response time in seconds')
+    parser.add_argument('--invalid-json-model', dest='invalid_json_models', action='append', default=[],
+                        help='Answer JSON mode requests for this model with 400 json_validate_failed (repeatable)')
+    parser.add_argument('--self-test', action='store_true', help='Drive the gateway against the server')
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8)
+    options = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', options.port), make_handler(options))
+    server_url = f'http://127.0.0.1:{options.port}'
+
+    if not options.self_test:
+        print(f'Fake Groq server on {server_url} (Ctrl+C to stop)')
+        server.serve_forever()
+        return
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        self_test(options, server_url)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
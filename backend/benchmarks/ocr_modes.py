@@ -0,0 +1,70 @@
+"""
+OCR mode benchmark for AgreeWise
+Compares latency and accuracy of each OCR profile on the test_agreements corpus
+
+Usage (from backend/):
+    python benchmarks/ocr_modes.py [--modes accurate,fast,fast_nodetect] [--runs 3]
+
+Accuracy is the character-level similarity of each mode's text against the
+accurate mode's text for the same file (1.0 = identical).
+"""
+
+import argparse
+import difflib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_processor import OCR_PROFILES, clean_text, ocr_image, ocr_pdf  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'test_agreements')
+
+
+def run_ocr(file_path, mode, language='en'):
+    """Run OCR on one corpus file and return cleaned text"""
+    if file_path.lower().endswith('.pdf'):
+        return clean_text(ocr_pdf(file_path, language, mode))
+    return clean_text(ocr_image(file_path, language, mode))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare OCR modes on test_agreements')
+    parser.add_argument('--modes', default=','.join(OCR_PROFILES), help='Comma-separated OCR modes')
+    parser.add_argument('--runs', type=int, default=1, help='Timed runs per file and mode')
+    parser.add_argument('--language', default='en', help='Document language code')
+    args = parser.parse_args()
+
+    modes = args.modes.split(',')
+    files = sorted(
+        os.path.join(CORPUS_DIR, name) for name in os.listdir(CORPUS_DIR)
+        if name.lower().endswith(('.png', '.jpg', '.jpeg', '.pdf'))
+    )
+
+    results = {}
+    for mode in ['accurate'] + [m for m in modes if m != 'accurate']:
+        # Warm up so model loading stays outside the timed section
+        run_ocr(files[0], mode, args.language)
+
+        for file_path in files:
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                text = run_ocr(file_path, mode, args.language)
+                timings.append(time.perf_counter() - start)
+            results[(mode, file_path)] = (min(timings), text)
+
+    print()
+    print(f'{"file":<45} {"mode":<15} {"seconds":>8} {"speedup":>8} {"accuracy":>9}')
+    for file_path in files:
+        base_time, base_text = results[('accurate', file_path)]
+        for mode in modes:
+            seconds, text = results[(mode, file_path)]
+            accuracy = difflib.SequenceMatcher(None, base_text, text, autojunk=False).ratio()
+            print(f'{os.path.basename(file_path):<45} {mode:<15} {seconds:>8.2f} '
+                  f'{base_time / seconds:>7.2f}x {accuracy:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
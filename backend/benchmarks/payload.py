@@ -0,0 +1,118 @@
+"""
+/api/analyze payload benchmark for AgreeWise
+Measures response size and serialization + compression time for each
+response shaping option
+
+Usage (from backend/):
+    python benchmarks/payload.py [--response saved_response.json] [--pages 10] [--runs 50]
+
+Without --response, a synthetic multi-page response with a translated
+analysis is used.
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_shaping import brotli, compress_body, project_fields  # noqa: E402
+
+PAGE_TEXT = (
+    'The Employee shall work 40 hours per week at a salary of $3,200 per month. '
+    'Either party may terminate this agreement with 30 days written notice. '
+) * 40
+
+ANALYSIS = {
+    'document_summary': {'document_type': 'Employment Agreement', 'parties': ['You', 'ACME'],
+                         'purpose': 'This agreement sets the rules for your job at ACME.'},
+    'key_clauses': [{'title': f'Clause {i}', 'explanation': 'What it means ' * 10,
+                     'impact': 'How it affects you ' * 8} for i in range(5)],
+    'risk_analysis': {
+        'red_flags': [{'issue': 'Issue ' * 10, 'why_it_matters': 'Reason ' * 12,
+                       'potential_consequence': 'Outcome ' * 10} for _ in range(3)],
+        'yellow_flags': [{'issue': 'Issue ' * 10, 'why_it_matters': 'Reason ' * 12,
+                          'what_to_review': 'Review ' * 10} for _ in range(3)],
+        'positive_terms': [{'benefit': 'Benefit ' * 10, 'why_it_helps': 'Help ' * 12} for _ in range(3)]
+    },
+    'your_obligations': [{'obligation': 'Do this ' * 6, 'details': 'Details ' * 10,
+                          'deadline_or_requirement': 'Monthly'} for _ in range(5)],
+    'your_rights': [{'right': 'Right ' * 6, 'details': 'Details ' * 10} for _ in range(5)],
+    'questions_to_ask': ['Question about the contract? ' * 3 for _ in range(5)]
+}
+
+
+def synthetic_response(pages: int) -> dict:
+    """Build a response shaped like a translated multi-page /api/analyze result"""
+    page_list = [{'page_number': i, 'filename': f'page_{i}.jpg', 'text': PAGE_TEXT,
+                  'file_type': 'image/jpeg', 'extraction_method': 'image_ocr',
+                  'char_count': len(PAGE_TEXT), 'detected_language': 'en'} for i in range(1, pages + 1)]
+    return {
+        'success': True,
+        'extracted_text': '\n\n--- PAGE BREAK ---\n\n'.join(p['text'] for p in page_list),
+        'total_pages': pages,
+        'pages': page_list,
+        'metadata': {'total_files': pages, 'session_id': 'benchmark'},
+        'analysis': {'english': ANALYSIS, 'translated': copy.deepcopy(ANALYSIS), 'language': 'es'}
+    }
+
+
+def shape(response: dict, option: dict) -> dict:
+    """Apply one shaping option to a copy of the response"""
+    shaped = copy.deepcopy(response)
+    omit = option.get('omit')
+    if option.get('text_mode') == 'reference':
+        shaped['text_url'] = '/api/sessions/benchmark/text'
+        omit = ','.join(filter(None, [omit, 'extracted_text', 'pages.text']))
+    return project_fields(shaped, option.get('fields'), omit)
+
+
+def measure(data: dict, encoding, runs: int) -> tuple:
+    """Best-of-runs time to serialize (and compress) data, and the resulting size"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        body = json.dumps(data).encode('utf-8')
+        if encoding:
+            body = compress_body(body, encoding)
+        best = min(best, time.perf_counter() - start)
+    return len(body), best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure /api/analyze payload size and serialization time')
+    parser.add_argument('--response', help='Saved /api/analyze JSON response to measure')
+    parser.add_argument('--pages', type=int, default=10, help='Pages in the synthetic response')
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.response:
+        with open(args.response, encoding='utf-8') as f:
+            response = json.load(f)
+    else:
+        response = synthetic_response(args.pages)
+
+    options = [
+        ('full', {}),
+        ('omit=pages.text', {'omit': 'pages.text'}),
+        ('omit=pages.text,analysis.english', {'omit': 'pages.text,analysis.english'}),
+        ('text_mode=reference', {'text_mode': 'reference'}),
+    ]
+    encodings = [None, 'gzip'] + (['br'] if brotli is not None else [])
+
+    print(f'{"shape":<36} {"encoding":<9} {"bytes":>10} {"ms":>8}')
+    for name, option in options:
+        shaped = shape(response, option)
+        for encoding in encodings:
+            size, seconds = measure(shaped, encoding, args.runs)
+            print(f'{name:<36} {encoding or "identity":<9} {size:>10} {seconds * 1000:>8.2f}')
+
+    if brotli is None:
+        print('\n(brotli not installed - install it to include br results)')
+
+
+if __name__ == '__main__':
+    main()
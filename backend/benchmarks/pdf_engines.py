@@ -0,0 +1,100 @@
+"""
+PDF text engine equivalence check and benchmark for AgreeWise
+Extracts every text PDF in test_agreements with pdfplumber and pdfium,
+reports the time for each and the per-page text similarity, and exits with
+status 1 if any page falls below --min-similarity
+
+Usage (from backend/):
+    python benchmarks/pdf_engines.py [--pdf contract.pdf] [--repeat 50] [--runs 3] [--min-similarity 0.99]
+
+--repeat builds a long PDF by repeating the corpus pages, to measure the
+parallel page-range path (PDF_WORKERS, PDF_PARALLEL_MIN_PAGES).
+"""
+
+import argparse
+import difflib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pypdfium2 as pdfium  # noqa: E402
+from pdf_text import extract_pdf_pages  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'test_agreements')
+ENGINES = ['pdfplumber', 'pdfium']
+
+
+def normalize(text: str) -> str:
+    """Collapse whitespace so line-ending and spacing differences don't count"""
+    return ' '.join(text.split())
+
+
+def repeated_pdf(source: str, repeat: int) -> str:
+    """Write a PDF with the source's pages repeated `repeat` times"""
+    src = pdfium.PdfDocument(source)
+    long_doc = pdfium.PdfDocument.new()
+    long_doc.import_pages(src, list(range(len(src))) * repeat)
+    path = os.path.join(tempfile.mkdtemp(), f'repeated_{repeat}x_{os.path.basename(source)}')
+    long_doc.save(path)
+    long_doc.close()
+    src.close()
+    return path
+
+
+def timed_extract(path: str, engine: str, runs: int) -> tuple:
+    """Best-of-runs seconds and the page texts"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        pages = extract_pdf_pages(path, engine)
+        best = min(best, time.perf_counter() - start)
+    return best, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare PDF text engines on test_agreements')
+    parser.add_argument('--pdf', help='PDF to check instead of the corpus')
+    parser.add_argument('--repeat', type=int, default=1, help='Repeat each PDF\'s pages this many times')
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per engine')
+    parser.add_argument('--min-similarity', type=float, default=0.99, help='Lowest accepted page similarity')
+    args = parser.parse_args()
+
+    files = [args.pdf] if args.pdf else sorted(
+        os.path.join(CORPUS_DIR, name) for name in os.listdir(CORPUS_DIR) if name.lower().endswith('.pdf')
+    )
+
+    failed = False
+    for path in files:
+        if args.repeat > 1:
+            path = repeated_pdf(path, args.repeat)
+
+        results = {engine: timed_extract(path, engine, args.runs) for engine in ENGINES}
+        reference = results['pdfplumber'][1]
+        candidate = results['pdfium'][1]
+
+        print(f'{os.path.basename(path)} ({len(reference)} pages)')
+        for engine in ENGINES:
+            print(f'  {engine:<11} {results[engine][0]:>8.3f}s')
+        speedup = results['pdfplumber'][0] / max(results['pdfium'][0], 1e-9)
+        print(f'  speedup     {speedup:>8.1f}x')
+
+        similarities = [
+            difflib.SequenceMatcher(None, normalize(a), normalize(b), autojunk=False).ratio()
+            for a, b in zip(reference, candidate)
+        ]
+        worst = min(similarities, default=1.0)
+        print(f'  similarity  min {worst:.4f}, mean {sum(similarities) / max(1, len(similarities)):.4f}')
+
+        if len(reference) != len(candidate) or worst < args.min_similarity:
+            failed = True
+            page = similarities.index(worst) + 1 if similarities else 0
+            print(f'  ✗ Below {args.min_similarity} (worst page {page})')
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+Bulk contract analysis for AgreeWise
+Runs many documents through a pipelined extraction -> analysis scheduler
+with bounded parallelism per stage. Jobs run in the background, independent
+of the HTTP connection, and keep their results for a while so a client that
+disconnects can resume the NDJSON result stream where it left off.
+
+Bulk jobs don't go through the admission gates. Their stages run on the two
+fixed pools below, not on server threads, so however many jobs are running,
+one worker process extracts at most BULK_EXTRACT_WORKERS and analyzes at most
+BULK_ANALYZE_WORKERS documents at a time. Their LLM calls share the gateway's
+rate limit with /api/analyze. Lower the pool sizes to leave interactive
+requests more room.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+from document_processor import process_document
+from template_index import analyze_with_templates
+from resource_governor import TEMP_PREFIX, register_evictor
+
+BULK_EXTRACT_WORKERS = int(os.getenv('BULK_EXTRACT_WORKERS', 2))
+BULK_ANALYZE_WORKERS = int(os.getenv('BULK_ANALYZE_WORKERS', 4))
+BULK_MAX_DOCUMENTS = int(os.getenv('BULK_MAX_DOCUMENTS', 500))
+BULK_MAX_ACTIVE_JOBS = int(os.getenv('BULK_MAX_ACTIVE_JOBS', 2))
+BULK_MAX_ARCHIVE_BYTES = int(os.getenv('BULK_MAX_ARCHIVE_BYTES', 500 * 1024 * 1024))  # Uncompressed
+BULK_JOB_TTL_SECONDS = int(os.getenv('BULK_JOB_TTL_SECONDS', 60 * 60))
+
+# Stage pools are shared by all jobs, so the per-stage limits are process-wide
+_extract_pool = ThreadPoolExecutor(max_workers=BULK_EXTRACT_WORKERS, thread_name_prefix='bulk-extract')
+_analyze_pool = ThreadPoolExecutor(max_workers=BULK_ANALYZE_WORKERS, thread_name_prefix='bulk-analyze')
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class TooManyJobsError(Exception):
+    """BULK_MAX_ACTIVE_JOBS jobs are already running"""
+
+
+class BulkJob:
+    """A set of documents moving through the pipeline, and their results in completion order"""
+
+    def __init__(self, work_dir, documents, language, extract_only):
+        self.id = str(uuid.uuid4())
+        self.work_dir = work_dir
+        self.documents = documents  # List of (index, filename, path)
+        self.language = language
+        self.extract_only = extract_only
+        self.results = []
+        self.condition = threading.Condition()
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def done(self) -> bool:
+        return len(self.results) == len(self.documents)
+
+    def add_result(self, result: dict) -> None:
+        with self.condition:
+            result['seq'] = len(self.results) + 1
+            self.results.append(result)
+            if self.done:
+                self.finished_at = time.time()
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+                print(f'✓ Bulk job {self.id} complete: {len(self.results)} document(s)')
+            self.condition.notify_all()
+
+    def stream(self, after: int = 0, heartbeat_seconds: float = 15):
+        """
+        Yield NDJSON lines: a job header, each result with seq > after as it
+        finishes, and a final summary. Blank lines keep idle connections alive.
+        """
+        yield json.dumps({
+            'type': 'job',
+            'job_id': self.id,
+            'total_documents': len(self.documents),
+            'resume_url': f'/api/bulk/{self.id}/results?after=<last seq>'
+        }) + '\n'
+
+        sent = after
+        while True:
+            with self.condition:
+                if sent >= len(self.results) and not self.done:
+                    self.condition.wait(heartbeat_seconds)
+                pending = self.results[sent:]
+                done = self.done
+
+            for result in pending:
+                yield json.dumps({'type': 'result', **result}) + '\n'
+            sent += len(pending)
+
+            if done and sent >= len(self.results):
+                break
+            if not pending:
+                yield '\n'
+
+        succeeded = sum(1 for r in self.results if r['success'])
+        yield json.dumps({
+            'type': 'done',
+            'job_id': self.id,
+            'succeeded': succeeded,
+            'failed': len(self.results) - succeeded
+        }) + '\n'
+
+
+def _prune_jobs() -> None:
+    """Forget finished jobs older than BULK_JOB_TTL_SECONDS (lock held)"""
+    now = time.time()
+    for job_id in [j for j, job in _jobs.items() if job.finished_at and now - job.finished_at > BULK_JOB_TTL_SECONDS]:
+        del _jobs[job_id]
+
+
+def evict_finished_jobs(force: bool = False) -> int:
+    """
+    Forget expired finished jobs, or under memory pressure every finished job
+    (clients can no longer resume their result streams)
+
+    Returns:
+        int: Number of jobs dropped
+    """
+    with _jobs_lock:
+        before = len(_jobs)
+        _prune_jobs()
+        if force:
+            for job_id in [j for j, job in _jobs.items() if job.finished_at]:
+                del _jobs[job_id]
+        return before - len(_jobs)
+
+
+register_evictor('bulk_jobs', evict_finished_jobs)
+
+
+def active_job_count() -> int:
+    with _jobs_lock:
+        return sum(1 for job in _jobs.values() if not job.done)
+
+
+def get_job(job_id: str):
+    with _jobs_lock:
+        _prune_jobs()
+        return _jobs.get(job_id)
+
+
+def unpack_archive(archive_path: str, work_dir: str, allowed_extensions: set) -> list:
+    """
+    Extract supported documents from a ZIP archive
+
+    Returns:
+        list: (filename, path) for each document, in archive order
+
+    Raises:
+        ValueError: If the archive is invalid, too large or has too many documents
+    """
+    if not zipfile.is_zipfile(archive_path):
+        raise ValueError('Archive must be a ZIP file')
+
+    documents = []
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [
+            m for m in archive.infolist()
+            if not m.is_dir() and '.' in m.filename
+            and m.filename.rsplit('.', 1)[1].lower() in allowed_extensions
+            and not os.path.basename(m.filename).startswith('.')
+        ]
+
+        if sum(m.file_size for m in members) > BULK_MAX_ARCHIVE_BYTES:
+            raise ValueError('Archive is too large when uncompressed')
+        if len(members) > BULK_MAX_DOCUMENTS:
+            raise ValueError(f'Archive has more than {BULK_MAX_DOCUMENTS} documents')
+
+        for idx, member in enumerate(members, 1):
+            # Never trust archive paths - flatten and sanitize every name
+            filename = secure_filename(os.path.basename(member.filename)) or f'document_{idx}'
+            path = os.path.join(work_dir, f'{idx:05d}_{filename}')
+            with archive.open(member) as src, open(path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            documents.append((filename, path))
+
+    return documents
+
+
+def _extract_stage(job: BulkJob, index: int, filename: str, path: str) -> None:
+    """Stage 1: extract text, then hand the document to the analysis stage"""
+    try:
+        extraction = process_document(path, job.language)
+    except Exception as e:
+        extraction = {'success': False, 'error': str(e)}
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+    base = {'index': index, 'filename': filename}
+
+    if not extraction['success']:
+        job.add_result({**base, 'success': False, 'stage': 'extraction', 'error': extraction['error']})
+        return
+
+    base.update({
+        'file_type': extraction['file_type'],
+        'extraction_method': extraction['method'],
+        'char_count': extraction['char_count'],
+        'detected_language': extraction.get('detected_language')
+    })
+
+    if job.extract_only:
+        job.add_result({**base, 'success': True, 'text': extraction['text']})
+        return
+
+    _analyze_pool.submit(_analyze_stage, job, base, extraction['text'])
+
+
+def _analyze_stage(job: BulkJob, base: dict, text: str) -> None:
+    """Stage 2: analyze extracted text with the LLM"""
+    try:
+        ai_result = analyze_with_templates(text)
+    except Exception as e:
+        ai_result = {'success': False, 'error': str(e)}
+
+    if ai_result['success']:
+        job.add_result({
+            **base,
+            'success': True,
+            'analysis': ai_result['analysis'],
+            'model_used': ai_result.get('model_used'),
+            'tokens_used': ai_result.get('tokens_used')
+        })
+    else:
+        job.add_result({**base, 'success': False, 'stage': 'analysis', 'error': ai_result.get('error')})
+
+
+def start_job(work_dir: str, documents: list, language: str = 'en', extract_only: bool = False) -> BulkJob:
+    """
+    Register a bulk job and feed its documents into the pipeline
+
+    Args:
+        work_dir: Directory holding the job's files (removed when the job finishes)
+        documents: (filename, path) for each document
+        language: Document language code for OCR
+        extract_only: Skip AI analysis
+
+    Returns:
+        BulkJob: The running job
+
+    Raises:
+        TooManyJobsError: If BULK_MAX_ACTIVE_JOBS jobs are already running
+    """
+    job = BulkJob(work_dir, [(i, name, path) for i, (name, path) in enumerate(documents, 1)], language, extract_only)
+
+    with _jobs_lock:
+        _prune_jobs()
+        if sum(1 for running in _jobs.values() if not running.done) >= BULK_MAX_ACTIVE_JOBS:
+            raise TooManyJobsError('Too many bulk jobs running, please try again later')
+        _jobs[job.id] = job
+
+    print(f'📦 Bulk job {job.id}: {len(documents)} document(s)')
+    for index, filename, path in job.documents:
+        _extract_pool.submit(_extract_stage, job, index, filename, path)
+
+    return job
+
+
+def new_work_dir() -> str:
+    """Create a private directory for a bulk job's files"""
+    return tempfile.mkdtemp(prefix=f'{TEMP_PREFIX}bulk_')
@@ -6,29 +6,184 @@ Handles text extraction from DOCX, PDF, and images using OCR
 import os
 import magic
 from docx import Document
-import pdfplumber
 from pdf2image import convert_from_path
 import easyocr
 from PIL import Image
+import numpy as np
 import tempfile
+import threading
+import time
+from language_detector import detect_text_language
+from docx_stream import extract_docx_text
+from pdf_text import PDF_ENGINE, extract_pdf_pages, page_count
+from resource_governor import TEMP_PREFIX, register_evictor
+
+# OCR speed/accuracy profiles (pick one per deployment with OCR_MODE)
+# All modes load EasyOCR's int8 dynamically quantized weights on CPU.
+# - accurate: full detection + recognition at 300 DPI (original behaviour)
+# - fast: half-size detector canvas and 200 DPI rasterization
+# - fast_nodetect: like fast, but skips the CRAFT detector and finds text lines
+#   with a projection profile - only for clean, single-column cropped pages
+OCR_PROFILES = {
+    'accurate': {'quantize': True, 'detector': True, 'canvas_size': 2560, 'pdf_dpi': 300},
+    'fast': {'quantize': True, 'detector': True, 'canvas_size': 1280, 'pdf_dpi': 200},
+    'fast_nodetect': {'quantize': True, 'detector': False, 'canvas_size': 1280, 'pdf_dpi': 200},
+}
+OCR_MODE = os.getenv('OCR_MODE', 'accurate')
+OCR_READER_IDLE_SECONDS = int(os.getenv('OCR_READER_IDLE_SECONDS', 30 * 60))  # Unused readers are freed after this
+
+# DOCX extraction engine: 'stream' parses the XML parts incrementally,
+# 'python-docx' builds the full object model (slower, used as fallback)
+DOCX_ENGINE = os.getenv('DOCX_ENGINE', 'stream')
+
+# Map common language codes to EasyOCR codes
+OCR_LANGUAGE_MAP = {
+    'en': 'en', 'es': 'es', 'fr': 'fr', 'de': 'de', 'pt': 'pt',
+    'zh': 'ch_sim', 'ja': 'ja', 'ko': 'ko', 'ar': 'ar', 'hi': 'hi',
+    'ru': 'ru', 'it': 'it', 'tr': 'tr', 'pl': 'pl', 'nl': 'nl'
+}
+
+# Language detection before OCR (on by default, LANGUAGE_DETECTION=false to trust the client)
+LANGUAGE_DETECTION = os.getenv('LANGUAGE_DETECTION', 'true').lower() == 'true'
+DETECTION_THUMBNAIL_SIZE = 1000  # Longest side of the probe image in pixels
+DETECTION_MIN_CONFIDENCE = 0.5   # Probe confidence needed to accept a language
+LATIN_LANGUAGES = {'en', 'es', 'fr', 'de', 'pt', 'it', 'tr', 'pl', 'nl'}
+PROBE_LANGUAGES = ['en', 'hi', 'ar', 'ru', 'zh', 'ja', 'ko']  # One per script
+# Script probes tried after an unconfident hint probe (each may load a reader),
+# and how many probe readers stay loaded
+DETECTION_FALLBACK_PROBES = int(os.getenv('LANGUAGE_DETECTION_FALLBACK_PROBES', 2))
+MAX_PROBE_READERS = int(os.getenv('MAX_PROBE_READERS', 2))
 
 # Initialize EasyOCR reader (lazy load to avoid startup delay)
 _ocr_reader = None
 _ocr_reader_languages = None
+_ocr_reader_mode = None
+_ocr_reader_last_used = 0.0
+_probe_readers = {}  # language -> (reader, last used)
+# Guards the reader globals above; request threads and the governor's evictor change them
+_readers_lock = threading.RLock()
+
+
+def get_ocr_profile(mode=None):
+    """Return the OCR profile for a mode (defaults to OCR_MODE)"""
+    mode = mode or OCR_MODE
+    if mode not in OCR_PROFILES:
+        print(f'⚠️  Unknown OCR mode "{mode}", using accurate')
+        mode = 'accurate'
+    return mode, OCR_PROFILES[mode]
+
+
+def get_ocr_reader(languages=['en'], mode=None):
+    """Get or initialize EasyOCR reader with specified languages and OCR mode"""
+    global _ocr_reader, _ocr_reader_languages, _ocr_reader_mode, _ocr_reader_last_used
+
+    mode, profile = get_ocr_profile(mode)
+
+    with _readers_lock:
+        # Reinitialize if language or mode changes (or the governor released it)
+        reader = _ocr_reader
+        if reader is None or _ocr_reader_languages != languages or _ocr_reader_mode != mode:
+            probe = _probe_readers.get(languages[0]) if len(languages) == 1 else None
+            if probe and _probe_reader_fits(profile):
+                # Language detection already loaded this reader with the same settings
+                print(f'🔧 Using the {languages} probe reader for OCR (mode: {mode})')
+                _probe_readers.pop(languages[0], None)
+                reader = probe[0]
+            else:
+                print(f'🔧 Initializing EasyOCR with languages: {languages} (mode: {mode})')
+                reader = easyocr.Reader(
+                    languages,
+                    gpu=False,  # Use CPU mode
+                    quantize=profile['quantize'],
+                    detector=profile['detector']
+                )
+                print(f'✓ EasyOCR ready for {languages}')
+            _ocr_reader = reader
+            _ocr_reader_languages = languages
+            _ocr_reader_mode = mode
+
+        _ocr_reader_last_used = time.time()
+        return reader
+
+
+def _probe_reader_fits(profile):
+    """Whether a probe reader (easyocr defaults) is built the way an OCR profile needs"""
+    return profile['quantize'] and profile['detector']
+
+
+def release_ocr_readers(force=False):
+    """
+    Free EasyOCR readers idle for OCR_READER_IDLE_SECONDS
+    Under memory pressure (force) probe readers go first; the main reader is
+    only released when there are no probe readers left to free.
+    Requests already holding a reader keep using it; the next one reloads.
+
+    Returns:
+        int: Number of readers released
+    """
+    global _ocr_reader
+    cutoff = time.time() - (0 if force else OCR_READER_IDLE_SECONDS)
+    released = 0
+
+    with _readers_lock:
+        for language, (_, last_used) in list(_probe_readers.items()):
+            if last_used < cutoff:
+                _probe_readers.pop(language, None)
+                released += 1
+
+        if _ocr_reader is not None and _ocr_reader_last_used < cutoff and not (force and released):
+            _ocr_reader = None
+            released += 1
 
+    if released:
+        print(f'🧹 Released {released} idle EasyOCR reader(s)')
+    return released
 
-def get_ocr_reader(languages=['en']):
-    """Get or initialize EasyOCR reader with specified languages"""
-    global _ocr_reader, _ocr_reader_languages
 
-    # Reinitialize if language changes
-    if _ocr_reader is None or _ocr_reader_languages != languages:
-        print(f'🔧 Initializing EasyOCR with languages: {languages}')
-        _ocr_reader = easyocr.Reader(languages, gpu=False)  # Use CPU mode
-        _ocr_reader_languages = languages
-        print(f'✓ EasyOCR ready for {languages}')
+register_evictor('ocr_readers', release_ocr_readers)
 
-    return _ocr_reader
+
+def find_text_lines(grey, min_gap=3, padding=4):
+    """
+    Find text line boxes on a clean single-column page using a horizontal
+    projection profile. Used instead of the CRAFT detector in fast_nodetect mode.
+
+    Returns:
+        list: EasyOCR horizontal_list boxes [x_min, x_max, y_min, y_max]
+    """
+    height, width = grey.shape
+    ink = grey < 128
+    row_has_ink = ink.sum(axis=1) > max(2, width // 500)
+
+    boxes = []
+    start = None
+    gap = 0
+    for y, has_ink in enumerate(row_has_ink):
+        if has_ink:
+            if start is None:
+                start = y
+            gap = 0
+        elif start is not None:
+            gap += 1
+            if gap >= min_gap:
+                boxes.append((start, y - gap + 1))
+                start = None
+                gap = 0
+    if start is not None:
+        boxes.append((start, height))
+
+    lines = []
+    for y_min, y_max in boxes:
+        if y_max - y_min < 4:
+            continue  # Specks and rules, not text
+        cols = np.flatnonzero(ink[y_min:y_max].any(axis=0))
+        lines.append([
+            max(0, int(cols[0]) - padding),
+            min(width, int(cols[-1]) + padding),
+            max(0, y_min - padding),
+            min(height, y_max + padding)
+        ])
+    return lines
 
 
 def detect_file_type(file_path):
@@ -37,12 +192,26 @@ def detect_file_type(file_path):
     return mime_type
 
 
-def extract_from_docx(file_path):
+def extract_from_docx(file_path, engine=None):
     """
     Extract text from DOCX files
     Includes paragraphs, tables, headers, and footers
+
+    Args:
+        file_path: Path to the DOCX file
+        engine: 'stream' or 'python-docx' (default: DOCX_ENGINE env var)
     """
-    print('📄 Extracting text from DOCX...')
+    engine = engine or DOCX_ENGINE
+    print(f'📄 Extracting text from DOCX ({engine})...')
+
+    if engine == 'stream':
+        try:
+            extracted_text = extract_docx_text(file_path)
+            print(f'✓ Extracted {len(extracted_text)} characters from DOCX')
+            return extracted_text
+        except Exception as e:
+            print(f'⚠️  Streaming DOCX extraction failed, using python-docx: {str(e)}')
+
     doc = Document(file_path)
 
     full_text = []
@@ -64,22 +233,20 @@ def extract_from_docx(file_path):
     return extracted_text
 
 
-def extract_from_pdf(file_path):
+def extract_from_pdf(file_path, engine=None):
     """
-    Extract text from text-based PDFs using pdfplumber
+    Extract text from text-based PDFs using pdfium (or pdfplumber, see pdf_text)
     Returns empty string if PDF is scanned (no extractable text)
     """
-    print('📄 Extracting text from PDF...')
+    print(f'📄 Extracting text from PDF ({engine or PDF_ENGINE})...')
 
     full_text = []
 
     try:
-        with pdfplumber.open(file_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                text = page.extract_text()
-                if text:
-                    full_text.append(text)
-                    print(f'  Page {page_num}: {len(text)} characters')
+        for page_num, text in enumerate(extract_pdf_pages(file_path, engine), 1):
+            if text:
+                full_text.append(text)
+                print(f'  Page {page_num}: {len(text)} characters')
 
     except Exception as e:
         print(f'❌ PDF extraction error: {str(e)}')
@@ -96,27 +263,37 @@ def extract_from_pdf(file_path):
     return extracted_text
 
 
-def ocr_image(file_path, language='en'):
+def ocr_image(file_path, language='en', mode=None):
     """
     Perform OCR on an image file using EasyOCR
     """
-    print(f'🔍 Running OCR on image (language: {language})...')
-
-    # Map common language codes to EasyOCR codes
-    lang_map = {
-        'en': 'en', 'es': 'es', 'fr': 'fr', 'de': 'de', 'pt': 'pt',
-        'zh': 'ch_sim', 'ja': 'ja', 'ko': 'ko', 'ar': 'ar', 'hi': 'hi',
-        'ru': 'ru', 'it': 'it', 'tr': 'tr', 'pl': 'pl', 'nl': 'nl'
-    }
+    mode, profile = get_ocr_profile(mode)
+    print(f'🔍 Running OCR on image (language: {language}, mode: {mode})...')
 
-    ocr_lang = lang_map.get(language, 'en')
+    ocr_lang = OCR_LANGUAGE_MAP.get(language, 'en')
 
     try:
         # Get OCR reader
-        reader = get_ocr_reader([ocr_lang])
+        reader = get_ocr_reader([ocr_lang], mode)
 
         # Perform OCR
-        results = reader.readtext(file_path, detail=0, paragraph=True)
+        if profile['detector']:
+            results = reader.readtext(
+                file_path,
+                detail=0,
+                paragraph=True,
+                canvas_size=profile['canvas_size']
+            )
+        else:
+            grey = np.array(Image.open(file_path).convert('L'))
+            lines = find_text_lines(grey)
+            results = reader.recognize(
+                grey,
+                horizontal_list=lines,
+                free_list=[],
+                detail=0,
+                paragraph=True
+            ) if lines else []
 
         # Join all detected text blocks
         extracted_text = '\n\n'.join(results)
@@ -129,32 +306,35 @@ def ocr_image(file_path, language='en'):
         raise
 
 
-def ocr_pdf(file_path, language='en'):
+def ocr_pdf(file_path, language='en', mode=None):
     """
     Convert PDF pages to images and perform OCR
     Used for scanned PDFs with no extractable text
     """
-    print(f'🔍 Converting PDF to images for OCR (language: {language})...')
+    mode, profile = get_ocr_profile(mode)
+    print(f'🔍 Converting PDF to images for OCR (language: {language}, mode: {mode})...')
 
     try:
-        # Convert PDF to images
-        images = convert_from_path(file_path, dpi=300)  # High DPI for better OCR
-        print(f'  Converted to {len(images)} images')
+        total_pages = page_count(file_path)
+        print(f'  {total_pages} page(s) to rasterize')
 
         full_text = []
 
-        # OCR each page
-        for page_num, image in enumerate(images, 1):
+        # Rasterize and OCR one page at a time so only one page image is in memory
+        # (300 DPI in accurate mode for better OCR)
+        for page_num in range(1, total_pages + 1):
             print(f'  OCR Page {page_num}...')
+            image = convert_from_path(file_path, dpi=profile['pdf_dpi'], first_page=page_num, last_page=page_num)[0]
 
             # Save image temporarily
-            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_img:
+            with tempfile.NamedTemporaryFile(prefix=TEMP_PREFIX, suffix='.png', delete=False) as temp_img:
                 image.save(temp_img.name, 'PNG')
                 temp_path = temp_img.name
+            image.close()
 
             try:
                 # Perform OCR
-                page_text = ocr_image(temp_path, language)
+                page_text = ocr_image(temp_path, language, mode)
                 if page_text:
                     full_text.append(page_text)
             finally:
@@ -170,6 +350,118 @@ def ocr_pdf(file_path, language='en'):
         raise
 
 
+def get_probe_reader(language):
+    """
+    Get a reader for language detection probes
+    Reuses the main reader when it is loaded for the same language; other
+    languages get their own reader so probing doesn't force a reload of it.
+    At most MAX_PROBE_READERS stay loaded (least recently used go first).
+    """
+    global _ocr_reader_last_used
+    ocr_lang = OCR_LANGUAGE_MAP.get(language, 'en')
+
+    with _readers_lock:
+        reader = _ocr_reader
+        if (reader is not None and _ocr_reader_languages == [ocr_lang]
+                and OCR_PROFILES[_ocr_reader_mode]['detector']):
+            _ocr_reader_last_used = time.time()
+            return reader
+
+        cached = _probe_readers.get(ocr_lang)
+        if cached:
+            reader = cached[0]
+        else:
+            print(f'🔧 Initializing EasyOCR probe reader: {ocr_lang}')
+            reader = easyocr.Reader([ocr_lang], gpu=False, verbose=False)
+        _probe_readers[ocr_lang] = (reader, time.time())
+
+        for stale in sorted(_probe_readers, key=lambda lang: _probe_readers[lang][1])[:-MAX_PROBE_READERS or None]:
+            del _probe_readers[stale]
+        return reader
+
+
+def probe_reader_loaded(language):
+    """Whether probing language would reuse a loaded reader instead of loading one"""
+    ocr_lang = OCR_LANGUAGE_MAP.get(language, 'en')
+    with _readers_lock:
+        return ocr_lang in _probe_readers or (_ocr_reader is not None and _ocr_reader_languages == [ocr_lang])
+
+
+def probe_language(pixels, language):
+    """
+    Run a quick OCR pass on a thumbnail with one language's reader
+
+    Returns:
+        tuple: (recognized text, length-weighted mean confidence)
+    """
+    results = get_probe_reader(language).readtext(pixels, detail=1, paragraph=False)
+    total_chars = sum(len(text) for _, text, _ in results)
+    if not total_chars:
+        return '', 0.0
+    confidence = sum(len(text) * conf for _, text, conf in results) / total_chars
+    return ' '.join(text for _, text, _ in results), confidence
+
+
+def detect_image_language(image, hint='en'):
+    """
+    Detect the language of an image document from a low-resolution thumbnail
+    Tries the client-supplied language first, then at most
+    DETECTION_FALLBACK_PROBES other scripts, those with a loaded reader first
+
+    Args:
+        image: PIL Image of the page
+        hint: Client-supplied language code
+
+    Returns:
+        str: Detected language code, or None if no probe was confident
+    """
+    thumb = image.convert('L')
+    thumb.thumbnail((DETECTION_THUMBNAIL_SIZE, DETECTION_THUMBNAIL_SIZE))
+    pixels = np.array(thumb)
+
+    fallback = [language for language in PROBE_LANGUAGES
+                if language != hint and not (language == 'en' and hint in LATIN_LANGUAGES)]
+    fallback.sort(key=lambda language: not probe_reader_loaded(language))  # Stable: keeps script order
+    candidates = ([hint] if hint in OCR_LANGUAGE_MAP else []) + fallback[:DETECTION_FALLBACK_PROBES]
+
+    best_language, best_confidence = None, 0.0
+    for language in candidates:
+        text, confidence = probe_language(pixels, language)
+        print(f'  Language probe {language}: confidence {confidence:.2f}')
+        if confidence >= DETECTION_MIN_CONFIDENCE:
+            return detect_text_language(text) or language
+        if confidence > best_confidence:
+            best_language, best_confidence = language, confidence
+
+    return best_language
+
+
+def detect_document_language(file_path, mime_type, hint='en'):
+    """
+    Detect the language of an image or scanned PDF before full OCR
+
+    Returns:
+        str: Detected language code, or None if undecided
+    """
+    print(f'🌐 Detecting document language (client said {hint})...')
+
+    try:
+        if mime_type == 'application/pdf':
+            pages = convert_from_path(file_path, dpi=72, first_page=1, last_page=1)
+            if not pages:
+                return None
+            image = pages[0]
+        else:
+            image = Image.open(file_path)
+
+        return detect_image_language(image, hint)
+
+    except Exception as e:
+        # Detection is best-effort - fall back to the client's language
+        print(f'⚠️  Language detection failed: {str(e)}')
+        return None
+
+
 def clean_text(text):
     """
     Clean and normalize extracted text
@@ -178,24 +470,27 @@ def clean_text(text):
     if not text:
         return ''
 
-    # Replace multiple spaces with single space
-    text = ' '.join(text.split())
+    # Replace multiple spaces with single space within each line
+    # (splitting on all whitespace first would also flatten the line breaks)
+    lines = [' '.join(line.split()) for line in text.split('\n')]
 
     # Normalize line breaks (keep paragraph structure)
-    lines = text.split('\n')
-    lines = [line.strip() for line in lines if line.strip()]
+    lines = [line for line in lines if line]
 
     return '\n\n'.join(lines)
 
 
-def process_document(file_path, language='en'):
+def process_document(file_path, language='en', ocr_mode=None, detect_language=None):
     """
     Main document processing function
     Detects file type and extracts text using appropriate method
 
     Args:
         file_path: Path to the document file
-        language: Language code for OCR (default: 'en')
+        language: Language code for OCR (default: 'en', 'auto' to always detect)
+        ocr_mode: OCR profile name (default: OCR_MODE env var)
+        detect_language: Detect the document language before OCR
+                         (default: LANGUAGE_DETECTION env var)
 
     Returns:
         dict: {
@@ -203,10 +498,16 @@ def process_document(file_path, language='en'):
             'method': extraction method used,
             'file_type': detected MIME type,
             'char_count': number of characters,
+            'detected_language': detected language code (None if undecided),
+            'language': language code used for OCR/output,
             'success': True/False
         }
     """
 
+    if detect_language is None:
+        detect_language = LANGUAGE_DETECTION or language == 'auto'
+    hint = language if language in OCR_LANGUAGE_MAP else 'en'
+
     try:
         # Detect file type
         mime_type = detect_file_type(file_path)
@@ -214,11 +515,14 @@ def process_document(file_path, language='en'):
 
         extracted_text = ''
         method = ''
+        detected_language = None
 
         # DOCX - Direct text extraction
         if mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
             extracted_text = extract_from_docx(file_path)
             method = 'docx_extraction'
+            if detect_language:
+                detected_language = detect_text_language(extracted_text)
 
         # PDF - Try text extraction, fallback to OCR
         elif mime_type == 'application/pdf':
@@ -226,19 +530,28 @@ def process_document(file_path, language='en'):
 
             if not extracted_text or len(extracted_text.strip()) < 50:
                 print('📸 PDF appears to be scanned, using OCR...')
-                extracted_text = ocr_pdf(file_path, language)
+                if detect_language:
+                    detected_language = detect_document_language(file_path, mime_type, hint)
+                extracted_text = ocr_pdf(file_path, detected_language or hint, ocr_mode)
                 method = 'pdf_ocr'
             else:
                 method = 'pdf_extraction'
+                if detect_language:
+                    detected_language = detect_text_language(extracted_text)
 
         # Images - OCR required
         elif mime_type.startswith('image/'):
-            extracted_text = ocr_image(file_path, language)
+            if detect_language:
+                detected_language = detect_document_language(file_path, mime_type, hint)
+            extracted_text = ocr_image(file_path, detected_language or hint, ocr_mode)
             method = 'image_ocr'
 
         else:
             raise ValueError(f'Unsupported file type: {mime_type}')
 
+        if detected_language and detected_language != hint:
+            print(f'🌐 Detected language {detected_language} (client said {language})')
+
         # Clean the extracted text
         cleaned_text = clean_text(extracted_text)
 
@@ -248,6 +561,8 @@ def process_document(file_path, language='en'):
             'method': method,
             'file_type': mime_type,
             'char_count': len(cleaned_text),
+            'detected_language': detected_language,
+            'language': detected_language or hint,
             'error': None
         }
 
@@ -259,5 +574,7 @@ def process_document(file_path, language='en'):
             'method': None,
             'file_type': None,
             'char_count': 0,
+            'detected_language': None,
+            'language': hint,
             'error': str(e)
         }
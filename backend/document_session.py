@@ -0,0 +1,364 @@
+"""
+Document sessions for incremental re-analysis
+Stores each page's extraction by content hash and each chunk's analysis by
+text hash, so re-submitting a contract with an added or replaced page only
+extracts and analyzes what changed. Sessions live in memory and expire.
+
+A first submission that fits the input token budget is analyzed in one
+request; documents are split into chunks (analyzed concurrently) only when
+they are too long for one request or are re-submitted to a session.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Optional
+
+from ai_analyzer import merge_analyses, UNIVERSAL_SYSTEM_PROMPT, LLMUnavailableError
+from prompt_budget import fits_budget
+from template_index import analyze_with_templates
+from resource_governor import register_evictor
+
+SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 30 * 60))
+MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', 200))
+ANALYSIS_CHUNK_CHARS = int(os.getenv('ANALYSIS_CHUNK_CHARS', 12000))
+
+# Pipelined analysis: chunks are analyzed while later pages are still being extracted
+ANALYSIS_PIPELINE = os.getenv('ANALYSIS_PIPELINE', 'false').lower() == 'true'
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', 4))  # Also runs the chunks of one document concurrently
+# Smaller chunks, so analysis starts after a few pages instead of ANALYSIS_CHUNK_CHARS
+PIPELINE_CHUNK_CHARS = int(os.getenv('PIPELINE_CHUNK_CHARS', 4000))
+
+PAGE_BREAK = '\n\n--- PAGE BREAK ---\n\n'
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_pipeline_pool = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix='pipeline-analyze')
+
+
+def file_hash(file_path: str) -> str:
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of a text's UTF-8 encoding"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _prune_sessions(now: float) -> None:
+    """Drop expired sessions, then the oldest ones beyond MAX_SESSIONS (lock held)"""
+    for session_id in [sid for sid, s in _sessions.items() if now - s['updated_at'] > SESSION_TTL_SECONDS]:
+        del _sessions[session_id]
+
+    if len(_sessions) > MAX_SESSIONS:
+        oldest = sorted(_sessions, key=lambda sid: _sessions[sid]['updated_at'])
+        for session_id in oldest[:len(_sessions) - MAX_SESSIONS]:
+            del _sessions[session_id]
+
+
+def evict_sessions(force: bool = False) -> int:
+    """
+    Drop expired sessions, or under memory pressure every session idle for a minute
+
+    Returns:
+        int: Number of sessions dropped
+    """
+    now = time.time()
+    with _sessions_lock:
+        before = len(_sessions)
+        _prune_sessions(now)
+        if force:
+            for session_id in [sid for sid, s in _sessions.items() if now - s['updated_at'] > 60]:
+                del _sessions[session_id]
+        return before - len(_sessions)
+
+
+register_evictor('sessions', evict_sessions)
+
+
+def get_session(session_id: Optional[str] = None) -> dict:
+    """
+    Get an existing session or start a new one
+
+    Args:
+        session_id: Session ID returned by a previous /api/analyze call
+
+    Returns:
+        dict: Session with 'id', 'pages' (extractions by page key),
+              'chunks' (analyses by chunk text hash), 'chunk_chars' (the chunk
+              size those analyses were cut with) and 'lock'
+    """
+    now = time.time()
+    with _sessions_lock:
+        _prune_sessions(now)
+
+        session = _sessions.get(session_id) if session_id else None
+        if session is None:
+            # Hold 'lock' while reading or changing 'pages', 'chunks' or 'document'
+            session = {'id': str(uuid.uuid4()), 'pages': {}, 'chunks': {}, 'chunk_chars': ANALYSIS_CHUNK_CHARS,
+                       'lock': threading.RLock()}
+            _sessions[session['id']] = session
+
+        session['updated_at'] = now
+        return session
+
+
+def find_session(session_id: str) -> Optional[dict]:
+    """Look up a live session without creating one"""
+    with _sessions_lock:
+        _prune_sessions(time.time())
+        return _sessions.get(session_id)
+
+
+def page_key(content_hash: str, language: str, ocr_mode: Optional[str]) -> str:
+    """Cache key for one page extraction"""
+    return f'{content_hash}:{language}:{ocr_mode or "default"}'
+
+
+def _ends_chunk(text: str, chunk_chars: int) -> bool:
+    """
+    Whether a page closes its chunk, decided by the page's own content
+
+    A page is a cut point with probability len(text) / (chunk_chars / 2),
+    drawn from a hash of its text, so once a chunk has reached half of
+    chunk_chars it ends on average chunk_chars / 2 later.
+    """
+    draw = int(text_hash(text)[:13], 16) / 16 ** 13
+    return draw < len(text) / max(1, chunk_chars // 2)
+
+
+def build_chunks(page_texts: list, chunk_chars: int = ANALYSIS_CHUNK_CHARS) -> list:
+    """
+    Group consecutive pages into analysis chunks of about chunk_chars
+
+    Chunks end on page boundaries chosen by the pages' content, not by their
+    position, so inserting, removing or replacing a page only changes the
+    chunk around it; the rest produce the same chunk text on re-submission.
+    A chunk is at least half and at most twice chunk_chars (single pages
+    aside), and a document that fits in chunk_chars is one chunk.
+    """
+    if sum(len(text) for text in page_texts) <= chunk_chars:
+        return [PAGE_BREAK.join(page_texts)] if page_texts else []
+
+    chunks = []
+    current = []
+    current_chars = 0
+
+    for text in page_texts:
+        if current and current_chars + len(text) > 2 * chunk_chars:
+            chunks.append(PAGE_BREAK.join(current))
+            current, current_chars = [], 0
+        current.append(text)
+        current_chars += len(text)
+        if current_chars >= chunk_chars // 2 and _ends_chunk(text, chunk_chars):
+            chunks.append(PAGE_BREAK.join(current))
+            current, current_chars = [], 0
+
+    if current:
+        chunks.append(PAGE_BREAK.join(current))
+
+    return chunks
+
+
+def _analyze_chunk(session: dict, chunk_text: str, label: str) -> tuple:
+    """
+    Analyze one chunk, or reuse its analysis from the session
+
+    Returns:
+        tuple: (analyze_contract()-shaped result, True if reused)
+    """
+    cached = session['chunks'].get(text_hash(chunk_text))
+    if cached:
+        print(f'♻️  Chunk {label} unchanged, reusing analysis')
+        return cached, True
+
+    print(f'🤖 Analyzing chunk {label} ({len(chunk_text)} characters)')
+    result = analyze_with_templates(chunk_text)
+    if result['success']:
+        session['chunks'][text_hash(chunk_text)] = result
+    return result, False
+
+
+def _combine_chunk_results(session: dict, chunks: list, outcomes: list, chunk_chars: int) -> dict:
+    """Merge per-chunk (result, reused) outcomes into one analyze_session_pages() result"""
+    for result, _ in outcomes:
+        if not result['success']:
+            return result
+
+    # Later submissions cut chunks the same way, so unchanged ones are reused
+    session['chunk_chars'] = chunk_chars
+
+    # Forget analyses of chunks that are no longer part of the document
+    current_keys = {text_hash(chunk_text) for chunk_text in chunks}
+    for key in [k for k in session['chunks'] if k not in current_keys]:
+        del session['chunks'][key]
+
+    results = [result for result, _ in outcomes]
+    fresh = [result for result, reused in outcomes if not reused]
+
+    if len(results) == 1:
+        analysis = results[0]['analysis']
+    else:
+        analysis = merge_analyses([r['analysis'] for r in results])
+
+    return {
+        'success': True,
+        'analysis': analysis,
+        'model_used': results[-1].get('model_used'),
+        'escalated': any(r.get('escalated') for r in fresh),
+        'tokens_used': sum(r.get('tokens_used') or 0 for r in fresh),
+        'input_tokens_saved': sum(r.get('input_tokens_saved') or 0 for r in fresh),
+        'input_tokens_truncated': sum(r.get('input_tokens_truncated') or 0 for r in fresh),
+        'chunks_total': len(chunks),
+        'chunks_reused': len(results) - len(fresh)
+    }
+
+
+def session_chunks(session: dict, page_texts: list) -> list:
+    """
+    Decide how a document is split for analysis
+
+    One chunk (a single request) if the whole text was already analyzed in
+    this session, or if it is a first analysis that fits the input token
+    budget. Otherwise content-defined chunks, so a re-submission reuses the
+    analyses of unchanged chunks from then on (cut with the session's chunk
+    size, which a pipelined analysis may have set).
+    """
+    if not page_texts:
+        return []
+
+    document_text = PAGE_BREAK.join(page_texts)
+    if text_hash(document_text) in session['chunks']:
+        return [document_text]
+    if not session['chunks'] and fits_budget(document_text, UNIVERSAL_SYSTEM_PROMPT):
+        return [document_text]
+    return build_chunks(page_texts, session['chunk_chars'])
+
+
+def analyze_session_pages(session: dict, page_texts: list) -> dict:
+    """
+    Analyze a document, chunk by chunk if needed, reusing chunk analyses from the session
+
+    Chunks are analyzed concurrently in the pipeline pool.
+
+    Args:
+        session: Session from get_session()
+        page_texts: Extracted text of each page, in document order
+
+    Returns:
+        dict: Same shape as analyze_contract(), plus 'chunks_total' and
+              'chunks_reused'
+
+    Raises:
+        LLMUnavailableError: The LLM is rate limited or unavailable
+    """
+    chunks = session_chunks(session, page_texts)
+    chunk_chars = session['chunk_chars'] if session['chunks'] else ANALYSIS_CHUNK_CHARS
+    if len(chunks) == 1:
+        outcomes = [_analyze_chunk(session, chunks[0], '1/1')]
+    else:
+        futures = [_pipeline_pool.submit(_analyze_chunk, session, chunk_text, f'{idx}/{len(chunks)}')
+                   for idx, chunk_text in enumerate(chunks, 1)]
+        wait(futures)
+        outcomes = [future.result() for future in futures]
+
+    return _combine_chunk_results(session, chunks, outcomes, chunk_chars)
+
+
+class ChunkPipeline:
+    """
+    Analyzes chunks while later pages are still being extracted
+
+    Pages are added in document order as extraction finishes them and are
+    cut into chunks of about PIPELINE_CHUNK_CHARS with the content-defined
+    rule of build_chunks, so the first chunk goes out after a few pages.
+    This trades extra LLM requests (a document that fits one request is
+    still split) for overlapping OCR with analysis. A re-submission to a
+    session that already has chunk analyses uses the session's chunk size
+    instead, so unchanged chunks are reused whichever mode made them.
+    Closed chunks are only sent for analysis once the document is known to
+    be longer than one chunk; a shorter one is analyzed whole in finish().
+
+    The session lock must be held from creation until finish() or cancel()
+    returns, since chunk analyses write to the session.
+    """
+
+    def __init__(self, session: dict, chunk_chars: int = None):
+        self.session = session
+        self.chunk_chars = chunk_chars or (session['chunk_chars'] if session['chunks'] else PIPELINE_CHUNK_CHARS)
+        self.pages = []
+        self.total_chars = 0
+        self.closed = []  # Closed chunk texts not yet submitted
+        self.futures = {}  # Chunk text hash -> future
+        self.current = []
+        self.current_chars = 0
+
+    def _close_chunk(self) -> None:
+        self.closed.append(PAGE_BREAK.join(self.current))
+        self.current, self.current_chars = [], 0
+
+    def _submit(self, chunk_text: str) -> None:
+        label = f'{len(self.futures) + 1} (pipelined)'
+        self.futures[text_hash(chunk_text)] = _pipeline_pool.submit(_analyze_chunk, self.session, chunk_text, label)
+
+    def add_page(self, text: str) -> None:
+        """Add the next page's text; starts analyzing chunks it closes"""
+        self.pages.append(text)
+        self.total_chars += len(text)
+
+        if self.current and self.current_chars + len(text) > 2 * self.chunk_chars:
+            self._close_chunk()
+        self.current.append(text)
+        self.current_chars += len(text)
+        if self.current_chars >= self.chunk_chars // 2 and _ends_chunk(text, self.chunk_chars):
+            self._close_chunk()
+
+        # Below one chunk the whole document is a single chunk, so nothing is final yet
+        if self.total_chars > self.chunk_chars:
+            for chunk_text in self.closed:
+                self._submit(chunk_text)
+            self.closed = []
+
+    def cancel(self) -> None:
+        """Drop queued chunk analyses (extraction failed) and wait for running ones"""
+        for future in self.futures.values():
+            future.cancel()
+        wait(self.futures.values())
+
+    def finish(self) -> dict:
+        """
+        Analyze the remaining chunks, wait for every chunk and merge them
+
+        Returns:
+            dict: Same shape as analyze_session_pages()
+
+        Raises:
+            LLMUnavailableError: The LLM is rate limited or unavailable
+        """
+        chunks = build_chunks(self.pages, self.chunk_chars)
+        for chunk_text in chunks:
+            if text_hash(chunk_text) not in self.futures:
+                self._submit(chunk_text)
+
+        # Normally every submitted chunk is part of the document; wait for any that isn't
+        wait(self.futures.values())
+
+        outcomes = []
+        for chunk_text in chunks:
+            try:
+                outcomes.append(self.futures[text_hash(chunk_text)].result())
+            except LLMUnavailableError:
+                raise
+            except Exception as e:
+                outcomes.append(({'success': False, 'error': str(e)}, False))
+
+        return _combine_chunk_results(self.session, chunks, outcomes, self.chunk_chars)
@@ -0,0 +1,153 @@
+"""
+Streaming DOCX text extraction for AgreeWise
+Reads word/document.xml and the header/footer parts straight from the zip
+with an incremental XML parser instead of building a python-docx Document.
+Text comes out in true document order (paragraphs and tables interleaved),
+each table cell is read once, and parsed elements are discarded as soon as
+their text is taken, so memory stays flat for very long contracts.
+"""
+
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+HEADER_PART = re.compile(r'^word/header(\d*)\.xml$')
+FOOTER_PART = re.compile(r'^word/footer(\d*)\.xml$')
+
+# Run children that stand for characters, like python-docx's paragraph.text
+RUN_CHARACTERS = {
+    W + 'tab': '\t',
+    W + 'br': '\n',
+    W + 'cr': '\n',
+    W + 'noBreakHyphen': '-',
+}
+
+
+def _numbered_parts(names: list, pattern) -> list:
+    """Header or footer part names in numeric order"""
+    numbered = [(int(match.group(1) or 0), name) for name in names for match in [pattern.match(name)] if match]
+    return [name for _, name in sorted(numbered)]
+
+
+def iter_part_blocks(stream):
+    """
+    Yield text blocks from one WordprocessingML part in document order
+
+    Paragraphs are yielded as their text, table rows as their non-empty
+    cells joined with ' | '. Blank paragraphs and rows are skipped.
+
+    Args:
+        stream: File-like object with the part's XML
+    """
+    paragraphs = []   # Open paragraphs (text boxes can nest them): lists of text pieces
+    tables = []       # Open tables: {'cells': cells of the current row, 'lines': lines of the current cell}
+    run_depth = 0
+    skip_depth = 0    # Inside mc:Fallback, which repeats the mc:Choice content
+    merged_cell = False
+    parents = []
+
+    def emit(text):
+        """Send a finished paragraph or row to the enclosing cell, or out"""
+        if tables and tables[-1]['lines'] is not None:
+            tables[-1]['lines'].append(text)
+            return None
+        return text if text.strip() else None
+
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        tag = elem.tag
+
+        if event == 'start':
+            parents.append(elem)
+            if skip_depth or tag == MC_FALLBACK:
+                skip_depth += 1
+            elif tag == W + 'p':
+                paragraphs.append([])
+            elif tag == W + 'r':
+                run_depth += 1
+            elif tag == W + 'tbl':
+                tables.append({'cells': None, 'lines': None})
+            elif tag == W + 'tr':
+                tables[-1]['cells'] = []
+            elif tag == W + 'tc':
+                tables[-1]['lines'] = []
+                merged_cell = False
+            elif tag == W + 'vMerge' and elem.get(W + 'val', 'continue') == 'continue':
+                # Continuation of a vertically merged cell - its text belongs to the cell above
+                merged_cell = True
+            continue
+
+        parents.pop()
+        if skip_depth:
+            skip_depth -= 1
+            elem.clear()
+            continue
+
+        block = None
+        if tag == W + 't' and run_depth and paragraphs:
+            paragraphs[-1].append(elem.text or '')
+        elif tag in RUN_CHARACTERS and run_depth and paragraphs:
+            paragraphs[-1].append(RUN_CHARACTERS[tag])
+        elif tag == W + 'r':
+            run_depth -= 1
+        elif tag == W + 'p':
+            block = emit(''.join(paragraphs.pop()))
+        elif tag == W + 'tc':
+            table = tables[-1]
+            cell_text = '\n'.join(table['lines']).strip()
+            if cell_text and not merged_cell:
+                table['cells'].append(cell_text)
+            table['lines'] = None
+        elif tag == W + 'tr':
+            row_text = ' | '.join(tables[-1]['cells'])
+            tables[-1]['cells'] = None
+            if len(tables) > 1:
+                # A nested table's row becomes a line of the outer table's cell
+                tables[-2]['lines'].append(row_text)
+            elif row_text:
+                block = row_text
+        elif tag == W + 'tbl':
+            tables.pop()
+
+        if block is not None:
+            yield block
+
+        # Drop finished elements so the tree never holds more than the open path
+        elem.clear()
+        if parents and tag in (W + 'p', W + 'tbl') and len(parents) <= 2:
+            parents[-1].clear()
+
+
+def extract_docx_text(file_path) -> str:
+    """
+    Extract text from a DOCX file by streaming its XML parts
+
+    Headers come first, then the body, then footers. Header and footer
+    blocks repeated across sections are kept once.
+
+    Returns:
+        str: Text blocks joined with blank lines
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        names = archive.namelist()
+        blocks = []
+        seen = set()
+
+        def read_part(name, deduplicate=False):
+            with archive.open(name) as stream:
+                for block in iter_part_blocks(stream):
+                    if deduplicate:
+                        if block in seen:
+                            continue
+                        seen.add(block)
+                    blocks.append(block)
+
+        for name in _numbered_parts(names, HEADER_PART):
+            read_part(name, deduplicate=True)
+        read_part('word/document.xml')
+        for name in _numbered_parts(names, FOOTER_PART):
+            read_part(name, deduplicate=True)
+
+    return '\n\n'.join(blocks)
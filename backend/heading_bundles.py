@@ -0,0 +1,150 @@
+"""
+Translated UI heading bundles for AgreeWise
+The analysis page's section headings, risk labels and hints never change,
+so they are translated once per language with Lingo.dev instead of on every
+analysis. Each bundle is saved under HEADING_BUNDLE_DIR, kept in memory and
+versioned by a hash of the English strings, so editing a heading produces new
+bundles and a new ETag.
+
+Build every bundle ahead of time (e.g. in the deploy build step):
+    python heading_bundles.py
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import threading
+
+from dotenv import load_dotenv
+
+from tts_generator import SUPPORTED_LANGUAGES
+
+load_dotenv()
+
+LINGO_DEV_API_KEY = os.getenv('LINGO_DEV_API_KEY')
+HEADING_BUNDLE_DIR = os.getenv('HEADING_BUNDLE_DIR', os.path.join(os.path.dirname(__file__), 'heading_bundles'))
+
+# English source strings; keys are what AnalyzePage.jsx reads from the bundle
+HEADINGS = {
+    # Section headings
+    'summary': 'Summary',
+    'whatYouMustDo': 'What You Must Do',
+    'whatYouGet': 'What You Get',
+    'importantWarnings': 'Important Warnings',
+    'importantTerms': 'Important Terms',
+    'questionsToAsk': 'Questions to Ask Before Signing',
+
+    # Risk levels
+    'lowRisk': 'LOW RISK',
+    'mediumRisk': 'MEDIUM RISK',
+    'highRisk': 'HIGH RISK',
+
+    # Risk messages
+    'fairBalance': 'This contract looks fair and balanced.',
+    'someConcerns': 'Some concerns found. Read the warnings below carefully.',
+    'cautionMessage': 'CAUTION: Multiple serious concerns found. Review carefully before signing.',
+
+    # Color guide
+    'colorGuide': 'Color Guide',
+    'redSerious': 'Red = Serious Risk',
+    'yellowModerate': 'Yellow = Moderate Risk',
+    'greenFavorable': 'Green = Favorable',
+    'expandSections': 'Expand sections below for detailed information',
+
+    # Flag labels
+    'redFlag': 'Red Flag',
+    'redFlags': 'Red Flags',
+    'yellowFlag': 'Yellow Flag',
+    'yellowFlags': 'Yellow Flags',
+    'positiveTerm': 'Positive Term',
+    'positiveTerms': 'Positive Terms',
+
+    # Other text
+    'copyMessageHint': 'Click "Copy Message" to generate a professional WhatsApp/Email ready message',
+    'showingTopQuestions': 'Showing top 3 of {count} questions',
+}
+
+BUNDLE_VERSION = hashlib.sha256(json.dumps(HEADINGS, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+_bundles = {'en': HEADINGS}
+_bundle_locks = {locale: threading.Lock() for locale in SUPPORTED_LANGUAGES}
+
+
+def bundle_path(locale: str) -> str:
+    """File holding one locale's bundle for the current version"""
+    return os.path.join(HEADING_BUNDLE_DIR, f'{locale}.{BUNDLE_VERSION}.json')
+
+
+def translate_headings(locale: str) -> dict:
+    """Translate HEADINGS with Lingo.dev, keeping the English text for any missing key"""
+    from lingodotdev.engine import LingoDotDevEngine
+
+    if not LINGO_DEV_API_KEY:
+        raise RuntimeError('LINGO_DEV_API_KEY is not configured')
+
+    translated = asyncio.run(LingoDotDevEngine.quick_translate(
+        HEADINGS,
+        api_key=LINGO_DEV_API_KEY,
+        source_locale='en',
+        target_locale=locale
+    ))
+    return {key: translated.get(key) or text for key, text in HEADINGS.items()}
+
+
+def get_bundle(locale: str) -> dict:
+    """
+    Heading bundle for a locale: from memory, then disk, then translated once
+
+    Raises:
+        ValueError: If the locale isn't in SUPPORTED_LANGUAGES
+        RuntimeError: If the bundle has to be translated and Lingo.dev fails
+    """
+    if locale not in SUPPORTED_LANGUAGES:
+        raise ValueError(f'Unsupported locale: {locale}')
+
+    bundle = _bundles.get(locale)
+    if bundle:
+        return bundle
+
+    # One translation per locale even when many requests arrive at once
+    with _bundle_locks[locale]:
+        bundle = _bundles.get(locale)
+        if bundle:
+            return bundle
+
+        path = bundle_path(locale)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                bundle = json.load(f)
+        else:
+            print(f'🌐 Translating heading bundle for {locale} (version {BUNDLE_VERSION})')
+            bundle = translate_headings(locale)
+            os.makedirs(HEADING_BUNDLE_DIR, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(bundle, f, ensure_ascii=False, indent=2)
+
+        _bundles[locale] = bundle
+        return bundle
+
+
+def build_all_bundles() -> list:
+    """Build every missing bundle; returns the locales that failed"""
+    failed = []
+    for locale in SUPPORTED_LANGUAGES:
+        try:
+            get_bundle(locale)
+            print(f'✓ {locale}')
+        except Exception as e:
+            print(f'⚠️  {locale}: {str(e)}')
+            failed.append(locale)
+    return failed
+
+
+if __name__ == '__main__':
+    failed = build_all_bundles()
+    if failed:
+        # Missing bundles are translated on first request, so don't fail the build
+        print(f'⚠️  {len(failed)} bundle(s) not built; they will be translated on first request')
+    sys.exit(0)
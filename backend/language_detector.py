@@ -0,0 +1,104 @@
+"""
+Lightweight document language detection for AgreeWise
+Identifies the language of extracted text from its Unicode script and,
+for Latin-script text, from common function words
+"""
+
+from collections import Counter
+from typing import Optional
+
+# Unicode ranges that identify a language on their own
+SCRIPT_RANGES = [
+    ('hi', 0x0900, 0x097F),  # Devanagari
+    ('ar', 0x0600, 0x06FF),  # Arabic
+    ('ru', 0x0400, 0x04FF),  # Cyrillic
+    ('ko', 0xAC00, 0xD7AF),  # Hangul syllables
+    ('ko', 0x1100, 0x11FF),  # Hangul jamo
+    ('ja', 0x3040, 0x30FF),  # Hiragana + Katakana
+    ('zh', 0x4E00, 0x9FFF),  # CJK ideographs (also used by Japanese)
+]
+
+# Frequent function words used to tell Latin-script languages apart
+LATIN_STOPWORDS = {
+    'en': {'the', 'and', 'of', 'to', 'in', 'is', 'for', 'shall', 'this', 'with', 'be', 'you', 'will'},
+    'es': {'el', 'la', 'de', 'que', 'y', 'en', 'los', 'del', 'las', 'por', 'con', 'una', 'para'},
+    'fr': {'le', 'la', 'les', 'de', 'des', 'et', 'du', 'est', 'une', 'pour', 'dans', 'que', 'sur'},
+    'de': {'der', 'die', 'das', 'und', 'ist', 'den', 'zu', 'mit', 'von', 'des', 'nicht', 'ein', 'sie'},
+    'pt': {'o', 'a', 'de', 'que', 'e', 'do', 'da', 'em', 'os', 'para', 'com', 'uma', 'não'},
+    'it': {'il', 'di', 'che', 'e', 'la', 'per', 'un', 'del', 'della', 'sono', 'con', 'non', 'alla'},
+    'tr': {'ve', 'bir', 'bu', 'ile', 'için', 'olarak', 'olan', 'da', 'de', 'veya', 'her', 'gibi'},
+    'pl': {'i', 'w', 'z', 'na', 'się', 'do', 'nie', 'że', 'jest', 'oraz', 'przez', 'od'},
+    'nl': {'de', 'het', 'een', 'van', 'en', 'in', 'is', 'dat', 'op', 'voor', 'met', 'niet', 'zijn'},
+}
+
+# Only look at the start of long documents - it is enough to decide
+SAMPLE_CHARS = 5000
+
+
+def detect_script_language(text: str) -> Optional[str]:
+    """
+    Detect a language from non-Latin script characters
+
+    Args:
+        text: Text to inspect
+
+    Returns:
+        str: Language code, or None if the text is mostly Latin script
+    """
+    counts = Counter()
+    letters = 0
+
+    for char in text[:SAMPLE_CHARS]:
+        if not char.isalpha():
+            continue
+        letters += 1
+        code_point = ord(char)
+        for language, start, end in SCRIPT_RANGES:
+            if start <= code_point <= end:
+                counts[language] += 1
+                break
+
+    if not letters or sum(counts.values()) < letters * 0.3:
+        return None
+
+    # Japanese mixes kanji with kana; any real amount of kana means Japanese
+    if counts['ja'] and counts['ja'] >= counts['zh'] * 0.2:
+        return 'ja'
+
+    return counts.most_common(1)[0][0]
+
+
+def detect_latin_language(text: str) -> Optional[str]:
+    """
+    Pick the Latin-script language whose function words occur most often
+
+    Args:
+        text: Text to inspect
+
+    Returns:
+        str: Language code, or None if no function words were found
+    """
+    words = [word.strip('.,;:()"\'!?').lower() for word in text[:SAMPLE_CHARS].split()]
+    scores = {
+        language: sum(1 for word in words if word in stopwords)
+        for language, stopwords in LATIN_STOPWORDS.items()
+    }
+
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else None
+
+
+def detect_text_language(text: str) -> Optional[str]:
+    """
+    Detect the language of extracted text
+
+    Args:
+        text: Text from a PDF/DOCX text layer or a quick OCR pass
+
+    Returns:
+        str: Language code (e.g. 'en', 'hi', 'es'), or None if undecided
+    """
+    if not text or not text.strip():
+        return None
+
+    return detect_script_language(text) or detect_latin_language(text)
@@ -0,0 +1,122 @@
+"""
+PDF text-layer extraction engines for AgreeWise
+pdfium (via pypdfium2, already installed with pdfplumber) reads the text
+layer in native code and is much faster than pdfplumber's character-level
+layout analysis. Pages where pdfium's text looks garbled or missing are
+re-read with pdfplumber. Long PDFs are split into page ranges and extracted
+in parallel worker processes (pdfium is not thread-safe and pdfplumber is
+pure Python, so threads would not help). Within a process, every pdfium
+call holds _pdfium_lock, since request threads and the bulk extract pool
+share it.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+import pypdfium2 as pdfium
+
+# 'pdfium' (default) or 'pdfplumber'
+PDF_ENGINE = os.getenv('PDF_ENGINE', 'pdfium')
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 16))  # Smaller PDFs aren't worth the IPC
+
+# Share of unreadable characters above which a pdfium page is re-read with pdfplumber
+GARBLED_CHAR_RATIO = 0.02
+
+_pool = None
+_pool_lock = threading.Lock()
+_pdfium_lock = threading.Lock()  # pdfium's global state must not be used by two threads at once
+
+
+def needs_layout_fallback(text: str, char_count: int) -> bool:
+    """True if pdfium's text for a page looks missing or garbled"""
+    if char_count and not text.strip():
+        return True
+    unreadable = sum(1 for c in text if c == '\ufffd' or (ord(c) < 32 and c not in '\n\t'))
+    return unreadable > GARBLED_CHAR_RATIO * max(1, len(text))
+
+
+def _pdfplumber_pages(file_path, page_indexes) -> dict:
+    """Extract the given pages (0-based) with pdfplumber"""
+    texts = {}
+    with pdfplumber.open(file_path) as pdf:
+        for index in page_indexes:
+            texts[index] = pdf.pages[index].extract_text() or ''
+    return texts
+
+
+def _extract_range(file_path, start: int, stop: int, engine: str) -> list:
+    """Extract pages [start, stop) with one engine; runs in a worker process for long PDFs"""
+    if engine == 'pdfplumber':
+        texts = _pdfplumber_pages(file_path, range(start, stop))
+        return [texts[index] for index in range(start, stop)]
+
+    texts = {}
+    fallback = []
+    with _pdfium_lock:
+        doc = pdfium.PdfDocument(file_path)
+        try:
+            for index in range(start, stop):
+                page = doc[index]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range().replace('\r\n', '\n')
+                if needs_layout_fallback(text, textpage.count_chars()):
+                    fallback.append(index)
+                texts[index] = text
+                textpage.close()
+                page.close()
+        finally:
+            doc.close()
+
+    if fallback:
+        print(f'  Re-reading {len(fallback)} page(s) with pdfplumber')
+        texts.update(_pdfplumber_pages(file_path, fallback))
+    return [texts[index] for index in range(start, stop)]
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Worker processes for page ranges, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a multi-threaded server process can deadlock
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def page_count(file_path) -> int:
+    """Number of pages in a PDF"""
+    with _pdfium_lock:
+        doc = pdfium.PdfDocument(file_path)
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+
+
+def extract_pdf_pages(file_path, engine: str = None) -> list:
+    """
+    Extract the text layer of every page
+
+    Args:
+        file_path: Path to the PDF
+        engine: 'pdfium' or 'pdfplumber' (default: PDF_ENGINE env var)
+
+    Returns:
+        list: One text string per page ('' for pages without text)
+    """
+    engine = engine or PDF_ENGINE
+    total = page_count(file_path)
+
+    if total < PDF_PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+        return _extract_range(file_path, 0, total, engine)
+
+    step = -(-total // PDF_WORKERS)
+    futures = [
+        _get_pool().submit(_extract_range, file_path, start, min(start + step, total), engine)
+        for start in range(0, total, step)
+    ]
+    return [text for future in futures for text in future.result()]
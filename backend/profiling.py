@@ -0,0 +1,292 @@
+"""
+On-demand profiling for live AgreeWise workers
+Disabled unless PROFILING_TOKEN is set; every capture must present it in the
+X-Profile-Token header. Results are written under PROFILE_DIR:
+
+- Per request, with an X-Profile header:
+    cprofile -> .prof (pstats; open with snakeviz or python -m pstats)
+    sample   -> .folded (sampled stacks of the request thread)
+    memory   -> .tracemalloc snapshot + .txt of allocations grown during
+                the request in the OCR/extraction path
+- Per worker, over a time window: sampled stacks of every thread as .folded
+- tracemalloc snapshots on demand
+
+.folded files are collapsed stacks, the input format of flamegraph.pl and
+speedscope.
+"""
+
+import cProfile
+import hmac
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from functools import wraps
+
+from flask import g, jsonify, request
+
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'agreewise_profiles'))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))  # Seconds between samples
+PROFILE_MAX_WINDOW_SECONDS = 300
+TRACEMALLOC_FRAMES = 25
+TRACEMALLOC_TOP = 30
+
+# Allocations are attributed to the extraction path if any frame is in these files
+EXTRACTION_PATTERNS = [
+    '*/document_processor.py', '*/pdf_text.py', '*/docx_stream.py', '*/language_detector.py',
+    '*/easyocr/*', '*/PIL/*', '*/pdfplumber/*', '*/pdfminer/*', '*/pypdfium2/*', '*/pdf2image/*',
+]
+
+# Only one cProfile may be active per process (Python 3.12+ refuses a second one)
+_cprofile_lock = threading.Lock()
+_window_lock = threading.Lock()
+
+# Memory-profiled requests in progress; tracing they started stops with the last one
+_memory_lock = threading.Lock()
+_memory_captures = 0
+_memory_started_tracing = False
+
+
+def profiling_enabled() -> bool:
+    return bool(PROFILING_TOKEN)
+
+
+def authorized(req) -> bool:
+    """True if profiling is enabled and the request carries the token"""
+    token = req.headers.get('X-Profile-Token', '')
+    return profiling_enabled() and hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+
+def profiling_required(view):
+    """Hide a view (404) when profiling is off and reject requests without the token (403)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not profiling_enabled():
+            return jsonify({'success': False, 'error': 'Not found'}), 404
+        if not authorized(request):
+            return jsonify({'success': False, 'error': 'Invalid profiling token'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def profile_path(kind: str, label: str, extension: str) -> str:
+    """Timestamped output path under PROFILE_DIR"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_label = ''.join(c if c.isalnum() or c in '-_' else '_' for c in label or 'request')
+    name = f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{kind}-{safe_label}{extension}'
+    return os.path.join(PROFILE_DIR, name)
+
+
+class StackSampler:
+    """Samples Python stacks from a background thread into collapsed-stack counts"""
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id  # None samples every thread
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self) -> 'StackSampler':
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_id and thread_id != self.thread_id):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                if self.thread_id is None:
+                    if thread_id not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def write_folded(self, path: str) -> str:
+        """Write 'frame;frame;frame count' lines for flamegraph.pl / speedscope"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f'{stack} {count}\n')
+        return path
+
+
+def start_tracemalloc() -> bool:
+    """Start tracing allocations; returns False if it was already on"""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    return True
+
+
+def stop_tracemalloc() -> None:
+    tracemalloc.stop()
+
+
+def extraction_snapshot(snapshot):
+    """Only the traces whose stack passes through the OCR/extraction path"""
+    return snapshot.filter_traces([
+        tracemalloc.Filter(True, pattern, all_frames=True) for pattern in EXTRACTION_PATTERNS
+    ])
+
+
+def write_tracemalloc_report(stats, path: str, title: str) -> str:
+    """Write the top allocation stats as text"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'{title}\n\n')
+        for stat in stats[:TRACEMALLOC_TOP]:
+            f.write(f'{stat}\n')
+            for line in stat.traceback.format(limit=5):
+                f.write(f'    {line}\n')
+    return path
+
+
+def take_snapshot(label: str = 'snapshot') -> dict:
+    """Dump a tracemalloc snapshot and a top-allocations report of the extraction path"""
+    started = start_tracemalloc()
+    snapshot = tracemalloc.take_snapshot()
+    dump_path = profile_path('tracemalloc', label, '.tracemalloc')
+    snapshot.dump(dump_path)
+
+    stats = extraction_snapshot(snapshot).statistics('traceback')
+    report_path = write_tracemalloc_report(
+        stats, profile_path('tracemalloc', label, '.txt'), 'Largest live allocations in the extraction path'
+    )
+    current, peak = tracemalloc.get_traced_memory()
+    return {'snapshot': dump_path, 'report': report_path, 'traced_bytes': current, 'peak_bytes': peak,
+            'tracing_started': started}
+
+
+def begin_request_profile() -> None:
+    """Start the capture named by X-Profile (call from before_request)"""
+    global _memory_captures, _memory_started_tracing
+    mode = request.headers.get('X-Profile')
+    if not mode or not authorized(request):
+        return
+
+    if mode == 'cprofile':
+        if not _cprofile_lock.acquire(blocking=False):
+            g.profile = {'mode': mode, 'busy': True}
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        g.profile = {'mode': mode, 'profiler': profiler}
+    elif mode == 'sample':
+        g.profile = {'mode': mode, 'sampler': StackSampler(thread_id=threading.get_ident()).start()}
+    elif mode == 'memory':
+        with _memory_lock:
+            if _memory_captures == 0:
+                _memory_started_tracing = start_tracemalloc()
+            _memory_captures += 1
+        g.profile = {'mode': mode, 'before': tracemalloc.take_snapshot()}
+
+
+def _stop_capture(capture) -> None:
+    """Release what a capture holds: the cProfile slot, the sampler thread, or its share of tracing"""
+    global _memory_captures, _memory_started_tracing
+    if capture['mode'] == 'cprofile':
+        capture['profiler'].disable()
+        _cprofile_lock.release()
+    elif capture['mode'] == 'sample':
+        capture['sampler'].stop()
+    else:
+        with _memory_lock:
+            _memory_captures -= 1
+            if _memory_captures == 0 and _memory_started_tracing:
+                stop_tracemalloc()
+                _memory_started_tracing = False
+
+
+def end_request_profile(response):
+    """Finish the request's capture and name the file in X-Profile-File (call from after_request)"""
+    capture = g.pop('profile', None)
+    if not capture:
+        return response
+    if capture.get('busy'):
+        response.headers['X-Profile-File'] = 'busy'
+        return response
+
+    label = request.endpoint or 'request'
+    if capture['mode'] == 'memory':
+        # Snapshot before this request's share of tracing is released
+        try:
+            after = tracemalloc.take_snapshot()
+        finally:
+            _stop_capture(capture)
+    else:
+        _stop_capture(capture)
+
+    if capture['mode'] == 'cprofile':
+        path = profile_path('cprofile', label, '.prof')
+        capture['profiler'].dump_stats(path)
+    elif capture['mode'] == 'sample':
+        path = capture['sampler'].write_folded(profile_path('sample', label, '.folded'))
+    else:
+        # Other threads allocate too; the extraction filter keeps the report about this path
+        after.dump(profile_path('memory', label, '.tracemalloc'))
+        stats = extraction_snapshot(after).compare_to(extraction_snapshot(capture['before']), 'traceback')
+        path = write_tracemalloc_report(stats, profile_path('memory', label, '.txt'),
+                                        f'Extraction-path allocation growth during {request.path}')
+
+    print(f'🔬 Profile written: {path}')
+    response.headers['X-Profile-File'] = os.path.basename(path)
+    return response
+
+
+def abandon_request_profile(error=None) -> None:
+    """
+    Stop a capture end_request_profile never finished (call from teardown_request)
+
+    after_request is skipped when a view raises an unhandled exception; without
+    this the profiler would stay enabled and hold the cProfile slot.
+    """
+    capture = g.pop('profile', None)
+    if capture and not capture.get('busy'):
+        _stop_capture(capture)
+
+
+def profile_window(seconds: float, interval: float = PROFILE_SAMPLE_INTERVAL) -> str:
+    """
+    Sample every thread of this worker for a time window in the background
+
+    Returns:
+        str: Path the .folded file will be written to when the window ends
+
+    Raises:
+        RuntimeError: If a window is already being recorded
+    """
+    if not _window_lock.acquire(blocking=False):
+        raise RuntimeError('A profiling window is already running in this worker')
+
+    seconds = max(1.0, min(seconds, PROFILE_MAX_WINDOW_SECONDS))
+    path = profile_path('window', f'{int(seconds)}s', '.folded')
+    sampler = StackSampler(interval=interval).start()
+
+    def finish():
+        try:
+            time.sleep(seconds)
+            sampler.stop()
+            sampler.write_folded(path)
+            print(f'🔬 Profile window written: {path} ({sampler.samples} samples)')
+        finally:
+            _window_lock.release()
+
+    threading.Thread(target=finish, name='profile-window', daemon=True).start()
+    return path
@@ -0,0 +1,174 @@
+"""
+Prompt compaction and token budgeting for AI analysis
+Strips OCR/page boilerplate from contract text and fits it into a token budget
+before it is sent to the LLM
+"""
+
+import os
+import re
+
+try:
+    import tiktoken
+    # Llama 3 uses a tiktoken BPE close to cl100k_base, good enough for budgeting
+    _encoding = tiktoken.get_encoding('cl100k_base')
+except Exception:  # tiktoken not installed or encoding unavailable offline
+    _encoding = None
+
+# Total input tokens (system prompt + contract text) per analysis request
+INPUT_TOKEN_BUDGET = int(os.getenv('ANALYSIS_INPUT_TOKEN_BUDGET', 10000))
+
+# A short line that is the first (header) or last (footer) line of most pages,
+# and of at least this many, is boilerplate
+BOILERPLATE_MIN_REPEATS = 3
+BOILERPLATE_MAX_CHARS = 120
+PAGE_NUMBER_EDGE_LINES = 2  # Page-number-only lines stripped from each page edge
+DUPLICATE_MIN_CHARS = 40  # Shorter identical lines (totals, labels, amounts) are content, not duplicates
+
+TRUNCATION_MARKER = '\n\n[... document continues ...]'
+
+PAGE_BREAK_PATTERN = re.compile(r'-{2,}\s*PAGE BREAK\s*-{2,}', re.IGNORECASE)
+PAGE_NUMBER_PATTERN = re.compile(r'^(page\s*\d{1,4}(\s*(of|/)\s*\d{1,4})?|\d{1,3}\s*(of|/)\s*\d{1,3}|\d{1,3}|-\s*\d{1,3}\s*-)$',
+                                 re.IGNORECASE)
+# A page number inside a header/footer line
+PAGE_NUMBER_IN_LINE_PATTERN = re.compile(r'\bpage\s*\d{1,4}(\s*(of|/)\s*\d{1,4})?\b|\b\d{1,3}\s*(of|/)\s*\d{1,3}\s*$',
+                                         re.IGNORECASE)
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the local tokenizer (about 4 characters per token without tiktoken)"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _boilerplate_key(line: str) -> str:
+    """A header/footer line with its page number normalized ("Lease - Page 3 of 9" -> "Lease - Page # of #")"""
+    return PAGE_NUMBER_IN_LINE_PATTERN.sub(lambda m: re.sub(r'\d+', '#', m.group(0)), line)
+
+
+def _strip_page_numbers(lines: list) -> list:
+    """Drop page-number-only lines at the top and bottom edges of a page"""
+    start, end = 0, len(lines)
+    while start < min(end, PAGE_NUMBER_EDGE_LINES) and PAGE_NUMBER_PATTERN.match(lines[start]):
+        start += 1
+    while end > max(start, len(lines) - PAGE_NUMBER_EDGE_LINES) and PAGE_NUMBER_PATTERN.match(lines[end - 1]):
+        end -= 1
+    return lines[start:end]
+
+
+def _edge_keys(lines: list) -> list:
+    """(edge, key) of a page's header and footer candidates: its first and last line"""
+    if len(lines) < 2:
+        return []  # A one-line page is content, whatever repeats
+    return [(edge, _boilerplate_key(line)) for edge, line in (('top', lines[0]), ('bottom', lines[-1]))
+            if len(line) <= BOILERPLATE_MAX_CHARS]
+
+
+def compact_text(text: str) -> str:
+    """
+    Remove content that costs tokens without adding meaning:
+    page break separators, page numbers on the first or last lines of a page,
+    headers/footers that are the first or last line of most pages (kept once)
+    and long lines duplicated verbatim
+
+    Args:
+        text: Extracted contract text
+
+    Returns:
+        str: Compacted text
+    """
+    pages = []
+    for page in PAGE_BREAK_PATTERN.split(text):
+        lines = [' '.join(line.split()) for line in page.split('\n')]
+        pages.append(_strip_page_numbers([line for line in lines if line]))
+
+    repeats = {}
+    for lines in pages:
+        for key in set(_edge_keys(lines)):
+            repeats[key] = repeats.get(key, 0) + 1
+    min_repeats = max(BOILERPLATE_MIN_REPEATS, len(pages) // 2 + 1)
+    boilerplate = {key for key, count in repeats.items() if count >= min_repeats}
+
+    kept = []
+    seen_lines = set()
+    seen_boilerplate = set()
+    for lines in pages:
+        edges = {0: 'top', len(lines) - 1: 'bottom'} if len(lines) >= 2 else {}
+        for index, line in enumerate(lines):
+            key = (edges[index], _boilerplate_key(line)) if index in edges else None
+            if key in boilerplate:
+                if key in seen_boilerplate:
+                    continue
+                seen_boilerplate.add(key)
+            elif len(line) >= DUPLICATE_MIN_CHARS:
+                if line in seen_lines:
+                    continue
+                seen_lines.add(line)
+
+            kept.append(line)
+
+    return '\n\n'.join(kept)
+
+
+def fit_to_budget(text: str, max_tokens: int) -> str:
+    """
+    Truncate text so it fits in max_tokens, marking the cut
+
+    Args:
+        text: Text to fit
+        max_tokens: Token budget for the text
+
+    Returns:
+        str: The text, truncated if it was over budget
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    keep = max(0, max_tokens - count_tokens(TRUNCATION_MARKER))
+    if _encoding is not None:
+        truncated = _encoding.decode(_encoding.encode(text, disallowed_special=())[:keep])
+    else:
+        truncated = text[:keep * 4]
+
+    return truncated + TRUNCATION_MARKER
+
+
+def fits_budget(text: str, system_prompt: str, budget: int = None) -> bool:
+    """Whether compacted text and the system prompt fit the input budget without truncation"""
+    budget = budget or INPUT_TOKEN_BUDGET
+    return count_tokens(system_prompt) + count_tokens(compact_text(text)) <= budget
+
+
+def prepare_contract_text(text: str, system_prompt: str, budget: int = None) -> tuple:
+    """
+    Compact contract text and fit it, together with the system prompt, into the budget
+
+    Args:
+        text: Extracted contract text
+        system_prompt: System prompt sent with the text
+        budget: Total input token budget (default: INPUT_TOKEN_BUDGET)
+
+    Returns:
+        tuple: (prepared text, stats dict: raw/sent token counts, tokens saved by
+                compaction and tokens cut to fit the budget)
+    """
+    budget = budget or INPUT_TOKEN_BUDGET
+    system_tokens = count_tokens(system_prompt)
+    raw_tokens = count_tokens(text)
+
+    compacted = compact_text(text)
+    compacted_tokens = count_tokens(compacted)
+    truncated = compacted_tokens > budget - system_tokens
+    prepared = fit_to_budget(compacted, budget - system_tokens)
+    sent_tokens = count_tokens(prepared)
+
+    return prepared, {
+        'raw_text_tokens': raw_tokens,
+        'input_tokens': system_tokens + sent_tokens,
+        'input_tokens_saved': max(0, raw_tokens - compacted_tokens),
+        'input_tokens_truncated': compacted_tokens - (sent_tokens - count_tokens(TRUNCATION_MARKER))
+        if truncated else 0,
+        'truncated': truncated
+    }
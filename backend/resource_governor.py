@@ -0,0 +1,302 @@
+"""
+Resource governor for AgreeWise workers
+Tracks the worker's resident memory and the disk used by its temp files.
+Modules holding large objects (OCR readers, sessions, bulk job results)
+register evictors: idle entries are evicted on every check, and everything
+evictable goes when memory passes the soft limit. If memory is still above
+the hard limit afterwards, the worker asks the server to recycle it
+(SIGTERM, which gunicorn treats as a graceful worker restart) before the OOM
+killer does it mid-request.
+
+Orphaned temp files (uploads, OCR page images, MP3s and bulk job directories
+left by crashed requests) are swept on startup and periodically.
+"""
+
+import ctypes
+import gc
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+GOVERNOR_INTERVAL_SECONDS = int(os.getenv('GOVERNOR_INTERVAL_SECONDS', 30))
+TEMP_SWEEP_INTERVAL_SECONDS = int(os.getenv('TEMP_SWEEP_INTERVAL_SECONDS', 10 * 60))
+TEMP_ORPHAN_AGE_SECONDS = int(os.getenv('TEMP_ORPHAN_AGE_SECONDS', 6 * 60 * 60))
+TEMP_PRESSURE_AGE_SECONDS = 30 * 60  # Sweep age once TEMP_DISK_LIMIT_MB is exceeded
+TEMP_DISK_LIMIT_MB = int(os.getenv('TEMP_DISK_LIMIT_MB', 2048))
+RECYCLE_ON_MEMORY_PRESSURE = os.getenv('RECYCLE_ON_MEMORY_PRESSURE', 'true').lower() == 'true'
+
+# Everything this app writes to the temp dir starts with this prefix
+TEMP_PREFIX = 'agreewise_'
+UPLOAD_DIR_NAME = 'agreewise_uploads'
+PROFILE_DIR_NAME = 'agreewise_profiles'  # Operator output, never swept
+
+
+def _cgroup_memory_limit_mb():
+    """Container memory limit in MB, if there is one"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 50:  # cgroup v1 reports "no limit" as a huge number
+            return int(value) // (1024 * 1024)
+    return None
+
+
+def _limit_from_env(name: str, fraction: float):
+    """Limit in MB from the env var, else a fraction of the container limit (None = unlimited)"""
+    if os.getenv(name):
+        return int(os.getenv(name))
+    container_limit = _cgroup_memory_limit_mb()
+    return int(container_limit * fraction) if container_limit else None
+
+
+MEMORY_SOFT_LIMIT_MB = _limit_from_env('MEMORY_SOFT_LIMIT_MB', 0.70)
+MEMORY_HARD_LIMIT_MB = _limit_from_env('MEMORY_HARD_LIMIT_MB', 0.85)
+
+_evictors = {}
+_state_lock = threading.Lock()
+_stats = {
+    'checks': 0,
+    'evictions': {},
+    'pressure_events': 0,
+    'temp_sweeps': 0,
+    'temp_files_removed': 0,
+    'temp_bytes_removed': 0,
+    'recycle_requested': False,
+}
+_started = False
+
+
+def register_evictor(name: str, evict) -> None:
+    """
+    Register a cache that can give memory back
+
+    Args:
+        name: Name shown in stats
+        evict: Callable(force: bool) -> int, number of entries released.
+               force=False drops only idle entries, force=True everything evictable.
+    """
+    _evictors[name] = evict
+    _stats['evictions'].setdefault(name, 0)
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # No /proc (macOS): peak RSS is the best available figure
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _release_freed_memory() -> None:
+    """Collect garbage and hand freed heap pages back to the OS where glibc allows it"""
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def evict(force: bool) -> int:
+    """Run every evictor; returns the number of entries released"""
+    released = 0
+    for name, evictor in list(_evictors.items()):
+        try:
+            count = evictor(force) or 0
+        except Exception as e:
+            print(f'⚠️  Evictor {name} failed: {str(e)}')
+            continue
+        if count:
+            _stats['evictions'][name] += count
+            released += count
+    if released:
+        _release_freed_memory()
+    return released
+
+
+def _request_recycle(rss: float) -> None:
+    """Ask the server to replace this worker"""
+    if _stats['recycle_requested']:
+        return
+    _stats['recycle_requested'] = True
+
+    if RECYCLE_ON_MEMORY_PRESSURE and 'gunicorn' in sys.modules:
+        print(f'♻️  RSS {rss:.0f}MB is over the hard limit ({MEMORY_HARD_LIMIT_MB}MB), recycling worker {os.getpid()}')
+        # gunicorn workers finish in-flight requests on SIGTERM, then the arbiter starts a fresh one
+        os.kill(os.getpid(), signal.SIGTERM)
+    else:
+        print(f'⚠️  RSS {rss:.0f}MB is over the hard limit ({MEMORY_HARD_LIMIT_MB}MB); restart this process')
+
+
+def check_memory() -> dict:
+    """Evict idle entries, and more under memory pressure; recycle if that isn't enough"""
+    _stats['checks'] += 1
+    evict(force=False)
+
+    rss = rss_mb()
+    if MEMORY_SOFT_LIMIT_MB and rss > MEMORY_SOFT_LIMIT_MB:
+        _stats['pressure_events'] += 1
+        print(f'⚠️  RSS {rss:.0f}MB is over the soft limit ({MEMORY_SOFT_LIMIT_MB}MB), evicting caches')
+        evict(force=True)
+        rss = rss_mb()
+
+    if MEMORY_HARD_LIMIT_MB and rss > MEMORY_HARD_LIMIT_MB:
+        _request_recycle(rss)
+
+    return {'rss_mb': round(rss, 1)}
+
+
+def _path_size(path: str) -> int:
+    if os.path.isdir(path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _newest_mtime(path: str) -> float:
+    """Latest modification time of a file, or of anything inside a directory"""
+    newest = os.path.getmtime(path)
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            for name in dirs + files:
+                try:
+                    newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+                except OSError:
+                    pass
+    return newest
+
+
+def _temp_entries() -> list:
+    """(path, is resumable upload) for every app-owned temp file and directory"""
+    temp_dir = tempfile.gettempdir()
+    entries = []
+    for name in os.listdir(temp_dir):
+        if not name.startswith(TEMP_PREFIX) or name == PROFILE_DIR_NAME:
+            continue
+        path = os.path.join(temp_dir, name)
+        if name == UPLOAD_DIR_NAME and os.path.isdir(path):
+            entries.extend((os.path.join(path, upload), True) for upload in os.listdir(path))
+        else:
+            entries.append((path, False))
+    return entries
+
+
+def temp_usage_bytes() -> int:
+    """Disk used by app-owned temp files (all workers on this machine)"""
+    return sum(_path_size(path) for path, _ in _temp_entries())
+
+
+def sweep_temp_files(max_age: float = None) -> int:
+    """
+    Delete app-owned temp files nobody has touched for max_age seconds
+
+    Other workers share the temp dir, so only age marks a file as orphaned.
+    Resumable uploads are kept for their own TTL.
+
+    Returns:
+        int: Bytes removed
+    """
+    from resumable_uploads import RESUMABLE_UPLOAD_TTL_SECONDS  # resumable_uploads imports this module
+
+    max_age = TEMP_ORPHAN_AGE_SECONDS if max_age is None else max_age
+    now = time.time()
+    removed_files = removed_bytes = 0
+
+    for path, is_upload in _temp_entries():
+        try:
+            age = now - _newest_mtime(path)
+        except OSError:
+            continue  # Removed by its owner meanwhile
+        if age < (max(max_age, RESUMABLE_UPLOAD_TTL_SECONDS) if is_upload else max_age):
+            continue
+
+        size = _path_size(path)
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError:
+            continue
+        removed_files += 1
+        removed_bytes += size
+
+    with _state_lock:
+        _stats['temp_sweeps'] += 1
+        _stats['temp_files_removed'] += removed_files
+        _stats['temp_bytes_removed'] += removed_bytes
+    if removed_files:
+        print(f'🧹 Removed {removed_files} orphaned temp file(s), {removed_bytes // 1024} KB')
+    return removed_bytes
+
+
+def check_temp_disk() -> int:
+    """Sweep orphans, sooner if temp usage is over TEMP_DISK_LIMIT_MB; returns bytes in use"""
+    usage = temp_usage_bytes()
+    if usage > TEMP_DISK_LIMIT_MB * 1024 * 1024:
+        print(f'⚠️  Temp files use {usage // (1024 * 1024)}MB (limit {TEMP_DISK_LIMIT_MB}MB), sweeping')
+        sweep_temp_files(TEMP_PRESSURE_AGE_SECONDS)
+        usage = temp_usage_bytes()
+    return usage
+
+
+def _run():
+    last_sweep = time.time()
+    while True:
+        time.sleep(GOVERNOR_INTERVAL_SECONDS)
+        try:
+            check_memory()
+            if time.time() - last_sweep >= TEMP_SWEEP_INTERVAL_SECONDS:
+                sweep_temp_files()
+                last_sweep = time.time()
+            check_temp_disk()
+        except Exception as e:
+            print(f'⚠️  Resource governor check failed: {str(e)}')
+
+
+def start_governor() -> None:
+    """Sweep orphaned temp files now and start the periodic checks (once per process)"""
+    global _started
+    with _state_lock:
+        if _started:
+            return
+        _started = True
+
+    try:
+        sweep_temp_files()
+    except Exception as e:
+        print(f'⚠️  Startup temp sweep failed: {str(e)}')
+    threading.Thread(target=_run, name='resource-governor', daemon=True).start()
+
+
+def get_governor_stats() -> dict:
+    """Memory, temp disk and eviction counters for /api/metrics"""
+    return {
+        'rss_mb': round(rss_mb(), 1),
+        'memory_soft_limit_mb': MEMORY_SOFT_LIMIT_MB,
+        'memory_hard_limit_mb': MEMORY_HARD_LIMIT_MB,
+        'temp_bytes': temp_usage_bytes(),
+        'temp_disk_limit_mb': TEMP_DISK_LIMIT_MB,
+        **_stats,
+        'evictions': dict(_stats['evictions'])
+    }
@@ -0,0 +1,108 @@
+"""
+Response shaping for lean API payloads
+Field projection for /api/analyze responses and negotiated gzip/brotli
+compression for every JSON response
+"""
+
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # Optional - gzip is used when brotli isn't installed
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Good ratio at a latency close to gzip -6
+
+COMPRESSIBLE_MIMETYPES = {'application/json'}
+
+
+def _omit_path(data, path: list) -> None:
+    """Remove a dotted path from nested dicts, applying to every item of lists on the way"""
+    if isinstance(data, list):
+        for item in data:
+            _omit_path(item, path)
+        return
+    if not isinstance(data, dict) or not path:
+        return
+    if len(path) == 1:
+        data.pop(path[0], None)
+    elif path[0] in data:
+        _omit_path(data[path[0]], path[1:])
+
+
+def project_fields(data: dict, fields: str = None, omit: str = None) -> dict:
+    """
+    Shape a response dict
+
+    Args:
+        data: Response dict (modified in place)
+        fields: Comma-separated top-level keys to keep ('success' is always kept)
+        omit: Comma-separated dotted paths to drop, e.g. 'pages.text,analysis.english'
+
+    Returns:
+        dict: The shaped response
+    """
+    if fields:
+        keep = {f.strip() for f in fields.split(',') if f.strip()} | {'success'}
+        for key in [k for k in data if k not in keep]:
+            del data[key]
+
+    if omit:
+        for path in omit.split(','):
+            if path.strip():
+                _omit_path(data, path.strip().split('.'))
+
+    return data
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header (None if neither is acceptable)"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with 'br' or 'gzip'"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response, accept_encoding: str):
+    """
+    Compress a JSON response if the client accepts it (use as an after_request hook)
+
+    Streamed responses, small bodies and already-encoded responses are left alone.
+    """
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or response.direct_passthrough \
+            or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encoding = choose_encoding(accept_encoding)
+    body = response.get_data()
+    if not encoding or len(body) < COMPRESSION_MIN_BYTES:
+        return response
+
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,242 @@
+"""
+Chunked, resumable uploads for large scanned documents
+A client creates an upload, sends the file in chunks at explicit offsets and,
+after a dropped connection, asks for the current offset and continues from
+there instead of resending everything. Completed uploads are then passed to
+/api/analyze by ID, which takes the file over.
+
+Each open upload can reserve up to RESUMABLE_MAX_FILE_SIZE of temp disk, so
+open uploads are capped per client and per worker, and the resource governor
+prunes expired ones on every check.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from upload_guard import SNIFF_BYTES, matches_extension
+from resource_governor import TEMP_PREFIX, UPLOAD_DIR_NAME, register_evictor
+
+RESUMABLE_MAX_FILE_SIZE = int(os.getenv('RESUMABLE_MAX_FILE_SIZE', 50 * 1024 * 1024))  # 50MB
+RESUMABLE_CHUNK_SIZE = int(os.getenv('RESUMABLE_CHUNK_SIZE', 1024 * 1024))  # Suggested to clients
+RESUMABLE_MAX_CHUNK_SIZE = int(os.getenv('RESUMABLE_MAX_CHUNK_SIZE', 8 * 1024 * 1024))
+RESUMABLE_UPLOAD_TTL_SECONDS = int(os.getenv('RESUMABLE_UPLOAD_TTL_SECONDS', 24 * 60 * 60))
+RESUMABLE_MAX_OPEN_UPLOADS = int(os.getenv('RESUMABLE_MAX_OPEN_UPLOADS', 20))  # Per worker
+RESUMABLE_MAX_UPLOADS_PER_CLIENT = int(os.getenv('RESUMABLE_MAX_UPLOADS_PER_CLIENT', 3))
+
+UPLOAD_DIR = os.path.join(tempfile.gettempdir(), UPLOAD_DIR_NAME)
+
+_uploads = {}
+_uploads_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Upload request rejected; carries the HTTP status to return"""
+
+    def __init__(self, message, status=400, received=None):
+        super().__init__(message)
+        self.status = status
+        self.received = received
+
+
+def _prune_uploads() -> int:
+    """Delete uploads untouched for RESUMABLE_UPLOAD_TTL_SECONDS (lock held); returns how many"""
+    now = time.time()
+    expired = [u for u, up in _uploads.items() if now - up['updated_at'] > RESUMABLE_UPLOAD_TTL_SECONDS]
+    for upload_id in expired:
+        upload = _uploads.pop(upload_id)
+        if os.path.exists(upload['path']):
+            os.remove(upload['path'])
+    return len(expired)
+
+
+def evict_expired_uploads(force: bool = False) -> int:
+    """
+    Drop expired uploads (governor evictor)
+
+    Uploads hold disk rather than memory, so memory pressure doesn't drop
+    unexpired ones.
+
+    Returns:
+        int: Number of uploads dropped
+    """
+    with _uploads_lock:
+        return _prune_uploads()
+
+
+register_evictor('resumable_uploads', evict_expired_uploads)
+
+
+def create_upload(filename: str, size: int, client: str = None) -> dict:
+    """
+    Start a resumable upload
+
+    Args:
+        filename: Sanitized original filename
+        size: Total file size in bytes
+        client: Client identifier for the per-client cap
+
+    Returns:
+        dict: Upload status (see upload_status)
+
+    Raises:
+        UploadError: 413 for a bad size, 429 if the client has too many open
+                     uploads, 503 if the worker does
+    """
+    if size <= 0 or size > RESUMABLE_MAX_FILE_SIZE:
+        raise UploadError(f'File size must be between 1 byte and {RESUMABLE_MAX_FILE_SIZE // (1024 * 1024)}MB', 413)
+
+    upload_id = uuid.uuid4().hex
+    upload = {
+        'id': upload_id,
+        'client': client,
+        'filename': filename,
+        'size': size,
+        'received': 0,
+        'head': b'',  # First bytes received, checked against the extension at SNIFF_BYTES
+        'path': os.path.join(UPLOAD_DIR, f'{upload_id}{os.path.splitext(filename)[1]}'),
+        'lock': threading.Lock(),
+        'updated_at': time.time()
+    }
+
+    with _uploads_lock:
+        _prune_uploads()
+        if sum(1 for up in _uploads.values() if up['client'] == client) >= RESUMABLE_MAX_UPLOADS_PER_CLIENT:
+            raise UploadError(f'Too many open uploads (limit {RESUMABLE_MAX_UPLOADS_PER_CLIENT}); '
+                              'finish or analyze one first', 429)
+        if len(_uploads) >= RESUMABLE_MAX_OPEN_UPLOADS:
+            raise UploadError('Server is handling too many uploads, try again later', 503)
+
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        open(upload['path'], 'wb').close()
+        _uploads[upload_id] = upload
+
+    return upload_status(upload)
+
+
+def get_upload(upload_id: str) -> dict:
+    """Look up an upload, raising UploadError(404) if unknown or expired"""
+    with _uploads_lock:
+        upload = _uploads.get(upload_id)
+    if not upload:
+        raise UploadError('Upload not found or expired', 404)
+    return upload
+
+
+def upload_status(upload: dict) -> dict:
+    """Public view of an upload's progress"""
+    return {
+        'upload_id': upload['id'],
+        'filename': upload['filename'],
+        'size': upload['size'],
+        'received': upload['received'],
+        'complete': upload['received'] == upload['size'],
+        'chunk_size': RESUMABLE_CHUNK_SIZE
+    }
+
+
+def append_chunk(upload_id: str, offset: int, stream, length: int) -> dict:
+    """
+    Append one chunk at offset, streaming it from the request body
+
+    Args:
+        upload_id: Upload ID from create_upload
+        offset: Byte offset the chunk starts at (must equal bytes received)
+        stream: Request body stream
+        length: Chunk length from Content-Length
+
+    Returns:
+        dict: Upload status after the chunk
+    """
+    upload = get_upload(upload_id)
+
+    if length is None or length <= 0:
+        raise UploadError('Content-Length is required for chunks', 411)
+    if length > RESUMABLE_MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunk is larger than {RESUMABLE_MAX_CHUNK_SIZE // (1024 * 1024)}MB', 413)
+
+    with upload['lock']:
+        if offset != upload['received']:
+            raise UploadError('Offset does not match bytes received', 409, upload['received'])
+        if offset + length > upload['size']:
+            raise UploadError('Chunk goes past the declared file size', 413, upload['received'])
+
+        written = 0
+        mismatch = False
+        head = upload['head']
+        sniff_bytes = min(SNIFF_BYTES, upload['size'])
+        with open(upload['path'], 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                block = stream.read(min(64 * 1024, length - written))
+                if not block:
+                    break
+
+                # Sniff the file type from its first bytes, which may span several chunks
+                if len(head) < sniff_bytes:
+                    head += block[:sniff_bytes - len(head)]
+                    if len(head) == sniff_bytes and not matches_extension(upload['filename'], head):
+                        mismatch = True
+                        break
+
+                f.write(block)
+                written += len(block)
+
+            # Drop a partially received chunk so the client can resend it whole
+            f.truncate(offset + written if written == length else offset)
+
+        if mismatch:
+            with _uploads_lock:
+                _uploads.pop(upload_id, None)
+            os.remove(upload['path'])
+            raise UploadError(f'File {upload["filename"]} does not match its file type', 415)
+
+        if written == length:
+            upload['received'] += written
+            upload['head'] = head
+        upload['updated_at'] = time.time()
+
+        if written != length:
+            raise UploadError('Chunk was interrupted, resend it', 400, upload['received'])
+
+    return upload_status(upload)
+
+
+def completed_upload_path(upload_id: str) -> tuple:
+    """
+    Take over a completed upload's file for processing
+
+    The upload is closed afterwards, so it no longer counts against the caps;
+    its pages live on in the analysis session.
+
+    Returns:
+        tuple: (temp file path, filename)
+    """
+    upload = get_upload(upload_id)
+    with upload['lock']:
+        if upload['received'] != upload['size']:
+            raise UploadError(f'Upload {upload_id} is not complete', 409, upload['received'])
+        with _uploads_lock:
+            if _uploads.pop(upload_id, None) is None:
+                raise UploadError('Upload not found or expired', 404)
+
+        temp_file = tempfile.NamedTemporaryFile(prefix=TEMP_PREFIX, delete=False,
+                                                suffix=os.path.splitext(upload['filename'])[1])
+        temp_file.close()
+        shutil.move(upload['path'], temp_file.name)
+    return temp_file.name, upload['filename']
+
+
+def get_upload_stats() -> dict:
+    """Open uploads and the bytes reserved for them, for /api/metrics"""
+    with _uploads_lock:
+        return {
+            'open_uploads': len(_uploads),
+            'max_open_uploads': RESUMABLE_MAX_OPEN_UPLOADS,
+            'max_uploads_per_client': RESUMABLE_MAX_UPLOADS_PER_CLIENT,
+            'reserved_bytes': sum(up['size'] for up in _uploads.values()),
+            'received_bytes': sum(up['received'] for up in _uploads.values())
+        }
@@ -0,0 +1,74 @@
+"""
+Single-flight request coalescing
+Concurrent calls with the same key wait for the first call's result instead
+of repeating the work
+"""
+
+import threading
+
+
+class _Flight:
+    """One in-progress computation and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time and share its result"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {'executed': 0, 'deduplicated': 0, 'in_flight': 0}
+
+    def do(self, key, fn):
+        """
+        Run fn() for key, or wait for the identical call already running
+
+        Args:
+            key: Hashable identity of the work
+            fn: Zero-argument callable doing the work
+
+        Returns:
+            tuple: (fn's result, True if the result was shared from another call)
+
+        Raises:
+            Whatever fn() raised, in the caller that ran it and in every waiter
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats['deduplicated'] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self._stats['executed'] += 1
+                self._stats['in_flight'] += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            # Later callers start a fresh computation; waiters already hold the flight
+            with self._lock:
+                del self._flights[key]
+                self._stats['in_flight'] -= 1
+            flight.done.set()
+
+    def get_stats(self) -> dict:
+        """Counts of executed and deduplicated calls"""
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,262 @@
+"""
+Template fingerprinting for near-identical contracts
+Most uploads are the same rental or employment template with different
+names, dates and amounts. Each fully analyzed document is fingerprinted with
+a MinHash signature over word shingles and stored in a local SQLite index
+with LSH band keys. A new document that matches a stored template closely
+enough gets the template's analysis updated for just the changed spans,
+instead of a full analysis.
+
+Opt-in with TEMPLATE_REUSE=true, because the index keeps contract text on disk.
+"""
+
+import difflib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from ai_analyzer import analyze_contract, update_analysis, LLMUnavailableError
+
+TEMPLATE_REUSE = os.getenv('TEMPLATE_REUSE', 'false').lower() == 'true'
+TEMPLATE_INDEX_PATH = os.getenv('TEMPLATE_INDEX_PATH', os.path.join(os.path.dirname(__file__), 'template_index.db'))
+TEMPLATE_MIN_SIMILARITY = float(os.getenv('TEMPLATE_MIN_SIMILARITY', 0.8))
+TEMPLATE_MAX_CHANGED_WORDS = float(os.getenv('TEMPLATE_MAX_CHANGED_WORDS', 0.15))  # Fraction of the document
+TEMPLATE_MAX_ENTRIES = int(os.getenv('TEMPLATE_MAX_ENTRIES', 1000))  # Oldest templates are dropped beyond this
+
+SHINGLE_WORDS = 5
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32  # 4 rows per band: ~50% match chance at Jaccard 0.42, >99% at 0.8
+ROWS_PER_BAND = NUM_PERMUTATIONS // LSH_BANDS
+MAX_CHANGE_CHARS = 300  # Longer changed spans are clipped in the update prompt
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240205)  # Fixed seed - signatures must be stable across restarts
+_PERM_A = _rng.randint(1, _MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.randint(0, _MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+_connection = None
+_connection_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'lookups': 0, 'reused': 0, 'full_analyses': 0, 'update_failures': 0}
+
+
+def normalize_words(text: str) -> list:
+    """Lowercase words with digits folded, so amounts and dates shingle alike"""
+    return re.sub(r'\d', '0', text.lower()).split()
+
+
+def minhash_signature(words: list) -> np.ndarray:
+    """MinHash signature (NUM_PERMUTATIONS uint64 values) of a text's word shingles"""
+    if len(words) < SHINGLE_WORDS:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+    # a, b < 2^31 and x < 2^32, so a * x + b stays below 2^63 and uint64 never overflows
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def band_keys(signature: np.ndarray) -> list:
+    """One 63-bit LSH key per band"""
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        keys.append(int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'little') >> 1)
+    return keys
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Open the index database (lock held)"""
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(TEMPLATE_INDEX_PATH, check_same_thread=False)
+        _connection.execute('PRAGMA journal_mode=WAL')
+        _connection.executescript('''
+            CREATE TABLE IF NOT EXISTS templates (
+                id INTEGER PRIMARY KEY,
+                created_at REAL NOT NULL,
+                text TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                analysis TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS template_bands (
+                band INTEGER NOT NULL,
+                band_key INTEGER NOT NULL,
+                template_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_template_bands ON template_bands (band, band_key);
+        ''')
+    return _connection
+
+
+def find_template(text: str):
+    """
+    Find the most similar indexed template
+
+    Returns:
+        tuple: (template dict with 'id', 'text', 'analysis', estimated Jaccard similarity),
+               or (None, 0.0) if no candidate shares an LSH band
+    """
+    signature = minhash_signature(normalize_words(text))
+    keys = band_keys(signature)
+
+    with _connection_lock:
+        db = _get_connection()
+        placeholders = ' OR '.join(['(band = ? AND band_key = ?)'] * LSH_BANDS)
+        params = [value for band, key in enumerate(keys) for value in (band, key)]
+        candidate_ids = [row[0] for row in db.execute(
+            f'SELECT DISTINCT template_id FROM template_bands WHERE {placeholders}', params
+        )]
+        if not candidate_ids:
+            return None, 0.0
+
+        rows = db.execute(
+            f'SELECT id, signature FROM templates WHERE id IN ({",".join("?" * len(candidate_ids))})',
+            candidate_ids
+        ).fetchall()
+
+        best_id, best_similarity = None, 0.0
+        for template_id, blob in rows:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint64) == signature))
+            if similarity > best_similarity:
+                best_id, best_similarity = template_id, similarity
+
+        template_text, analysis = db.execute(
+            'SELECT text, analysis FROM templates WHERE id = ?', (best_id,)
+        ).fetchone()
+
+    return {'id': best_id, 'text': template_text, 'analysis': json.loads(analysis)}, best_similarity
+
+
+def _delete_templates(db: sqlite3.Connection, where: str, params: tuple = ()) -> None:
+    """Delete templates matching a WHERE clause, with their band keys (transaction open)"""
+    ids = [row[0] for row in db.execute(f'SELECT id FROM templates WHERE {where}', params)]
+    if ids:
+        placeholders = ','.join('?' * len(ids))
+        db.execute(f'DELETE FROM template_bands WHERE template_id IN ({placeholders})', ids)
+        db.execute(f'DELETE FROM templates WHERE id IN ({placeholders})', ids)
+
+
+def add_template(text: str, analysis: dict) -> int:
+    """
+    Store a fully analyzed document as a template
+
+    Replaces a stored template with the same signature (same normalized text)
+    and keeps only the TEMPLATE_MAX_ENTRIES most recent templates.
+    """
+    signature = minhash_signature(normalize_words(text))
+
+    with _connection_lock:
+        db = _get_connection()
+        with db:
+            _delete_templates(db, 'signature = ?', (signature.tobytes(),))
+            cursor = db.execute(
+                'INSERT INTO templates (created_at, text, signature, analysis) VALUES (?, ?, ?, ?)',
+                (time.time(), text, signature.tobytes(), json.dumps(analysis, ensure_ascii=False))
+            )
+            template_id = cursor.lastrowid
+            db.executemany(
+                'INSERT INTO template_bands (band, band_key, template_id) VALUES (?, ?, ?)',
+                [(band, key, template_id) for band, key in enumerate(band_keys(signature))]
+            )
+            _delete_templates(db, 'id NOT IN (SELECT id FROM templates ORDER BY id DESC LIMIT ?)',
+                              (TEMPLATE_MAX_ENTRIES,))
+    return template_id
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def diff_variable_spans(template_text: str, text: str) -> tuple:
+    """
+    Word-level differences between a template and a new document
+
+    Returns:
+        tuple: (list of {'before', 'after'} changes, fraction of words changed)
+    """
+    old_words, new_words = template_text.split(), text.split()
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+
+    changes = []
+    changed_words = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        changed_words += max(i2 - i1, j2 - j1)
+        changes.append({
+            'before': ' '.join(old_words[i1:i2])[:MAX_CHANGE_CHARS],
+            'after': ' '.join(new_words[j1:j2])[:MAX_CHANGE_CHARS]
+        })
+
+    return changes, changed_words / max(1, len(new_words))
+
+
+def analyze_with_templates(text: str) -> dict:
+    """
+    Analyze a contract, reusing the analysis of a near-identical template when possible
+
+    Falls back to a full analyze_contract() when template reuse is off, no
+    template is similar enough, too much text changed, or the update fails.
+
+    Returns:
+        dict: Same shape as analyze_contract(), plus 'template_id' when reused
+    """
+    if not TEMPLATE_REUSE:
+        return analyze_contract(text)
+
+    try:
+        _count('lookups')
+        template, similarity = find_template(text)
+
+        if template and similarity >= TEMPLATE_MIN_SIMILARITY:
+            changes, changed_fraction = diff_variable_spans(template['text'], text)
+            print(f'🧩 Template {template["id"]} matches (similarity {similarity:.2f}, '
+                  f'{len(changes)} change(s), {changed_fraction:.0%} of words)')
+
+            if not changes:
+                _count('reused')
+                return {'success': True, 'analysis': template['analysis'], 'model_used': None,
+                        'tokens_used': 0, 'template_id': template['id']}
+
+            if changed_fraction <= TEMPLATE_MAX_CHANGED_WORDS:
+                result = update_analysis(template['analysis'], changes)
+                if result['success']:
+                    _count('reused')
+                    result['template_id'] = template['id']
+                    return result
+                _count('update_failures')
+
+    except LLMUnavailableError:
+        raise  # A full analysis would hit the same outage
+    except Exception as e:
+        # The index is an optimization - never fail an analysis because of it
+        print(f'⚠️  Template lookup failed: {str(e)}')
+
+    _count('full_analyses')
+    result = analyze_contract(text)
+    if result['success']:
+        try:
+            add_template(text, result['analysis'])
+        except Exception as e:
+            print(f'⚠️  Failed to index template: {str(e)}')
+    return result
+
+
+def get_template_stats() -> dict:
+    """Template lookups, reuses and fallbacks to full analysis"""
+    with _stats_lock:
+        return {**_stats, 'enabled': TEMPLATE_REUSE}
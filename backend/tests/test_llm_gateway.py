@@ -0,0 +1,170 @@
+"""
+LLM gateway tests against the fake Groq server in benchmarks/fake_llm_server.py
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+from fake_llm_server import make_handler  # noqa: E402
+
+# Fault injection options, changed per test; the handler reads them on every request
+OPTIONS = argparse.Namespace(rate_429=0.0, rate_500=0.0, retry_after=0.05, latency=0.0,
+                             slow_rate=0.0, slow_seconds=0.0, invalid_json_models=[])
+SERVER = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(OPTIONS))
+
+os.environ['GROQ_BASE_URL'] = f'http://127.0.0.1:{SERVER.server_address[1]}'
+os.environ['GROQ_API_KEY'] = 'fake-key'
+
+import ai_analyzer  # noqa: E402  (reads GROQ_BASE_URL at import)
+from ai_analyzer import LLMGateway, LLMRateLimitedError, LLMUnavailableError  # noqa: E402
+
+
+def setUpModule():
+    threading.Thread(target=SERVER.serve_forever, daemon=True).start()
+
+
+def tearDownModule():
+    SERVER.shutdown()
+
+
+class LLMGatewayTest(unittest.TestCase):
+
+    def setUp(self):
+        OPTIONS.rate_429 = OPTIONS.rate_500 = 0.0
+        OPTIONS.retry_after = 0.05
+        OPTIONS.invalid_json_models = []
+        self.settings = {name: getattr(ai_analyzer, name) for name in
+                         ('LLM_MAX_RETRIES', 'LLM_RETRY_BASE_SECONDS', 'LLM_MAX_WAIT_SECONDS')}
+        ai_analyzer.LLM_MAX_RETRIES = 2
+        ai_analyzer.LLM_RETRY_BASE_SECONDS = 0.01
+        ai_analyzer.LLM_MAX_WAIT_SECONDS = 5
+        self.gateway = LLMGateway()
+        self.gateway.bucket = ai_analyzer.TokenBucket(6000)
+
+    def tearDown(self):
+        for name, value in self.settings.items():
+            setattr(ai_analyzer, name, value)
+        self.gateway.http_client.close()
+
+    def ping(self):
+        return self.gateway.chat_completion(model='fake-model', messages=[{'role': 'user', 'content': 'ping'}],
+                                            max_tokens=10)
+
+    def open_half(self):
+        """Put the breaker in half-open state"""
+        breaker = self.gateway.breaker
+        breaker.opened_at = time.monotonic() - breaker.cooldown_seconds
+        self.assertEqual(breaker.state, 'half_open')
+
+    def test_completion(self):
+        response = self.ping()
+        self.assertTrue(response.choices[0].message.content)
+        self.assertEqual(self.gateway.get_stats()['requests'], 1)
+
+    def test_rate_limit_is_retried(self):
+        OPTIONS.rate_429 = 1.0
+        with self.assertRaises(LLMUnavailableError):
+            self.ping()
+        stats = self.gateway.get_stats()
+        self.assertEqual(stats['rate_limited'], ai_analyzer.LLM_MAX_RETRIES + 1)
+        self.assertEqual(stats['breaker_state'], 'closed')
+
+    def test_rate_limited_probe_closes_breaker(self):
+        self.open_half()
+        OPTIONS.rate_429 = 1.0
+        ai_analyzer.LLM_MAX_RETRIES = 0
+        with self.assertRaises(LLMUnavailableError):
+            self.ping()
+        self.assertEqual(self.gateway.breaker.state, 'closed')
+        self.assertTrue(self.gateway.breaker.allow())
+
+    def test_unexpected_probe_error_releases_probe(self):
+        self.open_half()
+
+        def broken_send(kwargs):
+            raise ValueError('unexpected')
+
+        self.gateway._send = broken_send
+        with self.assertRaises(ValueError):
+            self.ping()
+        self.assertFalse(self.gateway.breaker.probing)
+        self.assertTrue(self.gateway.breaker.allow())
+
+    def test_server_errors_open_breaker(self):
+        OPTIONS.rate_500 = 1.0
+        self.gateway.breaker.failure_threshold = 2
+        with self.assertRaises(LLMUnavailableError):
+            self.ping()
+        self.assertEqual(self.gateway.breaker.state, 'open')
+
+        requests_sent = self.gateway.get_stats()['requests']
+        with self.assertRaises(LLMUnavailableError) as raised:
+            self.ping()
+        self.assertGreater(raised.exception.retry_after, 0)
+        self.assertEqual(self.gateway.get_stats()['requests'], requests_sent)
+
+    def test_failed_probe_reopens_breaker(self):
+        self.open_half()
+        OPTIONS.rate_500 = 1.0
+        ai_analyzer.LLM_MAX_RETRIES = 0
+        with self.assertRaises(LLMUnavailableError):
+            self.ping()
+        self.assertEqual(self.gateway.breaker.state, 'open')
+
+        OPTIONS.rate_500 = 0.0
+        self.open_half()
+        self.ping()
+        self.assertEqual(self.gateway.breaker.state, 'closed')
+
+    def test_long_rate_limit_fails_fast(self):
+        OPTIONS.rate_429 = 1.0
+        OPTIONS.retry_after = 3 * 60 * 60  # A daily quota resetting in hours
+        start = time.perf_counter()
+        with self.assertRaises(LLMRateLimitedError) as raised:
+            self.ping()
+        self.assertGreater(raised.exception.retry_after, ai_analyzer.LLM_MAX_WAIT_SECONDS)
+
+        # The scheduler stays paused, so the next request fails without calling the provider
+        requests_sent = self.gateway.get_stats()['requests']
+        with self.assertRaises(LLMRateLimitedError):
+            self.ping()
+        self.assertEqual(self.gateway.get_stats()['requests'], requests_sent)
+        self.assertLess(time.perf_counter() - start, 2)
+
+    def test_rejected_json_escalates(self):
+        OPTIONS.invalid_json_models = [ai_analyzer.SMALL_MODEL]
+        self.assertEqual(ai_analyzer.route_analysis_model('Either party may end this agreement.')[0],
+                         'analysis_small')
+        result = ai_analyzer.analyze_contract('Either party may end this agreement.')
+        self.assertTrue(result['success'])
+        self.assertTrue(result['escalated'])
+        self.assertEqual(result['model_used'], ai_analyzer.LARGE_MODEL)
+
+    def test_rejected_json_on_large_model_fails_cleanly(self):
+        OPTIONS.invalid_json_models = [ai_analyzer.SMALL_MODEL, ai_analyzer.LARGE_MODEL]
+        result = ai_analyzer.analyze_contract('Either party may end this agreement.')
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], 'AI returned invalid JSON format')
+
+    def test_unavailable_llm_is_raised_from_analysis(self):
+        # Not a failed analysis: /api/analyze turns it into 429/503 with Retry-After
+        OPTIONS.rate_429 = 1.0
+        ai_analyzer.LLM_MAX_RETRIES = 0
+        with self.assertRaises(LLMUnavailableError):
+            ai_analyzer.analyze_contract('Either party may end this agreement.')
+
+
+if __name__ == '__main__':
+    unittest.main()
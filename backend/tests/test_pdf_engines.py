@@ -0,0 +1,58 @@
+"""
+PDF text engine equivalence: pdfium (fast path) must match pdfplumber on the
+bundled test agreements (see benchmarks/pdf_engines.py for timings)
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import difflib
+import os
+import shutil
+import sys
+import unittest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+import pdf_text  # noqa: E402
+from pdf_engines import CORPUS_DIR, normalize, repeated_pdf  # noqa: E402
+
+MIN_SIMILARITY = 0.99
+CORPUS_PDFS = sorted(os.path.join(CORPUS_DIR, name) for name in os.listdir(CORPUS_DIR)
+                     if name.lower().endswith('.pdf'))
+
+
+class PdfEnginesTest(unittest.TestCase):
+
+    def assert_engines_agree(self, path):
+        reference = pdf_text.extract_pdf_pages(path, 'pdfplumber')
+        candidate = pdf_text.extract_pdf_pages(path, 'pdfium')
+        self.assertEqual(len(candidate), len(reference))
+        for number, (expected, actual) in enumerate(zip(reference, candidate), 1):
+            similarity = difflib.SequenceMatcher(None, normalize(expected), normalize(actual),
+                                                 autojunk=False).ratio()
+            self.assertGreaterEqual(similarity, MIN_SIMILARITY,
+                                    f'{os.path.basename(path)} page {number}: similarity {similarity:.4f}')
+
+    def test_corpus_is_present(self):
+        self.assertTrue(CORPUS_PDFS, f'No PDFs in {CORPUS_DIR}')
+
+    def test_engines_agree_on_corpus(self):
+        for path in CORPUS_PDFS:
+            with self.subTest(pdf=os.path.basename(path)):
+                self.assert_engines_agree(path)
+
+    def test_engines_agree_on_parallel_page_ranges(self):
+        # Long enough for pdfium's parallel page-range path
+        path = repeated_pdf(CORPUS_PDFS[0], pdf_text.PDF_PARALLEL_MIN_PAGES)
+        try:
+            self.assertGreaterEqual(pdf_text.page_count(path), pdf_text.PDF_PARALLEL_MIN_PAGES)
+            self.assert_engines_agree(path)
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
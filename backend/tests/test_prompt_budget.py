@@ -0,0 +1,60 @@
+"""
+Prompt compaction tests: boilerplate goes, contract content stays
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_budget import compact_text  # noqa: E402
+
+PAGE_BREAK = '\n\n--- PAGE BREAK ---\n\n'
+
+
+def document(pages):
+    return PAGE_BREAK.join('\n'.join(lines) for lines in pages)
+
+
+class CompactTextTest(unittest.TestCase):
+
+    def test_headers_footers_and_page_numbers_removed(self):
+        pages = [[f'ACME Lease Agreement - Page {n} of 4', f'Clause {n}: the tenant pays rent monthly.',
+                  'Confidential', str(n)] for n in range(1, 5)]
+        lines = compact_text(document(pages)).split('\n\n')
+
+        self.assertEqual(lines.count('ACME Lease Agreement - Page 1 of 4'), 1)
+        self.assertEqual(lines.count('Confidential'), 1)
+        self.assertFalse(any(line.startswith('ACME') and 'Page 1' not in line for line in lines))
+        self.assertNotIn('3', lines)
+        for n in range(1, 5):
+            self.assertIn(f'Clause {n}: the tenant pays rent monthly.', lines)
+
+    def test_repeated_content_line_is_kept(self):
+        pages = [[f'Invoice schedule {n}', 'Total: $500', f'Due within {n * 10} days', f'Signed by party {n}']
+                 for n in range(1, 5)]
+        lines = compact_text(document(pages)).split('\n\n')
+        self.assertEqual(lines.count('Total: $500'), 4)
+
+    def test_short_pages_keep_their_lines(self):
+        pages = [['Total: $500'], ['Total: $500', 'Rent is due on the 1st'], ['Total: $500'],
+                 ['Deposit: $1000', 'Total: $500', 'Late fee: $50']]
+        lines = compact_text(document(pages)).split('\n\n')
+        self.assertEqual(lines.count('Total: $500'), 4)
+
+    def test_numbers_inside_a_page_are_kept(self):
+        text = document([['Payment terms', '30', 'days after delivery', 'End of terms']])
+        self.assertIn('30', compact_text(text).split('\n\n'))
+
+    def test_long_duplicate_lines_are_removed(self):
+        clause = 'The tenant shall keep the premises in good repair at all times.'
+        lines = compact_text(document([['Intro', clause, 'Middle', clause, 'End']])).split('\n\n')
+        self.assertEqual(lines.count(clause), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
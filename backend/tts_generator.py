@@ -9,6 +9,8 @@ import os
 import tempfile
 from typing import Optional
 
+from resource_governor import TEMP_PREFIX
+
 # Supported language codes for gTTS
 # gTTS uses simple language codes directly
 SUPPORTED_LANGUAGES = {
@@ -48,7 +50,7 @@ def generate_audio(text: str, language: str = 'en', rate: str = '+0%') -> Option
         print(f'🔊 Generating audio in {language} (gTTS lang: {lang_code})')
 
         # Create temporary file for audio
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
+        temp_file = tempfile.NamedTemporaryFile(prefix=TEMP_PREFIX, delete=False, suffix='.mp3')
         output_path = temp_file.name
         temp_file.close()
 
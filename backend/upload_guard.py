@@ -0,0 +1,130 @@
+"""
+Streaming upload limits for AgreeWise
+Checks uploads while the bytes arrive instead of after Werkzeug has buffered
+them: the request size is checked against Content-Length before anything is
+read, every file part is counted as it is written, and each file's type is
+sniffed from its first chunk so bad uploads are aborted immediately.
+"""
+
+import os
+import tempfile
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+# Per-file and per-request limits; endpoints can override them below
+MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 10 * 1024 * 1024))  # 10MB
+MAX_REQUEST_SIZE = int(os.getenv('MAX_REQUEST_SIZE', 40 * 1024 * 1024))  # 40MB
+BULK_MAX_UPLOAD_SIZE = int(os.getenv('BULK_MAX_UPLOAD_SIZE', 200 * 1024 * 1024))  # 200MB
+
+# endpoint -> (max bytes per file, max bytes per request)
+ENDPOINT_LIMITS = {
+    'bulk_analyze': (BULK_MAX_UPLOAD_SIZE, BULK_MAX_UPLOAD_SIZE),
+}
+
+# Uploads smaller than this stay in memory
+SPOOL_MEMORY_SIZE = 512 * 1024
+
+SNIFF_BYTES = 16
+
+# Leading bytes of each accepted file type
+SIGNATURES = {
+    'pdf': lambda head: head.startswith(b'%PDF'),
+    'docx': lambda head: head.startswith(b'PK\x03\x04'),
+    'zip': lambda head: head.startswith(b'PK\x03\x04'),
+    'doc': lambda head: head.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'),
+    'png': lambda head: head.startswith(b'\x89PNG\r\n\x1a\n'),
+    'jpg': lambda head: head.startswith(b'\xff\xd8\xff'),
+    'jpeg': lambda head: head.startswith(b'\xff\xd8\xff'),
+    'heic': lambda head: head[4:8] == b'ftyp' and head[8:12] in (b'heic', b'heix', b'mif1', b'msf1', b'hevc'),
+}
+
+
+def limits_for(endpoint) -> tuple:
+    """(max bytes per file, max bytes per request) for an endpoint"""
+    return ENDPOINT_LIMITS.get(endpoint, (MAX_FILE_SIZE, MAX_REQUEST_SIZE))
+
+
+def matches_extension(filename, head: bytes) -> bool:
+    """
+    Check that a file's first bytes match its extension
+
+    Returns:
+        bool: True if the content looks like the extension says
+              (False for extensions without a known signature)
+    """
+    if not filename or '.' not in filename:
+        return False
+    extension = filename.rsplit('.', 1)[1].lower()
+    check = SIGNATURES.get(extension)
+    return check(head) if check else False
+
+
+class GuardedUploadFile(tempfile.SpooledTemporaryFile):
+    """Upload spool that enforces size limits and sniffs the type as bytes arrive"""
+
+    def __init__(self, request, filename, max_file_size):
+        super().__init__(max_size=SPOOL_MEMORY_SIZE, mode='w+b')
+        self.request = request
+        self.filename = filename
+        self.max_file_size = max_file_size
+        self.written = 0
+        self.head = b''
+
+    def write(self, data):
+        self.written += len(data)
+        self.request.upload_bytes += len(data)
+
+        if self.written > self.max_file_size:
+            raise RequestEntityTooLarge(
+                f'File {self.filename} is larger than {self.max_file_size // (1024 * 1024)}MB'
+            )
+        if self.request.upload_bytes > self.request.max_upload_bytes:
+            raise RequestEntityTooLarge(
+                f'Upload is larger than {self.request.max_upload_bytes // (1024 * 1024)}MB'
+            )
+
+        if len(self.head) < SNIFF_BYTES:
+            self.head += bytes(data[:SNIFF_BYTES - len(self.head)])
+            if len(self.head) >= SNIFF_BYTES and not matches_extension(self.filename, self.head):
+                raise UnsupportedMediaType(f'File {self.filename} does not match its file type')
+
+        return super().write(data)
+
+
+class GuardedRequest(Request):
+    """Flask request whose multipart file parts go through GuardedUploadFile"""
+
+    upload_bytes = 0
+
+    @property
+    def max_upload_bytes(self) -> int:
+        return limits_for(self.endpoint)[1]
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return GuardedUploadFile(self, filename, limits_for(self.endpoint)[0])
+
+
+def check_upload_request(request) -> None:
+    """
+    Reject oversized uploads from Content-Length before reading the body,
+    then parse the multipart body so per-file limits and type sniffing run
+    before the view. Call from a before_request hook.
+
+    Raises:
+        RequestEntityTooLarge: If the request or a file is over its limit
+        UnsupportedMediaType: If a file's content doesn't match its extension
+    """
+    if request.method != 'POST' or request.mimetype != 'multipart/form-data':
+        return
+
+    _, max_request_size = limits_for(request.endpoint)
+    if request.content_length and request.content_length > max_request_size:
+        raise RequestEntityTooLarge(f'Upload is larger than {max_request_size // (1024 * 1024)}MB')
+
+    for _, file in request.files.items(multi=True):
+        stream = file.stream
+        if isinstance(stream, GuardedUploadFile) and stream.written and len(stream.head) < SNIFF_BYTES:
+            # Files shorter than the sniff window are checked once complete
+            if not matches_extension(stream.filename, stream.head):
+                raise UnsupportedMediaType(f'File {stream.filename} does not match its file type')
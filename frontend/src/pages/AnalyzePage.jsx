@@ -10,7 +10,7 @@ export default function AnalyzePage() {
   const navigate = useNavigate();
 
   // Get data passed from HomePage
-  const { files, totalPages, documentLanguage, extractedText, analysis } = location.state || {};
+  const { files, totalPages, documentLanguage, extractedText, analysis, metadata } = location.state || {};
 
   // State for language selection and translation
   const [selectedLanguage, setSelectedLanguage] = useState('en');
@@ -213,6 +213,8 @@ export default function AnalyzePage() {
         body: JSON.stringify({
           text: audioText,
           language: selectedLanguage,
+          // Low-bitrate speech profiles save mobile data; Opus where the browser plays it
+          profile: audioRef.current.canPlayType('audio/ogg; codecs=opus') ? 'opus-low' : 'mp3-low',
         }),
       });
 
@@ -277,18 +279,27 @@ export default function AnalyzePage() {
         targetLocale: newLanguage,
       });
 
-      // Translate the analysis content
-      const analysisResponse = await fetch(`${BACKEND_URL}/api/translate`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          content: analysis.english,
-          sourceLocale: 'en',
-          targetLocale: newLanguage,
+      // Translate the analysis content and fetch the prebuilt heading bundle in parallel.
+      // Heading bundles are cached by the browser, so after the first visit only the
+      // analysis itself needs a translation round-trip. With the version the backend
+      // advertised, the bundle is cached for good instead of revalidated daily.
+      const headingsVersion = metadata?.headings_version;
+      const headingsUrl = `${BACKEND_URL}/api/headings/${newLanguage}` +
+        (headingsVersion ? `?v=${encodeURIComponent(headingsVersion)}` : '');
+      const [analysisResponse, headingsResponse] = await Promise.all([
+        fetch(`${BACKEND_URL}/api/translate`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({
+            content: analysis.english,
+            sourceLocale: 'en',
+            targetLocale: newLanguage,
+          }),
         }),
-      });
+        fetch(headingsUrl),
+      ]);
 
       const analysisResult = await analysisResponse.json();
 
@@ -296,67 +307,13 @@ export default function AnalyzePage() {
         throw new Error(analysisResult.error || 'Translation failed');
       }
 
-      // Translate all UI text elements on the page
-      const headingsToTranslate = {
-        // Section headings
-        summary: 'Summary',
-        whatYouMustDo: 'What You Must Do',
-        whatYouGet: 'What You Get',
-        importantWarnings: 'Important Warnings',
-        importantTerms: 'Important Terms',
-        questionsToAsk: 'Questions to Ask Before Signing',
-
-        // Risk levels
-        lowRisk: 'LOW RISK',
-        mediumRisk: 'MEDIUM RISK',
-        highRisk: 'HIGH RISK',
-
-        // Risk messages
-        fairBalance: 'This contract looks fair and balanced.',
-        someConcerns: 'Some concerns found. Read the warnings below carefully.',
-        cautionMessage: 'CAUTION: Multiple serious concerns found. Review carefully before signing.',
-
-        // Color guide
-        colorGuide: 'Color Guide',
-        redSerious: 'Red = Serious Risk',
-        yellowModerate: 'Yellow = Moderate Risk',
-        greenFavorable: 'Green = Favorable',
-        expandSections: 'Expand sections below for detailed information',
-
-        // Flag labels
-        redFlag: 'Red Flag',
-        redFlags: 'Red Flags',
-        yellowFlag: 'Yellow Flag',
-        yellowFlags: 'Yellow Flags',
-        positiveTerm: 'Positive Term',
-        positiveTerms: 'Positive Terms',
-
-        // Other text
-        copyMessageHint: 'Click "Copy Message" to generate a professional WhatsApp/Email ready message',
-        showingTopQuestions: 'Showing top 3 of {count} questions',
-      };
-
-      const headingsResponse = await fetch(`${BACKEND_URL}/api/translate`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          content: headingsToTranslate,
-          sourceLocale: 'en',
-          targetLocale: newLanguage,
-        }),
-      });
-
-      const headingsResult = await headingsResponse.json();
-
-      if (!headingsResponse.ok || !headingsResult.success) {
-        throw new Error(headingsResult.error || 'Headings translation failed');
-      }
+      // Headings are optional - fall back to the UI language strings if the bundle is unavailable
+      const headingsResult = await headingsResponse.json().catch(() => null);
+      const headings = headingsResponse.ok && headingsResult?.success ? headingsResult.headings : null;
 
       // Extract the translated data from the responses
       setTranslatedAnalysis(analysisResult.translated.data);
-      setTranslatedHeadings(headingsResult.translated.data);
+      setTranslatedHeadings(headings);
     } catch (err) {
       console.error('Translation error:', err);
       setTranslationError(err.message);
@@ -13,6 +13,7 @@ export default function HomePage() {
   const [analyzing, setAnalyzing] = useState(false);
   const [analysisStep, setAnalysisStep] = useState(0); // 0: idle, 1: extracting, 2: analyzing
   const [error, setError] = useState(null);
+  const [sessionId, setSessionId] = useState(null); // Lets the backend reuse unchanged pages on re-submit
   const navigate = useNavigate();
 
   const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || 'http://localhost:5001';
@@ -36,6 +37,10 @@ export default function HomePage() {
       formData.append('document_language', documentLanguage);
       formData.append('explanation_language', 'en'); // Always start with English
       formData.append('extract_only', 'false'); // Enable AI analysis
+      formData.append('omit', 'pages.text'); // Page texts duplicate extracted_text
+      if (sessionId) {
+        formData.append('session_id', sessionId);
+      }
 
       console.log(`📤 Uploading ${files.length} file(s) for analysis...`);
 
@@ -59,6 +64,7 @@ export default function HomePage() {
       }
 
       console.log('✓ Analysis complete:', result);
+      setSessionId(result.metadata?.session_id || null);
 
       // Mark all steps as complete before navigating
       setAnalysisStep(3); // All done!